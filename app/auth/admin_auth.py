@@ -0,0 +1,35 @@
+import hmac
+from typing import Optional
+from fastapi import Depends, HTTPException, status
+from fastapi.security import APIKeyHeader
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+admin_key_scheme = APIKeyHeader(
+    name="x-admin-key",
+    auto_error=False,
+    scheme_name="Admin Key",
+    description="Operator key for service/admin endpoints (ADMIN_API_KEY)"
+)
+
+
+def is_admin_key(admin_key: Optional[str]) -> bool:
+    return bool(settings.ADMIN_API_KEY and admin_key and hmac.compare_digest(admin_key, settings.ADMIN_API_KEY))
+
+
+def require_admin(admin_key: Optional[str] = Depends(admin_key_scheme)):
+    """Allow the request only when x-admin-key matches ADMIN_API_KEY"""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not Found"
+        )
+
+    if not is_admin_key(admin_key):
+        logger.warning("Rejected admin request with missing or invalid key")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin key"
+        )
@@ -1,9 +1,10 @@
 import secrets
-import json
 from datetime import datetime, timedelta, timezone
-from typing import Dict
+from typing import Dict, Iterable, Union
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from app.models.api_key import APIKey
+from app.models.api_key import APIKey, APIKeyUsage
+from app.auth.permissions import Permission, permissions_to_mask, mask_to_permissions
 from app.config import settings
 import hashlib
 
@@ -37,10 +38,12 @@ def create_api_key(
     db: Session,
     user_id: str,
     name: str,
-    permissions: list,
+    permissions: Union[Permission, Iterable[str]],
     expiry_str: str
 ) -> Dict:
     """Create a new API key for user"""
+    permission_mask = permissions_to_mask(permissions)
+    
     active_keys = db.query(APIKey).filter(
         APIKey.user_id == user_id,
         APIKey.is_active == True,
@@ -57,7 +60,7 @@ def create_api_key(
         user_id=user_id,
         name=name,
         key=hash_api_key(key),
-        permissions=json.dumps(permissions),
+        permission_mask=int(permission_mask),
         expires_at=expires_at,
         is_active=True
     )
@@ -86,6 +89,7 @@ def revoke_api_key(db: Session, user_id: str, api_key_string: str) -> bool:
         return False
     
     api_key.is_active = False
+    api_key.revoked_at = datetime.now(timezone.utc)
     db.commit()
     return True
 
@@ -109,19 +113,14 @@ def rollover_api_key(
     if not expired_key:
         raise Exception("Expired key not found or still active")
     
-    if not expired_key.is_active:
+    if expired_key.revoked_at is not None:
         raise Exception("Cannot rollover inactive/revoked key")
     
-    try:
-        permissions = json.loads(expired_key.permissions)
-    except:
-        permissions = ["read"]
-    
     new_key_data = create_api_key(
         db=db,
         user_id=user_id,
         name=expired_key.name,
-        permissions=permissions,
+        permissions=Permission(expired_key.permission_mask),
         expiry_str=expiry_str
     )
     
@@ -129,25 +128,40 @@ def rollover_api_key(
 
 
 def list_user_api_keys(db: Session, user_id: str) -> list:
-    """List all API keys for a user"""
+    """List all API keys for a user, with their flushed usage"""
     keys = db.query(APIKey).filter(
         APIKey.user_id == user_id
     ).order_by(APIKey.created_at.desc()).all()
     
+    # One row per key and endpoint, summed over the per-day counters
+    usage = {key.id: {"requests": 0, "last_used_at": None, "endpoints": {}} for key in keys}
+    rows = db.query(
+        APIKeyUsage.api_key_id,
+        APIKeyUsage.endpoint,
+        func.sum(APIKeyUsage.request_count),
+        func.max(APIKeyUsage.last_used_at)
+    ).filter(APIKeyUsage.api_key_id.in_(list(usage))).group_by(APIKeyUsage.api_key_id, APIKeyUsage.endpoint).all() if keys else []
+    for api_key_id, endpoint, requests, last_used_at in rows:
+        requests = int(requests)
+        key_usage = usage[api_key_id]
+        key_usage["requests"] += requests
+        key_usage["endpoints"][endpoint] = requests
+        if key_usage["last_used_at"] is None or last_used_at > key_usage["last_used_at"]:
+            key_usage["last_used_at"] = last_used_at
+    
     result = []
     for key in keys:
-        try:
-            permissions = json.loads(key.permissions)
-        except:
-            permissions = []
-        
+        key_usage = usage[key.id]
         result.append({
             "id": key.id,
             "name": key.name,
             "created_at": key.created_at.isoformat() if key.created_at else None,
             "expires_at": key.expires_at.isoformat() if key.expires_at else None,
             "is_active": key.is_active,
-            "permissions": permissions
+            "permissions": mask_to_permissions(key.permission_mask),
+            "last_used_at": key_usage["last_used_at"].isoformat() if key_usage["last_used_at"] else None,
+            "requests": key_usage["requests"],
+            "endpoints": key_usage["endpoints"]
         })
     
     return result
\ No newline at end of file
@@ -1,26 +1,152 @@
 from authlib.integrations.starlette_client import OAuth
 from app.config import settings
+from typing import Optional
+import asyncio
+import re
+import time
 import urllib.parse
+import httpx
+import jwt
+import logging
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_AUTH_URL = 'https://accounts.google.com/o/oauth2/v2/auth'
+GOOGLE_TOKEN_URL = 'https://oauth2.googleapis.com/token'
+GOOGLE_ISSUERS = ('https://accounts.google.com', 'accounts.google.com')
 
 oauth = OAuth()
 
+# Endpoints are registered explicitly so Authlib never has to fetch the
+# discovery document on its own; GoogleIDTokenVerifier owns that cache.
 oauth.register(
     name='google',
     client_id=settings.GOOGLE_CLIENT_ID,
     client_secret=settings.GOOGLE_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+    authorize_url=GOOGLE_AUTH_URL,
+    access_token_url=GOOGLE_TOKEN_URL,
     client_kwargs={
         'scope': 'openid email profile',
         'prompt': 'select_account',
     }
 )
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def _cache_ttl(response: httpx.Response, default: int) -> int:
+    """Read the freshness lifetime from a Cache-Control header"""
+    cache_control = response.headers.get('cache-control', '')
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = _MAX_AGE_RE.search(cache_control)
+    return int(match.group(1)) if match else default
+
+
+class GoogleIDTokenVerifier:
+    """
+    Verify Google id_tokens locally against Google's published JWKS.
+
+    The discovery document and key set are cached in-process and only
+    refetched once their Cache-Control max-age runs out, so a login costs
+    the token exchange and nothing else on a warm cache. An unknown `kid`
+    triggers a single forced refresh to pick up key rotation.
+    """
+
+    def __init__(
+        self,
+        discovery_url: str = settings.GOOGLE_DISCOVERY_URL,
+        client_id: str = settings.GOOGLE_CLIENT_ID,
+        default_ttl: int = settings.GOOGLE_CERTS_CACHE_SECONDS,
+        min_refresh_interval: int = 30,
+    ):
+        self.discovery_url = discovery_url
+        self.client_id = client_id
+        self.default_ttl = default_ttl
+        self.min_refresh_interval = min_refresh_interval
+
+        self._discovery: Optional[dict] = None
+        self._discovery_expires_at = 0.0
+        self._jwks: Optional[jwt.PyJWKSet] = None
+        self._jwks_expires_at = 0.0
+        self._jwks_fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _get_discovery(self, client: httpx.AsyncClient) -> dict:
+        if self._discovery is None or time.monotonic() >= self._discovery_expires_at:
+            response = await client.get(self.discovery_url)
+            response.raise_for_status()
+            self._discovery = response.json()
+            self._discovery_expires_at = time.monotonic() + _cache_ttl(response, self.default_ttl)
+            logger.info("Google discovery document refreshed")
+        return self._discovery
+
+    async def _get_jwks(self, force: bool = False) -> jwt.PyJWKSet:
+        async with self._lock:
+            now = time.monotonic()
+            if self._jwks is not None:
+                if not force and now < self._jwks_expires_at:
+                    return self._jwks
+                if force and now - self._jwks_fetched_at < self.min_refresh_interval:
+                    return self._jwks
+
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                discovery = await self._get_discovery(client)
+                response = await client.get(discovery['jwks_uri'])
+                response.raise_for_status()
+
+            self._jwks = jwt.PyJWKSet.from_dict(response.json())
+            self._jwks_fetched_at = time.monotonic()
+            self._jwks_expires_at = self._jwks_fetched_at + _cache_ttl(response, self.default_ttl)
+            logger.info("Google JWKS refreshed")
+            return self._jwks
+
+    async def _signing_key(self, kid: str) -> jwt.PyJWK:
+        jwks = await self._get_jwks()
+        try:
+            return jwks[kid]
+        except KeyError:
+            pass
+
+        jwks = await self._get_jwks(force=True)
+        try:
+            return jwks[kid]
+        except KeyError:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+
+    async def verify(self, id_token: str) -> dict:
+        """Validate signature, audience, issuer, expiry and a verified email; return the claims"""
+        header = jwt.get_unverified_header(id_token)
+        signing_key = await self._signing_key(header.get('kid'))
+
+        claims = jwt.decode(
+            id_token,
+            signing_key.key,
+            algorithms=['RS256'],
+            audience=self.client_id,
+            options={'require': ['exp', 'iat', 'iss', 'sub']},
+            leeway=30,
+        )
+
+        if claims['iss'] not in GOOGLE_ISSUERS:
+            raise jwt.InvalidIssuerError("Invalid issuer")
+        # Sent as a bool, or as a string by some older Google endpoints
+        if claims.get('email_verified') not in (True, 'true'):
+            raise jwt.InvalidTokenError("Email address is not verified")
+
+        return claims
+
+
+google_id_token_verifier = GoogleIDTokenVerifier()
+
+
 def generate_google_auth_url() -> str:
     """
     Generate Google OAuth authorization URL for manual testing.
-    
+
     This allows users to get the URL, open it in a browser,
     and manually copy the authorization code after login.
-    
+
     Returns:
         str: Full Google OAuth authorization URL
     """
@@ -32,8 +158,7 @@ def generate_google_auth_url() -> str:
         'access_type': 'offline',
         'prompt': 'select_account'
     }
-    
-    base_url = 'https://accounts.google.com/o/oauth2/v2/auth'
+
     query_string = urllib.parse.urlencode(params)
-    
-    return f"{base_url}?{query_string}"
+
+    return f"{GOOGLE_AUTH_URL}?{query_string}"
@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Tuple
+import uuid
 import jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Request
@@ -10,7 +11,8 @@ from sqlalchemy.orm import Session
 from app.models.user import User
 from app.models.api_key import APIKey
 from app.auth.api_key_auth import hash_api_key
-import json
+from app.auth.permissions import Permission, mask_to_permissions
+from app.services.api_key_usage import usage_tracker
 import logging
 
 logger = logging.getLogger(__name__)
@@ -66,10 +68,11 @@ def verify_token(token: str):
     
 
 async def get_current_user_or_api_key(
+    request: Request = None,
     api_key: Optional[str] = Depends(api_key_scheme),
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
     db: Session = Depends(get_db)
-) -> Tuple[str, list]:
+) -> Tuple[str, Permission]:
     """
         Unified authentication for API Key OR JWT
         
@@ -77,21 +80,21 @@ async def get_current_user_or_api_key(
         
         Click "Authorize" button in Swagger UI to test!
         
-        Returns: (user_id: str, permissions: list)
+        Returns: (user_id: str, permissions: Permission bitmask)
     """
     if credentials and credentials.credentials:
         token = credentials.credentials
         
         if token.startswith("sk_test_") or token.startswith("sk_live_"):
             logger.info(f"Detected API key in JWT field (Swagger bug): {token[:15]}...")
-            return await _authenticate_by_api_key(token, db)
+            return await _authenticate_by_api_key(token, db, request)
         
         logger.info(f"Processing as JWT: {token[:20]}...")
         return await _authenticate_by_jwt(token, db)
     
     elif api_key:
         logger.info(f"Attempting API Key authentication: {api_key[:15]}...")
-        return await _authenticate_by_api_key(api_key, db)
+        return await _authenticate_by_api_key(api_key, db, request)
     
     elif credentials and credentials.credentials:
         token = credentials.credentials
@@ -108,34 +111,33 @@ async def get_current_user_or_api_key(
     )
         
        
-async def _authenticate_by_api_key(api_key: str, db: Session) -> Tuple[str, list]:
+def _endpoint(request: Optional[Request]) -> str:
+    """Route template, so /wallet/deposit/{reference}/status counts as one endpoint"""
+    route = request.scope.get("route") if request is not None else None
+    if route is None:
+        return "unknown"
+    return f"{request.method} {route.path}"
+
+
+async def _authenticate_by_api_key(api_key: str, db: Session, request: Optional[Request] = None) -> Tuple[str, Permission]:
     """Authenticate using API Key"""
     try:
         hashed_provided_key = hash_api_key(api_key)  
         logger.info(f"Hashed provided key: {hashed_provided_key[:50]}...")
         
-        active_keys = db.query(APIKey).filter(
+        key_obj = db.query(APIKey).filter(
+            APIKey.key == hashed_provided_key,
             APIKey.is_active == True,
             APIKey.expires_at > datetime.now(timezone.utc)
-        ).all()
+        ).first()
         
-        logger.info(f"Active API key query result: {len(active_keys) if active_keys else 0}")
+        if key_obj:
+            logger.info(f"API key authenticated for user_id: {key_obj.user_id}")
             
-        for key_obj in active_keys:
-            if hashed_provided_key == key_obj.key:
-                logger.info(f"API key authenticated for user_id: {key_obj.user_id}")
-                
-                user = db.query(User).filter(User.id == key_obj.user_id).first()
-                if user:
-                    
-                    permissions = []
-                    try:
-                        if key_obj.permissions:
-                            permissions = json.loads(key_obj.permissions)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to decode permissions for API key {key_obj.id}")
-                    
-                return user.id, permissions
+            user = db.query(User).filter(User.id == key_obj.user_id).first()
+            if user:
+                usage_tracker.record(key_obj.id, _endpoint(request))
+                return user.id, Permission(key_obj.permission_mask)
         
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -150,7 +152,7 @@ async def _authenticate_by_api_key(api_key: str, db: Session) -> Tuple[str, list
         )
         
         
-async def _authenticate_by_jwt(token: str, db: Session) -> Tuple[str, list]:
+async def _authenticate_by_jwt(token: str, db: Session) -> Tuple[str, Permission]:
     """Authenticate using JWT token"""
     try:
         user_id = verify_token(token)
@@ -161,7 +163,7 @@ async def _authenticate_by_jwt(token: str, db: Session) -> Tuple[str, list]:
                 detail="Invalid or expired token"
             )
         
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.query(User).filter(User.id == uuid.UUID(user_id)).first()
         if not user:
             logger.error(f"User not found in DB: {user_id}")
             raise HTTPException(
@@ -170,7 +172,7 @@ async def _authenticate_by_jwt(token: str, db: Session) -> Tuple[str, list]:
             )
         
         logger.info(f"User {user_id} authenticated")
-        return str(user_id), ["deposit", "transfer", "read"]
+        return str(user_id), Permission.ALL
         
     except HTTPException:
         raise
@@ -181,10 +183,10 @@ async def _authenticate_by_jwt(token: str, db: Session) -> Tuple[str, list]:
             detail=f"JWT authentication failed: {str(e)}"
         )
 
-def check_permissions(required_permissions: list, user_permissions: list):
-    for perm in required_permissions:
-        if perm not in user_permissions:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Missing required permission: {perm}"
-            )
\ No newline at end of file
+def check_permissions(required_permissions: Permission, user_permissions: Permission):
+    missing = required_permissions & ~user_permissions
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Missing required permission: {', '.join(mask_to_permissions(missing))}"
+        )
\ No newline at end of file
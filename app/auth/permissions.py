@@ -0,0 +1,38 @@
+import enum
+from typing import Iterable, List, Union
+
+
+class Permission(enum.IntFlag):
+    """API key permissions, stored on APIKey.permission_mask as a bitmask"""
+    NONE = 0
+    READ = 1
+    DEPOSIT = 2
+    TRANSFER = 4
+
+    ALL = READ | DEPOSIT | TRANSFER
+
+
+_BY_NAME = {
+    "read": Permission.READ,
+    "deposit": Permission.DEPOSIT,
+    "transfer": Permission.TRANSFER,
+}
+
+
+def permissions_to_mask(permissions: Union[Permission, int, Iterable[str]]) -> Permission:
+    """Compile permission names (or an existing mask) into a Permission bitmask"""
+    if isinstance(permissions, int):
+        return Permission(permissions) & Permission.ALL
+
+    mask = Permission.NONE
+    for name in permissions:
+        try:
+            mask |= _BY_NAME[name]
+        except KeyError:
+            raise ValueError(f"Invalid permission: {name}")
+    return mask
+
+
+def mask_to_permissions(mask: int) -> List[str]:
+    """Expand a bitmask back into permission names, in a stable order"""
+    return [name for name, flag in _BY_NAME.items() if mask & flag]
@@ -4,7 +4,30 @@ from typing import Optional
 class Settings(BaseSettings):
     PROJECT_NAME: str = "WalletFlow API"
     
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0  # 0 sizes from CPUs and database connection limits
+    SERVER_DB_CONNECTION_SHARE: float = 0.8  # of max_connections the API workers may take
+    SERVER_MAX_REQUESTS: int = 10000  # recycle a worker after this many; 0 never
+    SERVER_MAX_REQUESTS_JITTER: int = 1000
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: float = 30.0
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    SERVER_ACCESS_LOG: bool = True
+    
     DATABASE_URL: str
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_HEALTH_CHECK_SECONDS: float = 2.0
+    REPLICA_CONNECT_TIMEOUT_SECONDS: int = 2
+    SHARD_URLS: str = ""
+    SHARD_DIRECTORY_CACHE_SECONDS: int = 30
+    IDENTITY_CACHE_SIZE: int = 100000  # entries per map, per worker
+    IDENTITY_CACHE_NEGATIVE_SECONDS: float = 30.0
+    IDENTITY_CACHE_PREWARM_WALLETS: int = 0  # 0 disables pre-warming
+    IDENTITY_CACHE_PREWARM_DAYS: int = 7
+    WALLET_STRIPE_CACHE_SECONDS: int = 30
+    WALLET_MAX_STRIPES: int = 64
+    SINGLE_FLIGHT_TIMEOUT_SECONDS: float = 10.0  # how long a coalesced read waits
     
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str 
@@ -13,14 +36,70 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_REDIRECT_URI: str
+    GOOGLE_DISCOVERY_URL: str = "https://accounts.google.com/.well-known/openid-configuration"
+    GOOGLE_CERTS_CACHE_SECONDS: int = 3600
     
     PAYSTACK_SECRET_KEY: str
     PAYSTACK_PUBLIC_KEY: str
     PAYSTACK_INITIALIZE_URL: str
     PAYSTACK_VERIFY_URL: str
+    PAYSTACK_MAX_CONCURRENCY: int = 20
+    PAYSTACK_BULKHEAD_WAIT_SECONDS: float = 0.5
+    PAYSTACK_BREAKER_FAILURES: int = 5
+    PAYSTACK_BREAKER_RESET_SECONDS: float = 30.0
+    PAYSTACK_INITIALIZE_BUDGET_SECONDS: float = 10.0
+    PAYSTACK_VERIFY_BUDGET_SECONDS: float = 8.0
+    PAYSTACK_VERIFY_RETRIES: int = 2
+    PAYSTACK_RETRY_BACKOFF_SECONDS: float = 0.2
+    PAYSTACK_HEDGE_AFTER_MS: float = 0  # 0 disables hedged verifies
     
     API_KEY_PREFIX: str
     MAX_API_KEYS_PER_USER: int 
+    ADMIN_API_KEY: Optional[str] = None
+    API_KEY_USAGE_FLUSH_SECONDS: float = 10.0
+    API_KEY_USAGE_FLUSH_BATCH: int = 1000  # rows per upsert statement
+    API_KEY_USAGE_MAX_PENDING: int = 50000  # (key, day, endpoint) counters held per worker
+    
+    MAINTENANCE_ENABLED: bool = True
+    MAINTENANCE_INTERVAL_SECONDS: int = 300
+    MAINTENANCE_BATCH_SIZE: int = 1000
+    MAINTENANCE_MAX_BATCHES: int = 50
+    MAINTENANCE_AUTO_VACUUM: bool = False
+    STALE_DEPOSIT_MAX_AGE_HOURS: int = 24
+    TRANSACTION_PARTITIONS_AHEAD: int = 3
+    TRANSACTION_RETENTION_MONTHS: int = 0  # 0 keeps every partition
+    TRANSACTION_ARCHIVE_MODE: str = "detach"  # detach | export
+    TRANSACTION_ARCHIVE_DIR: str = "archive"
+    
+    SCHEDULED_TRANSFERS_ENABLED: bool = True
+    SCHEDULED_TRANSFER_INTERVAL_SECONDS: int = 60
+    SCHEDULED_TRANSFER_BATCH_SIZE: int = 500
+    SCHEDULED_TRANSFER_WORKERS: int = 4
+    SCHEDULED_TRANSFER_MAX_BATCHES: int = 100  # per worker and wake-up
+    SCHEDULED_TRANSFER_MAX_FAILURES: int = 3  # consecutive, before a standing order is failed
+    
+    EVENT_BROADCAST_BACKEND: str = "local"  # local | postgres
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    SSE_IDLE_TIMEOUT_SECONDS: float = 300.0
+    SSE_QUEUE_SIZE: int = 16
+    SSE_MAX_SUBSCRIBERS: int = 10000
+    
+    PROFILER_ENABLED: bool = False
+    PROFILER_SAMPLE_RATE: float = 0.0
+    PROFILER_INTERVAL_MS: float = 1.0
+    PROFILER_DIR: str = "profiles"
+    PROFILER_MAX_PROFILES: int = 200
+    
+    SQL_INSTRUMENTATION: bool = False
+    SQL_SLOW_QUERY_MS: float = 200.0
+    SQL_EXPLAIN_SLOW_QUERIES: bool = True
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+    SQL_N_PLUS_ONE_MODE: str = "off"  # off | warn | raise
+    SQL_DEBUG_HEADERS: bool = False
+    
+    PROVISIONING_DIR: str = "provisioning"
+    PROVISIONING_BATCH_SIZE: int = 10000
+    PROVISIONING_WORKERS: int = 4
     
     class Config:
         env_file = ".env"
@@ -1,16 +1,184 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from fastapi import Header, Response
+from typing import List, Optional
 from app.config import settings
+import itertools
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
 
 engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def replica_engine(url: str, connect_timeout: int = settings.REPLICA_CONNECT_TIMEOUT_SECONDS) -> Engine:
+    """An unreachable replica fails its probe, and its reads, within connect_timeout instead of hanging"""
+    url = make_url(url)
+    connect_args = {"connect_timeout": connect_timeout} if url.get_backend_name() == "postgresql" else {}
+    return create_engine(url, connect_args=connect_args)
+
+
+replica_engines = [
+    replica_engine(url.strip())
+    for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()
+]
+
 Base = declarative_base()
 
+CONSISTENCY_TOKEN_HEADER = "X-Consistency-Token"
+
+
+def _lsn_to_int(lsn: str) -> int:
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def consistency_token(db: Session) -> Optional[str]:
+    """
+    Position of the primary's WAL after a commit. Returned to clients so
+    their next read is only served by a replica that has replayed it.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    try:
+        lsn = db.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+        db.commit()
+        return lsn
+    except Exception as e:
+        logger.warning(f"Could not read consistency token: {str(e)}")
+        db.rollback()
+        return None
+
+
+def attach_consistency_token(response: Response, db: Session):
+    token = consistency_token(db)
+    if token:
+        response.headers[CONSISTENCY_TOKEN_HEADER] = token
+
+
+class ReplicaRouter:
+    """
+    Pick a replica engine for read-only sessions.
+
+    Each replica's health, replay lag and replayed WAL position are probed
+    at most every REPLICA_HEALTH_CHECK_SECONDS, in a background thread, so
+    a request never waits on a probe: it routes on the last result. Replicas
+    that are down, not probed yet, lag more than REPLICA_MAX_LAG_SECONDS, or
+    have not replayed the caller's consistency token are skipped; with none
+    left the primary is used.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: List[Engine],
+        max_lag_seconds: float = settings.REPLICA_MAX_LAG_SECONDS,
+        check_interval: float = settings.REPLICA_HEALTH_CHECK_SECONDS
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._status = [
+            {"healthy": False, "lag_seconds": None, "replay_lsn": None, "checked_at": 0.0}
+            for _ in replicas
+        ]
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+
+    def _probe(self, replica: Engine) -> dict:
+        status = {"healthy": False, "lag_seconds": None, "replay_lsn": None, "checked_at": time.monotonic()}
+        try:
+            with replica.connect() as conn:
+                if replica.dialect.name == "postgresql":
+                    row = conn.execute(text(
+                        "SELECT "
+                        "  COALESCE(pg_last_wal_replay_lsn(), pg_current_wal_lsn())::text, "
+                        "  CASE WHEN NOT pg_is_in_recovery() "
+                        "         OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                        "       ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                    )).one()
+                    status["replay_lsn"] = _lsn_to_int(row[0])
+                    status["lag_seconds"] = float(row[1] or 0)
+                else:
+                    conn.execute(text("SELECT 1"))
+                    status["lag_seconds"] = 0.0
+            status["healthy"] = True
+        except Exception as e:
+            logger.warning(f"Replica {replica.url.host or replica.url.database} health check failed: {str(e)}")
+        return status
+
+    def _probe_into(self, i: int):
+        status = self._probe(self.replicas[i])
+        with self._lock:
+            self._status[i] = status
+
+    def _refresh(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            for i, status in enumerate(self._status):
+                if now - status["checked_at"] >= self.check_interval:
+                    # Claim the probe so concurrent requests keep using the last result
+                    self._status[i] = {**status, "checked_at": now}
+                    threading.Thread(target=self._probe_into, args=(i,), name=f"replica-probe-{i}", daemon=True).start()
+            return list(self._status)
+
+    def pick(self, token: Optional[str] = None) -> Engine:
+        if not self.replicas:
+            return self.primary
+
+        min_lsn = None
+        if token:
+            try:
+                min_lsn = _lsn_to_int(token)
+            except ValueError:
+                logger.warning(f"Ignoring malformed consistency token: {token}")
+
+        eligible = []
+        for replica, status in zip(self.replicas, self._refresh()):
+            if not status["healthy"] or status["lag_seconds"] > self.max_lag_seconds:
+                continue
+            if min_lsn is not None and (status["replay_lsn"] is None or status["replay_lsn"] < min_lsn):
+                continue
+            eligible.append(replica)
+
+        if not eligible:
+            return self.primary
+        return eligible[next(self._round_robin) % len(eligible)]
+
+    def status(self) -> list:
+        return [
+            {
+                "replica": i,
+                "healthy": status["healthy"],
+                "lag_seconds": status["lag_seconds"],
+            }
+            for i, status in enumerate(self._refresh())
+        ]
+
+
+replica_router = ReplicaRouter(engine, replica_engines)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db(
+    x_consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER)
+):
+    """Session for read-only routes, served by a replica when one is fresh enough"""
+    db = SessionLocal(bind=replica_router.pick(x_consistency_token))
+    try:
+        yield db
+    finally:
+        db.close()
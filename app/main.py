@@ -1,10 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.database import Base, engine
-from app.routes import auth_router, wallet_router, api_keys_router
+from app.database import Base, replica_router
+from app.routes import auth_router, wallet_router, api_keys_router, events_router, profiles_router, admin_router, scheduled_transfers_router
 from starlette.middleware.sessions import SessionMiddleware
 from app.config import settings
+from app.services.maintenance import maintenance_scheduler
+from app.services.scheduled_transfers import scheduled_transfer_executor
+from app.services.partitions import ensure_partitions
+from app.services.event_hub import event_hub
+from app.services.identity_cache import identity_cache
+from app.services.paystack import paystack
+from app.services.api_key_usage import usage_tracker
+from app.sharding import shard_router
+from app.profiling import ProfilingMiddleware
+from app.middleware import RouteScopedMiddleware, ApiKeyFastLane
+from app import sql_instrumentation
 from fastapi.openapi.utils import get_openapi
 import logging
 
@@ -15,18 +26,62 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Set once init_db() has run in this process. app.server runs it in the
+# master before forking, so its workers (and their replacements) skip it
+schema_ready = False
+
+def init_db():
+    """Create missing tables and upcoming transaction partitions on every shard"""
+    global schema_ready
+    for shard_engine in shard_router.engines:
+        Base.metadata.create_all(bind=shard_engine)
+    logger.info("Database tables created")
+    for shard in range(shard_router.shard_count):
+        db = shard_router.session(shard)
+        try:
+            ensure_partitions(db)
+        finally:
+            db.close()
+    schema_ready = True
+
+def prewarm_identity_cache():
+    """Load every shard's busiest recipient wallets; a failure only leaves the cache cold"""
+    for shard in range(shard_router.shard_count):
+        db = shard_router.session(shard)
+        try:
+            loaded = identity_cache.prewarm(db)
+            logger.info(f"Identity cache pre-warmed with {loaded} wallets from shard {shard}")
+        except Exception as e:
+            logger.warning(f"Identity cache pre-warm failed on shard {shard}: {str(e)}")
+        finally:
+            db.close()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting Wallet Service...")
-    try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created")
-    except Exception as e:
-        logger.error(f"Error creating tables: {e}")
-        raise
+    if not schema_ready:
+        try:
+            init_db()
+        except Exception as e:
+            logger.error(f"Error creating tables: {e}")
+            raise
+    
+    if settings.IDENTITY_CACHE_PREWARM_WALLETS > 0:
+        prewarm_identity_cache()
+    event_hub.start()
+    usage_tracker.start()
+    if settings.MAINTENANCE_ENABLED:
+        maintenance_scheduler.start()
+    if settings.SCHEDULED_TRANSFERS_ENABLED:
+        scheduled_transfer_executor.start()
     yield
     
     logger.warning("Shutting down Wallet Service...")
+    await maintenance_scheduler.stop()
+    await scheduled_transfer_executor.stop()
+    await usage_tracker.stop()
+    event_hub.stop()
+    await paystack.aclose()
 
 app = FastAPI(
     title="WalletFlow API",
@@ -40,8 +95,11 @@ app = FastAPI(
 )
 
 
+# Sessions are only used by the OAuth flow; API-key clients skip CORS
 app.add_middleware(
-    SessionMiddleware,
+    RouteScopedMiddleware,
+    middleware=SessionMiddleware,
+    prefixes=("/auth",),
     secret_key=settings.JWT_SECRET_KEY,
     session_cookie="wallet_session",
     max_age=14*24*60*60,
@@ -50,16 +108,29 @@ app.add_middleware(
 )
 
 app.add_middleware(
-    CORSMiddleware,
+    ApiKeyFastLane,
+    middleware=CORSMiddleware,
     allow_origins=["*"],  
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+if settings.SQL_INSTRUMENTATION:
+    sql_instrumentation.install()
+    app.add_middleware(sql_instrumentation.QueryStatsMiddleware)
+
+if settings.PROFILER_ENABLED:
+    # Added last so it is outermost and sees the whole middleware stack
+    app.add_middleware(ProfilingMiddleware)
+
 app.include_router(auth_router)
 app.include_router(wallet_router)
+app.include_router(scheduled_transfers_router)
 app.include_router(api_keys_router)
+app.include_router(events_router)
+app.include_router(profiles_router)
+app.include_router(admin_router)
 
 @app.get("/")
 async def root():
@@ -67,6 +138,8 @@ async def root():
 
 @app.get("/kaithheathcheck") #did this because of leapcell
 @app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+def health_check():
+    if not replica_router.replicas:
+        return {"status": "healthy"}
+    return {"status": "healthy", "replicas": replica_router.status()}
 
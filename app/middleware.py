@@ -0,0 +1,60 @@
+"""
+Route-aware wrappers for Starlette middleware.
+
+Every layer in app.add_middleware() runs on every request. Machine
+clients calling /wallet/* with an x-api-key never use the session cookie
+or CORS, so these wrappers only call the wrapped middleware when the
+request needs it:
+
+  RouteScopedMiddleware - only for paths under the given prefixes
+                          (SessionMiddleware under /auth)
+  ApiKeyFastLane        - skipped for x-api-key requests without an
+                          Origin header (CORSMiddleware)
+
+Both are pure ASGI and add no work beyond a header or prefix check.
+"""
+from typing import Iterable
+
+
+def _has_header(scope, name: bytes) -> bool:
+    for key, _ in scope["headers"]:
+        if key == name:
+            return True
+    return False
+
+
+class RouteScopedMiddleware:
+    """Run `middleware` only for requests whose path is under one of `prefixes`"""
+
+    def __init__(self, app, middleware, prefixes: Iterable[str], **options):
+        self.app = app
+        self.scoped = middleware(app, **options)
+        self.prefixes = tuple(prefix.rstrip("/") for prefix in prefixes)
+
+    def applies(self, path: str) -> bool:
+        for prefix in self.prefixes:
+            if path == prefix or path.startswith(prefix + "/"):
+                return True
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and self.applies(scope["path"]):
+            return await self.scoped(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+
+class ApiKeyFastLane:
+    """Bypass `middleware` for server-to-server requests authenticated by x-api-key.
+
+    Browsers always send Origin on cross-origin and preflight requests, so
+    a request with an API key and no Origin has nothing for CORS to do.
+    """
+
+    def __init__(self, app, middleware, **options):
+        self.app = app
+        self.wrapped = middleware(app, **options)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and _has_header(scope, b"x-api-key") and not _has_header(scope, b"origin"):
+            return await self.app(scope, receive, send)
+        return await self.wrapped(scope, receive, send)
@@ -1,6 +1,9 @@
 from app.models.user import User
-from app.models.wallet import Wallet
-from app.models.transactions import Transaction
-from app.models.api_key import APIKey
+from app.models.wallet import Wallet, WalletStripe
+from app.models.transactions import Transaction, Posting, TransactionArchiveTotal, TransactionReference
+from app.models.api_key import APIKey, APIKeyUsage
+from app.models.shard import UserShard, CrossShardTransfer
+from app.models.ledger_event import LedgerEvent
+from app.models.scheduled_transfer import ScheduledTransfer
 
-__all__ = ["User", "Wallet", "Transaction", "APIKey"]
\ No newline at end of file
+__all__ = ["User", "Wallet", "WalletStripe", "Transaction", "Posting", "TransactionArchiveTotal", "TransactionReference", "APIKey", "APIKeyUsage", "UserShard", "CrossShardTransfer", "LedgerEvent", "ScheduledTransfer"]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Boolean, func, JSON
+from sqlalchemy import Column, String, ForeignKey, Boolean, Integer, BigInteger, Date, Index, func
 from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
 import uuid
 from app.database import Base
@@ -12,10 +12,26 @@ class APIKey(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     name = Column(String, nullable=False)
     key = Column(String, unique=True, index=True, nullable=False)
-    permissions = Column(JSON, nullable=False)  
+    permission_mask = Column(Integer, nullable=False, default=0)
     is_active = Column(Boolean, default=True)
     expires_at = Column(TIMESTAMP(timezone=True))
+    revoked_at = Column(TIMESTAMP(timezone=True), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     
     user = relationship("User", back_populates="api_keys")
-    
\ No newline at end of file
+
+    __table_args__ = (
+        Index("ix_api_keys_user_active_expiry", "user_id", "is_active", "expires_at"),
+    )
+
+
+class APIKeyUsage(Base):
+    """Requests per key, UTC day and endpoint; upserted in bulk by app.services.api_key_usage"""
+    __tablename__ = "api_key_usage"
+    
+    # No foreign key: a counter for a since-deleted key must not fail a whole flush
+    api_key_id = Column(UUID(as_uuid=True), primary_key=True)
+    day = Column(Date, primary_key=True)
+    endpoint = Column(String, primary_key=True)  # "GET /wallet/balance"
+    request_count = Column(BigInteger, nullable=False, default=0)
+    last_used_at = Column(TIMESTAMP(timezone=True), nullable=False)
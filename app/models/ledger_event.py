@@ -0,0 +1,47 @@
+from sqlalchemy import Column, String, Float, BigInteger, Integer, Enum, Index, func
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from app.database import Base
+from app.models.transactions import TransactionType, TransactionStatus
+
+
+class current_txid(FunctionElement):
+    """Id of the inserting DB transaction, rendered inline in the INSERT"""
+    type = BigInteger()
+    inherit_cache = True
+
+
+@compiles(current_txid)
+def _current_txid_default(element, compiler, **kw):
+    # Single-writer databases (SQLite) commit in id order already
+    return "0"
+
+
+@compiles(current_txid, "postgresql")
+def _current_txid_postgresql(element, compiler, **kw):
+    return "pg_current_xact_id()::text::bigint"
+
+
+class LedgerEvent(Base):
+    """
+    Outbox row written in the same DB transaction as every Transaction insert
+    or status change. Served in (txid, id) order by GET /events.
+    """
+    __tablename__ = "ledger_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    txid = Column(BigInteger, nullable=False, default=current_txid())
+    event_type = Column(String, nullable=False)  # transaction.created | transaction.status_changed
+    transaction_id = Column(UUID(as_uuid=True), nullable=False)
+    reference = Column(String, nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    wallet_id = Column(UUID(as_uuid=True), nullable=False)
+    transaction_type = Column(Enum(TransactionType), nullable=False)
+    status = Column(Enum(TransactionStatus), nullable=False)
+    amount = Column(Float, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_ledger_events_txid_id", "txid", "id"),
+    )
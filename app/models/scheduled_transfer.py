@@ -0,0 +1,52 @@
+from sqlalchemy import Column, String, Float, Integer, Text, Enum, ForeignKey, Index, func
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
+import uuid
+import enum
+from app.database import Base
+
+
+class Recurrence(str, enum.Enum):
+    ONCE = "once"
+    DAILY = "daily"
+    WEEKLY = "weekly"
+    MONTHLY = "monthly"
+
+
+class ScheduledTransferStatus(str, enum.Enum):
+    ACTIVE = "active"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+
+
+class ScheduledTransfer(Base):
+    """
+    A one-off or standing transfer order, kept on the sender's shard and run
+    by app/services/scheduled_transfers.py. Occurrence n is due at
+    starts_at + n * recurrence; `runs` counts the ones that moved money.
+    """
+    __tablename__ = "scheduled_transfers"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False, index=True)
+    wallet_id = Column(UUID(as_uuid=True), ForeignKey('wallets.id'), nullable=False)
+    recipient_wallet_number = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    description = Column(Text, nullable=True)
+    recurrence = Column(Enum(Recurrence), nullable=False, default=Recurrence.ONCE)
+    starts_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    next_run_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    occurrence = Column(Integer, nullable=False, default=0)
+    max_runs = Column(Integer, nullable=True)  # None: until cancelled
+    runs = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    status = Column(Enum(ScheduledTransferStatus), nullable=False, default=ScheduledTransferStatus.ACTIVE)
+    last_run_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # The executor's claim: active rows by next_run_at
+        Index("ix_scheduled_transfers_due", "status", "next_run_at"),
+    )
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, String, Float, Integer, Text, func
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
+import uuid
+from app.database import Base
+
+
+class UserShard(Base):
+    """Directory row on shard 0: which shard holds a user's wallet and history"""
+    __tablename__ = "user_shards"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    wallet_number = Column(String, unique=True, index=True, nullable=False)
+    shard = Column(Integer, nullable=False, default=0)
+    state = Column(String, nullable=False, default="active")  # active | moving
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CrossShardTransfer(Base):
+    """
+    Outbox row written on the sender's shard in the same transaction as the
+    debit. A relay credits the recipient's shard and marks it delivered; the
+    recipient transaction reuses `reference`, which makes delivery idempotent.
+    """
+    __tablename__ = "cross_shard_transfers"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    reference = Column(String, unique=True, index=True, nullable=False)
+    sender_user_id = Column(UUID(as_uuid=True), nullable=False)
+    sender_wallet_number = Column(String, nullable=False)
+    recipient_wallet_number = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)  # pending | delivered
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    delivered_at = Column(TIMESTAMP(timezone=True), nullable=True)
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, String, Float, Text, Enum, ForeignKey, func
-from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
+from sqlalchemy import Column, String, Float, Integer, Text, Enum, ForeignKey, Index, JSON, event, func
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP, JSONB
 import uuid
 import enum
+from datetime import datetime, timezone
 from app.database import Base
 from sqlalchemy.orm import relationship
 
@@ -16,6 +17,18 @@ class TransactionType(str, enum.Enum):
     WITHDRAWAL = "withdrawal"
     
 class Transaction(Base):
+    """
+    A journal entry: one row per economic event (deposit, transfer,
+    withdrawal), whose money movements are its Postings. user_id/wallet_id
+    are the party that started it; a transfer's header names both wallets
+    in sender_wallet_id/recipient_wallet_id and transaction_data.
+
+    On Postgres the table is range-partitioned by month on created_at
+    (app/services/partitions.py), so created_at is part of the primary key.
+    A unique constraint here would have to include it too, so references
+    are kept unique by TransactionReference instead. There is no default
+    partition: an insert past the last monthly partition fails.
+    """
     __tablename__ = "transactions"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
@@ -28,12 +41,90 @@ class Transaction(Base):
     recipient_wallet_id = Column(UUID(as_uuid=True), ForeignKey('wallets.id'), nullable=True)
     sender_wallet_id = Column(UUID(as_uuid=True), ForeignKey('wallets.id'), nullable=True)
     description = Column(Text)
-    reference = Column(String, unique=True, index=True, nullable=False)
-    transaction_data = Column(Text, nullable=True)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    reference = Column(String, nullable=False)
+    transaction_data = Column(JSONB().with_variant(JSON(), "sqlite"), nullable=True)
+    # Set client-side too: as part of the primary key the ORM needs it before the INSERT
+    created_at = Column(TIMESTAMP(timezone=True), primary_key=True, default=lambda: datetime.now(timezone.utc), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
     
     user = relationship("User", back_populates="transactions")
     wallet = relationship("Wallet", back_populates="primary_transactions", foreign_keys=[wallet_id])
     recipient_wallet = relationship("Wallet", back_populates="received_transactions", foreign_keys=[recipient_wallet_id])
-    sender_wallet = relationship("Wallet", back_populates="sent_transactions",  foreign_keys=[sender_wallet_id])
\ No newline at end of file
+    sender_wallet = relationship("Wallet", back_populates="sent_transactions",  foreign_keys=[sender_wallet_id])
+
+    __table_args__ = (
+        Index("ix_transactions_type_status_created", "transaction_type", "status", "created_at"),
+        # History filters on the entry (app/services/transaction_history.py)
+        Index("ix_transactions_reference_prefix", "reference", postgresql_ops={"reference": "text_pattern_ops"}),
+        Index("ix_transactions_data", "transaction_data", postgresql_using="gin", postgresql_ops={"transaction_data": "jsonb_path_ops"}),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class Posting(Base):
+    """
+    One wallet's side of a journal entry: signed amount, credits positive.
+    A same-shard transfer has a debit and a credit posting that sum to
+    zero; deposits and withdrawals have one (the other side is Paystack).
+    Each shard of a cross-shard transfer holds its own entry with its side.
+
+    Fixed-width on purpose, since this is the largest table: descriptions,
+    references and provider data stay on the entry. transaction_type is
+    copied from the entry (it never changes) for the history type filter;
+    status is not, as deposits change it. Partitioned like transactions.
+    """
+    __tablename__ = "postings"
+
+    # The primary key doubles as the history index: a wallet's postings, newest first
+    wallet_id = Column(UUID(as_uuid=True), ForeignKey('wallets.id'), primary_key=True)
+    created_at = Column(TIMESTAMP(timezone=True), primary_key=True)  # the entry's
+    transaction_id = Column(UUID(as_uuid=True), primary_key=True)
+    amount = Column(Float, nullable=False)
+    transaction_type = Column(Enum(TransactionType), nullable=False)
+
+    __table_args__ = (
+        Index("ix_postings_wallet_type_created", "wallet_id", "transaction_type", "created_at"),
+        Index("ix_postings_wallet_amount", "wallet_id", "amount"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class TransactionReference(Base):
+    """
+    Every entry's reference, in one unpartitioned table, so a reference is
+    unique across all months: inserting an entry with a taken reference
+    fails on this primary key. Written with the entry (add_entry,
+    reference_rows). Rows outlive archived partitions, so an archived
+    reference is never reused.
+    """
+    __tablename__ = "transaction_references"
+
+    reference = Column(String, primary_key=True)
+    transaction_id = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)  # the entry's, to find its partition
+
+
+@event.listens_for(Transaction.__table__, "after_create")
+@event.listens_for(Posting.__table__, "after_create")
+def _create_initial_partitions(target, connection, **kw):
+    if connection.dialect.name != "postgresql":
+        return
+    from app.services.partitions import create_partition, partition_months  # services import this module
+
+    for month in partition_months():
+        create_partition(connection, month, target.name)
+
+
+
+class TransactionArchiveTotal(Base):
+    """
+    Per-wallet successful totals of an archived transactions partition, so
+    reconciliation still balances once those rows leave the table.
+    """
+    __tablename__ = "transaction_archive_totals"
+
+    partition = Column(String, primary_key=True)
+    wallet_id = Column(UUID(as_uuid=True), primary_key=True)
+    amount = Column(Float, nullable=False)  # signed: credits minus debits
+    transactions = Column(Integer, nullable=False)
+    archived_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
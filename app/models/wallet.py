@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Float, ForeignKey, func
+from sqlalchemy import Column, String, DateTime, Float, ForeignKey, Integer, BigInteger, func
 from app.database import Base
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -10,6 +10,8 @@ class Wallet(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), index=True, unique=True, nullable=False)
     wallet_number = Column(String, unique=True, index=True, nullable=False)
     balance = Column(Float, default=0.0)
+    # Bumped with every balance or history change; ETags of the wallet's reads
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -17,4 +19,17 @@ class Wallet(Base):
     primary_transactions = relationship("Transaction", back_populates="wallet", foreign_keys="Transaction.wallet_id")
     received_transactions = relationship("Transaction", back_populates="recipient_wallet", foreign_keys="Transaction.recipient_wallet_id")
     sent_transactions = relationship("Transaction", back_populates="sender_wallet", foreign_keys="Transaction.sender_wallet_id")
-    
\ No newline at end of file
+
+
+class WalletStripe(Base):
+    """
+    One slice of a striped wallet's balance. Credits to a hot wallet land on
+    a random stripe instead of its wallets row, so they don't all queue on
+    one row lock. The wallet's balance is wallets.balance plus its stripes.
+    """
+    __tablename__ = "wallet_stripes"
+    wallet_id = Column(UUID(as_uuid=True), ForeignKey('wallets.id'), primary_key=True)
+    stripe = Column(Integer, primary_key=True)
+    balance = Column(Float, nullable=False, default=0.0)
+    # Credits bump the stripe's version; the wallet's is wallets.version plus these
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
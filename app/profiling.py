@@ -0,0 +1,191 @@
+"""
+Opt-in per-request sampling profiler.
+
+With PROFILER_ENABLED the ProfilingMiddleware profiles a request when
+either of these holds:
+  - a random draw falls under PROFILER_SAMPLE_RATE, or
+  - the request carries `x-profile: 1` plus a valid `x-admin-key`.
+
+While the request runs, a sampler thread records the event loop
+thread's stack every PROFILER_INTERVAL_MS. The result is written to
+PROFILER_DIR in collapsed-stack format: one "frame;frame;frame count" line
+per stack, readable by flamegraph.pl, speedscope and inferno. Only the
+newest PROFILER_MAX_PROFILES profiles are kept.
+
+Only the loop thread is sampled, so work in the threadpool is not
+attributed. Under concurrency the samples also include other requests
+sharing the loop. Profiles are written from the threadpool, off the loop.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+from app.config import settings
+from app.auth.admin_auth import is_admin_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+_PROFILE_ID = re.compile(r"^[0-9]+-[0-9a-f]{8}$")
+
+
+class StackSampler:
+    """Background thread sampling one thread's Python stack"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+class ProfileStore:
+    """Collapsed-stack files plus a JSON sidecar each, rotated by count"""
+
+    def __init__(self, directory: str = settings.PROFILER_DIR, max_profiles: int = settings.PROFILER_MAX_PROFILES):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        return f"{time.time_ns() // 1_000_000}-{secrets.token_hex(4)}"
+
+    def path(self, profile_id: str, suffix: str = ".folded") -> Optional[str]:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def save(self, profile_id: str, samples: Counter, meta: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(profile_id), "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(self.path(profile_id, ".json"), "w") as f:
+            json.dump({"id": profile_id, "samples": sum(samples.values()), **meta}, f)
+        self._rotate()
+
+    def _ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        ids = [name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json")]
+        return sorted((i for i in ids if _PROFILE_ID.match(i)), key=lambda i: int(i.split("-")[0]), reverse=True)
+
+    def _rotate(self):
+        with self._lock:
+            for profile_id in self._ids()[self.max_profiles:]:
+                for suffix in (".folded", ".json"):
+                    try:
+                        os.remove(self.path(profile_id, suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def recent(self, limit: int = 50) -> List[dict]:
+        profiles = []
+        for profile_id in self._ids()[:limit]:
+            try:
+                with open(self.path(profile_id, ".json")) as f:
+                    profiles.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return profiles
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; requests that are not picked pass straight through"""
+
+    def __init__(self, app, sample_rate: float = settings.PROFILER_SAMPLE_RATE, interval_ms: float = settings.PROFILER_INTERVAL_MS, store: ProfileStore = profile_store):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.store = store
+
+    def _requested(self, scope) -> Optional[str]:
+        requested = False
+        admin_key = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                requested = value == b"1"
+            elif name == b"x-admin-key":
+                admin_key = value.decode("latin-1")
+        if requested and is_admin_key(admin_key):
+            return "header"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trigger = self._requested(scope)
+        if trigger is None and self.sample_rate and random.random() < self.sample_rate:
+            trigger = "sampled"
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        profile_id = self.store.new_id()
+        response = {"status": None}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            samples = sampler.stop()
+            duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            try:
+                await asyncio.to_thread(self.store.save, profile_id, samples, {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": response["status"],
+                    "duration_ms": duration_ms,
+                    "trigger": trigger,
+                    "interval_ms": self.interval * 1000,
+                    "created_at": time.time(),
+                })
+            except OSError as e:
+                logger.error(f"Failed to save profile {profile_id}: {str(e)}")
@@ -3,10 +3,18 @@
 from app.routes.auth import router as auth_router
 from app.routes.api_keys import router as api_keys_router
 from app.routes.wallet import router as wallet_router
+from app.routes.events import router as events_router
+from app.routes.profiles import router as profiles_router
+from app.routes.admin import router as admin_router
+from app.routes.scheduled_transfers import router as scheduled_transfers_router
 
 __all__ = [
     "auth_router",
     "api_keys_router",
     "wallet_router",
+    "events_router",
+    "profiles_router",
+    "admin_router",
+    "scheduled_transfers_router",
     "paystack_router",
 ]
\ No newline at end of file
@@ -0,0 +1,104 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from app.auth.admin_auth import require_admin
+from app.services.paystack import paystack
+from app.services.event_hub import event_hub
+from app.services.maintenance import maintenance_scheduler
+from app.services.scheduled_transfers import scheduled_transfer_executor
+from app.services.identity_cache import identity_cache
+from app.services.single_flight import single_flight
+from app.services.api_key_usage import usage_tracker
+from app.services.striping import WALLET_BALANCE, set_stripes
+from app.models.wallet import Wallet
+from app.schemas.wallet import WalletStripesRequest, WalletStripesResponse
+from app.sharding import shard_router
+from app.services.provisioning import provisioning_jobs, FORMATS, ProvisioningError
+from app.worker_stats import worker_stats
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/metrics")
+def get_metrics():
+    """In-process counters for this worker, plus every worker's when run by app.server"""
+    return {
+        "server": {"pid": os.getpid(), "workers": worker_stats()},
+        "paystack": paystack.stats(),
+        "event_hub": {"subscribers": event_hub.subscribers, **event_hub.metrics},
+        "maintenance": maintenance_scheduler.metrics,
+        "scheduled_transfers": scheduled_transfer_executor.metrics,
+        "identity_cache": identity_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "api_key_usage": usage_tracker.stats(),
+    }
+
+@router.put("/wallets/{wallet_number}/stripes", response_model=WalletStripesResponse)
+def set_wallet_stripes(wallet_number: str, body: WalletStripesRequest):
+    """
+    Split a hot wallet's balance over N sub-balance rows so concurrent
+    credits don't queue on one row lock; 0 folds it back into one row.
+    Other workers start striping credits within WALLET_STRIPE_CACHE_SECONDS.
+    """
+    shard, _, state = shard_router.locate_wallet(wallet_number)
+    if state == "moving":
+        raise HTTPException(status_code=503, detail="Wallet is being migrated, retry shortly")
+
+    db = shard_router.session(shard)
+    try:
+        wallet = db.query(Wallet.id).filter(Wallet.wallet_number == wallet_number).first()
+        if not wallet:
+            raise HTTPException(status_code=404, detail="Wallet not found")
+        set_stripes(db, wallet.id, body.stripes)
+        db.commit()
+        balance = db.query(WALLET_BALANCE).filter(Wallet.id == wallet.id).scalar()
+    finally:
+        db.close()
+
+    logger.info(f"Wallet {wallet_number} on shard {shard} now has {body.stripes} stripes")
+    return WalletStripesResponse(wallet_number=wallet_number, shard=shard, stripes=body.stripes, balance=balance)
+
+@router.post("/provisioning", status_code=202)
+async def start_provisioning(request: Request, format: str = Query("csv", enum=list(FORMATS))):
+    """
+    Bulk-provision users and wallets. The request body is the raw CSV or
+    NDJSON export; it is spooled to disk and loaded in the background.
+    """
+    job_id = provisioning_jobs.new_id()
+    paths = provisioning_jobs.paths(job_id, format)
+    os.makedirs(provisioning_jobs.directory, exist_ok=True)
+
+    size = 0
+    with open(paths["source"], "wb") as f:
+        async for chunk in request.stream():
+            f.write(chunk)
+            size += len(chunk)
+    if not size:
+        os.remove(paths["source"])
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+    logger.info(f"Provisioning job {job_id}: {size} bytes of {format}")
+    return provisioning_jobs.start(job_id, format)
+
+@router.get("/provisioning/{job_id}")
+def get_provisioning_job(job_id: str):
+    """Status and progress of a provisioning job"""
+    try:
+        job = provisioning_jobs.find(job_id)
+    except ProvisioningError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Provisioning job not found")
+    return job
+
+@router.post("/provisioning/{job_id}/resume", status_code=202)
+def resume_provisioning_job(job_id: str):
+    """Continue a failed or interrupted job from its checkpoint"""
+    job = get_provisioning_job(job_id)
+    if job["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Provisioning job already completed")
+    try:
+        return provisioning_jobs.start(job_id, job["format"], resume=True)
+    except ProvisioningError as e:
+        raise HTTPException(status_code=409, detail=str(e))
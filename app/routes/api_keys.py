@@ -1,15 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from app.schemas.api_key import APIKeyCreate, APIKeyResponse, APIKeyRollover
 from app.auth.jwt_auth import get_current_user_or_api_key
 from app.auth.api_key_auth import create_api_key, revoke_api_key, rollover_api_key, list_user_api_keys
-from app.database import get_db
+from app.database import get_db, get_read_db, attach_consistency_token
 
 router = APIRouter(prefix="/keys", tags=["api-keys"])
 
 @router.post("/create", response_model=APIKeyResponse)
 async def api_key(
     api_key_data: APIKeyCreate,
+    response: Response,
     auth: tuple = Depends(get_current_user_or_api_key),
     db: Session = Depends(get_db)
 ):
@@ -24,6 +25,7 @@ async def api_key(
             permissions=api_key_data.permissions,
             expiry_str=api_key_data.expiry
         )
+        attach_consistency_token(response, db)
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -31,6 +33,7 @@ async def api_key(
 @router.post("/revoke/{key_id}")
 async def api_key_revoke(
     key_id: str,
+    response: Response,
     auth: tuple = Depends(get_current_user_or_api_key),
     db: Session = Depends(get_db)
 ):
@@ -42,12 +45,14 @@ async def api_key_revoke(
     if not success:
         raise HTTPException(status_code=404, detail="API key not found or already revoked")
     
+    attach_consistency_token(response, db)
     return {"message": "API key revoked successfully"}
 
 
 @router.post("/rollover", response_model=APIKeyResponse)
 async def api_key_rollover(
     rollover_data: APIKeyRollover,
+    response: Response,
     auth: tuple = Depends(get_current_user_or_api_key),
     db: Session = Depends(get_db)
 ):
@@ -61,6 +66,7 @@ async def api_key_rollover(
             expired_key_id=rollover_data.expired_key_id,
             expiry_str=rollover_data.expiry
         )
+        attach_consistency_token(response, db)
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -68,7 +74,7 @@ async def api_key_rollover(
 @router.get("/all")
 async def list_api_keys(
     auth: tuple = Depends(get_current_user_or_api_key),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """List all API keys for the current user"""
     user_id, _ = auth
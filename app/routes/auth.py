@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.auth.google_oauth import oauth, generate_google_auth_url
+from app.auth.google_oauth import (
+    oauth,
+    generate_google_auth_url,
+    google_id_token_verifier,
+    GOOGLE_TOKEN_URL,
+)
 from app.auth.jwt_auth import create_access_token
 from app.models.user import User
-from app.models.wallet import Wallet
-import uuid
+from app.sharding import provision_wallet
 import httpx
+import jwt
 from app.schemas.user import Token, GoogleAuthURL
 from app.config import settings
 import urllib.parse
@@ -39,7 +44,7 @@ async def google_callback(
         logger.info(f"Using redirect_uri: {settings.GOOGLE_REDIRECT_URI}")
         async with httpx.AsyncClient(timeout=30.0) as client:
             token_response = await client.post(
-                'https://oauth2.googleapis.com/token',
+                GOOGLE_TOKEN_URL,
                 params={
                     'code': code,
                     'client_id': settings.GOOGLE_CLIENT_ID,
@@ -56,19 +61,17 @@ async def google_callback(
         token_data = token_response.json()
         logger.info(f"Token data received from Google")
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            userinfo_response = await client.get(
-                'https://www.googleapis.com/oauth2/v3/userinfo',
-                headers={'Authorization': f"Bearer {token_data['access_token']}"}
-            )
-        
-        if userinfo_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get user info")
+        if not token_data.get('id_token'):
+            raise HTTPException(status_code=400, detail="id_token missing from Google response")
         
-        user_info = userinfo_response.json()
+        try:
+            user_info = await google_id_token_verifier.verify(token_data['id_token'])
+        except jwt.InvalidTokenError as e:
+            logger.error(f"Google id_token verification failed: {e}")
+            raise HTTPException(status_code=400, detail="Invalid Google id_token")
         
-        google_id = user_info['sub']
-        email = user_info['email']
+        google_id = user_info.get('sub')
+        email = user_info.get('email')
         
         if not google_id:
             logger.error("Google ID (sub) missing from user info")
@@ -99,12 +102,7 @@ async def google_callback(
             db.refresh(user)
             logger.info(f"New user created: {email}")
             
-            wallet = Wallet(
-                user_id=user.id,
-                wallet_number=str(uuid.uuid4().int)[:13]  
-        )
-            db.add(wallet)
-            db.commit()
+            provision_wallet(db, user)
             logger.info(f"New user wallet created: {email}")
             
         else:
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from typing import Optional
+from app.auth.admin_auth import require_admin
+from app.services.ledger_events import read_feed, FEED_COLUMNS
+from app.sharding import shard_router
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/events", tags=["events"], dependencies=[Depends(require_admin)])
+
+@router.get("", response_class=ORJSONResponse)
+def get_events(
+    after: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    limit: int = Query(500, ge=1, le=5000),
+    shard: int = Query(0, ge=0, description="Shard to read when SHARD_URLS is set")
+):
+    """
+    Ledger change feed in commit-safe order.
+
+    Rows are returned column-wise compact: `columns` names the fields once and
+    each entry of `events` is a positional array. Keep `next_cursor` and pass it
+    back as `after` to continue.
+    """
+    if shard >= shard_router.shard_count:
+        raise HTTPException(status_code=400, detail=f"Unknown shard: {shard}")
+    
+    db = shard_router.session(shard)
+    try:
+        events, next_cursor = read_feed(db, after, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    finally:
+        db.close()
+    
+    return ORJSONResponse({
+        "columns": FEED_COLUMNS,
+        "events": events,
+        "next_cursor": next_cursor,
+        "has_more": len(events) == limit,
+        "shard_count": shard_router.shard_count,
+    })
@@ -0,0 +1,24 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from app.auth.admin_auth import require_admin
+from app.profiling import profile_store
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/profiles", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("")
+def list_profiles(limit: int = Query(50, ge=1, le=500)):
+    """Most recent request profiles, newest first"""
+    return {"profiles": profile_store.recent(limit)}
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str):
+    """Collapsed-stack profile, ready for flamegraph.pl or speedscope"""
+    path = profile_store.path(profile_id)
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
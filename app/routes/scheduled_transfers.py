@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+import uuid
+from datetime import datetime, timezone
+from app.auth.jwt_auth import get_current_user_or_api_key, check_permissions
+from app.auth.permissions import Permission
+from app.models.wallet import Wallet
+from app.models.scheduled_transfer import ScheduledTransfer, ScheduledTransferStatus
+from app.schemas.wallet import ScheduledTransferRequest, ScheduledTransferResponse
+from app.database import attach_consistency_token
+from app.sharding import shard_router, get_wallet_db, get_wallet_read_db
+from app.services.identity_cache import identity_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/wallet/scheduled-transfers", tags=["scheduled-transfers"])
+
+
+def _recipient_user_id(db: Session, wallet_number: str):
+    """Owner of a recipient wallet on any shard, or None"""
+    recipient_shard, recipient_user_id, _ = shard_router.locate_wallet(wallet_number)
+    if recipient_user_id is not None:
+        return recipient_user_id
+
+    shard_db = db if recipient_shard == db.info.get("shard", 0) else shard_router.session(recipient_shard)
+    try:
+        recipient = identity_cache.wallet(shard_db, wallet_number)
+        return recipient.user_id if recipient else None
+    finally:
+        if shard_db is not db:
+            shard_db.close()
+
+
+@router.post("", response_model=ScheduledTransferResponse, status_code=201)
+async def create_scheduled_transfer(
+    transfer_data: ScheduledTransferRequest,
+    response: Response,
+    auth: tuple = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_wallet_db)
+):
+    """Schedule a one-off or recurring transfer from the caller's wallet"""
+    user_id, permissions = auth
+
+    check_permissions(Permission.TRANSFER, permissions)
+
+    sender_wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
+    if not sender_wallet:
+        raise HTTPException(status_code=404, detail="Sender wallet not found")
+
+    now = datetime.now(timezone.utc)
+    start_at = transfer_data.start_at or now
+    if start_at.tzinfo is None:
+        start_at = start_at.replace(tzinfo=timezone.utc)
+    if start_at < now and transfer_data.start_at is not None:
+        raise HTTPException(status_code=400, detail="start_at must not be in the past")
+
+    recipient_user_id = _recipient_user_id(db, transfer_data.wallet_number)
+    if recipient_user_id is None:
+        raise HTTPException(status_code=404, detail="Recipient wallet not found")
+    if str(recipient_user_id) == str(user_id):
+        raise HTTPException(status_code=400, detail="Cannot transfer to yourself")
+
+    scheduled = ScheduledTransfer(
+        user_id=sender_wallet.user_id,
+        wallet_id=sender_wallet.id,
+        recipient_wallet_number=transfer_data.wallet_number,
+        amount=float(transfer_data.amount),
+        description=transfer_data.description,
+        recurrence=transfer_data.recurrence,
+        starts_at=start_at,
+        next_run_at=start_at,
+        max_runs=transfer_data.max_runs,
+    )
+    db.add(scheduled)
+    db.commit()
+    db.refresh(scheduled)
+    attach_consistency_token(response, db)
+
+    return ScheduledTransferResponse.model_validate(scheduled)
+
+
+@router.get("", response_model=list[ScheduledTransferResponse])
+async def list_scheduled_transfers(
+    include_finished: bool = False,
+    auth: tuple = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_wallet_read_db)
+):
+    """The caller's scheduled transfers, next due first"""
+    user_id, permissions = auth
+
+    check_permissions(Permission.READ, permissions)
+
+    query = db.query(ScheduledTransfer).filter(ScheduledTransfer.user_id == user_id)
+    if not include_finished:
+        query = query.filter(ScheduledTransfer.status == ScheduledTransferStatus.ACTIVE)
+
+    return [
+        ScheduledTransferResponse.model_validate(scheduled)
+        for scheduled in query.order_by(ScheduledTransfer.next_run_at).limit(1000)
+    ]
+
+
+@router.delete("/{transfer_id}", response_model=ScheduledTransferResponse)
+async def cancel_scheduled_transfer(
+    transfer_id: uuid.UUID,
+    response: Response,
+    auth: tuple = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_wallet_db)
+):
+    """Cancel an active scheduled transfer; runs already made are kept"""
+    user_id, permissions = auth
+
+    check_permissions(Permission.TRANSFER, permissions)
+
+    # Waits for the executor if it holds the row, so a cancel never races a run
+    scheduled = db.query(ScheduledTransfer).filter(
+        ScheduledTransfer.id == transfer_id,
+        ScheduledTransfer.user_id == user_id
+    ).with_for_update().first()
+    if not scheduled:
+        raise HTTPException(status_code=404, detail="Scheduled transfer not found")
+    if scheduled.status != ScheduledTransferStatus.ACTIVE:
+        raise HTTPException(status_code=409, detail=f"Scheduled transfer is already {scheduled.status.value}")
+
+    scheduled.status = ScheduledTransferStatus.CANCELLED
+    db.commit()
+    db.refresh(scheduled)
+    attach_consistency_token(response, db)
+
+    return ScheduledTransferResponse.model_validate(scheduled)
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Response, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-import json
 import uuid
+import hashlib
+from datetime import datetime
+from typing import Optional
 from app.auth.jwt_auth import get_current_user_or_api_key, check_permissions
 from app.auth.api_key_auth import generate_id
+from app.auth.permissions import Permission
 from app.models.wallet import Wallet
 from app.models.transactions import TransactionType, TransactionStatus, Transaction
-from app.models.user import User
 from app.schemas.wallet import (
     DepositStatusResponse, 
     DepositResponse, 
@@ -17,25 +22,42 @@ from app.schemas.wallet import (
     TransactionResponse
 )
     
-from app.services.paystack import paystack
-from app.database import get_db
+from app.services.paystack import paystack, PaystackUnavailable
+from app.database import get_db, attach_consistency_token, CONSISTENCY_TOKEN_HEADER
+from app.sharding import shard_router, get_wallet_db, get_wallet_read_db, deliver_cross_shard_transfer
+from app.models.shard import CrossShardTransfer
+from app.services.journal import add_entry, transfer_data as transfer_data_for
+from app.services.identity_cache import identity_cache
+from app.services.striping import WALLET_BALANCE, WALLET_VERSION, striped_wallets, credit, debit, lock_wallets, touch
+from app.services.single_flight import single_flight, SingleFlightTimeout
+from app.services.transaction_history import TransactionFilters, read_history
+from app.services.partitions import recent_first
+from app.services.event_hub import event_hub, publish_transaction, transaction_event, format_sse, FINAL_STATUSES
+from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/wallet", tags=["wallet"])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Page size when `after` is given without `limit`
+HISTORY_PAGE_SIZE = 100
+# Clients may keep the body but must revalidate it with If-None-Match
+ETAG_CACHE_CONTROL = "private, no-cache"
+
 @router.post("/deposit", response_model=DepositResponse)
 async def deposit(
     deposit_data: DepositRequest,
     request: Request,
+    response: Response,
     auth: tuple = Depends(get_current_user_or_api_key),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_wallet_db)
 ):
     """Initialize a Paystack deposit"""
     user_id, permissions = auth
     
-    check_permissions(["deposit"], permissions)
+    check_permissions(Permission.DEPOSIT, permissions)
     
     wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
     if not wallet:
@@ -46,30 +68,47 @@ async def deposit(
     if deposit_data.amount <= 100:
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     
+    wallet_id = wallet.id
+    email = identity_cache.email(db, user_id)
+    if not email:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Hand the pooled connection back while we wait on Paystack
+    db.commit()
+    
     try:
         result = await paystack.initialize_transaction(
-            email=db.query(User).filter(User.id == user_id).first().email,
+            email=email,
             amount=deposit_data.amount,
-            reference=reference
+            reference=reference,
+            metadata={"user_id": str(user_id)}
+        )
+    except PaystackUnavailable as e:
+        logger.warning(f"Deposit {reference} not initialized: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Payment provider unavailable, retry shortly",
+            headers={"Retry-After": str(int(settings.PAYSTACK_BREAKER_RESET_SECONDS))}
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     
     transaction = Transaction(
         user_id=user_id,
-        wallet_id=wallet.id,
+        wallet_id=wallet_id,
         amount=deposit_data.amount,
         transaction_type=TransactionType.DEPOSIT,
         status=TransactionStatus.PENDING,
         reference=reference,
-        transaction_data=json.dumps({
+        transaction_data={
             "authorization_url": result["authorization_url"],
             "provider": "paystack"
-            })
+            }
     )
     
-    db.add(transaction)
+    add_entry(db, transaction, [(wallet_id, user_id, float(deposit_data.amount))])
+    touch(db, [wallet_id])
     db.commit()
+    attach_consistency_token(response, db)
     
     return DepositResponse(
         reference=reference,
@@ -129,62 +168,219 @@ async def paystack_webhook(
     return {"status": True}
    
 
+async def _coalesced_read(key: tuple, user_id, read, consistency_token: Optional[str]):
+    """
+    Run read(db) off the event loop, sharing it with identical concurrent
+    reads. The read opens and closes its own session in its thread: it may
+    outlive the request that started it (timeout, disconnect), and its
+    result is served to requests that don't own that request's session.
+    A caller holding a consistency token reads alone: an in-flight read
+    may have started before its write committed.
+    """
+    def run():
+        db = shard_router.session(shard_router.shard_for_user(user_id), read_only=True, token=consistency_token)
+        try:
+            return read(db)
+        finally:
+            db.close()
+    
+    if consistency_token:
+        return await run_in_threadpool(run)
+    try:
+        return await single_flight.do(key, lambda: run_in_threadpool(run))
+    except SingleFlightTimeout:
+        raise HTTPException(status_code=504, detail="Read timed out, retry shortly")
+
+
+async def _wallet_version(user_id, consistency_token: Optional[str]) -> Optional[int]:
+    return await _coalesced_read(
+        ("wallet_version", user_id),
+        user_id,
+        lambda db: db.query(WALLET_VERSION).filter(Wallet.user_id == user_id).scalar(),
+        consistency_token
+    )
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """Whether If-None-Match already names `etag` (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def _not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL})
+
+
 @router.get("/deposit/{reference}/status", response_model=DepositStatusResponse)
 async def check_deposit_status(
     reference: str,
     request: Request,
     auth: tuple = Depends(get_current_user_or_api_key),
-    db: Session = Depends(get_db)
+    x_consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER)
 ):
     """Check deposit status (manual verification)"""
     user_id, permissions = auth
-    check_permissions(["read"], permissions)
-    
-    transaction = db.query(Transaction).filter(
-        Transaction.reference == reference,
-        Transaction.user_id == user_id
-    ).first()
+    check_permissions(Permission.READ, permissions)
+    
+    def read(db: Session) -> Optional[DepositStatusResponse]:
+        transaction = recent_first(db.query(Transaction).filter(
+            Transaction.reference == reference,
+            Transaction.user_id == user_id
+        ))
+        if not transaction:
+            return None
+        return DepositStatusResponse(
+            reference=transaction.reference,
+            status=transaction.status.value,
+            amount=transaction.amount
+        )
     
-    if not transaction:
+    deposit_status = await _coalesced_read(("deposit_status", user_id, reference), user_id, read, x_consistency_token)
+    if not deposit_status:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    return DepositStatusResponse(
-        reference=transaction.reference,
-        status=transaction.status.value,
-        amount=transaction.amount
+    return deposit_status
+
+async def _sse_stream(request: Request, subscription, initial: dict = None, close_on_final: bool = False):
+    """Relay hub events as SSE, with heartbeats and an idle cut-off"""
+    try:
+        if initial:
+            yield format_sse(initial)
+            if close_on_final and initial["status"] in FINAL_STATUSES:
+                return
+        
+        idle = 0.0
+        while idle < settings.SSE_IDLE_TIMEOUT_SECONDS:
+            if await request.is_disconnected():
+                return
+            
+            event = await subscription.get(timeout=settings.SSE_HEARTBEAT_SECONDS)
+            if event is None:
+                idle += settings.SSE_HEARTBEAT_SECONDS
+                yield ": keep-alive\n\n"
+                continue
+            
+            idle = 0.0
+            yield format_sse(event)
+            if close_on_final and event["status"] in FINAL_STATUSES:
+                return
+        
+        yield format_sse({"reason": "idle"}, "timeout")
+    finally:
+        subscription.close()
+
+
+def _sse_response(request: Request, subscription, initial: dict = None, close_on_final: bool = False) -> StreamingResponse:
+    return StreamingResponse(
+        _sse_stream(request, subscription, initial, close_on_final),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Runs even if the client drops before the generator starts
+        background=BackgroundTask(subscription.close)
     )
 
+
+def _subscribe(*topics: str):
+    subscription = event_hub.subscribe(topics)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many open event streams, poll the status endpoint instead")
+    return subscription
+
+
+@router.get("/deposit/{reference}/events")
+async def stream_deposit_status(
+    reference: str,
+    request: Request,
+    auth: tuple = Depends(get_current_user_or_api_key),
+    db: Session = Depends(get_wallet_db)
+):
+    """Server-sent events for a deposit; the stream ends once it succeeds or fails"""
+    user_id, permissions = auth
+    check_permissions(Permission.READ, permissions)
+    
+    # Subscribe before reading so a webhook landing in between is not missed
+    subscription = _subscribe(f"reference:{reference}")
+    try:
+        transaction = recent_first(db.query(Transaction).filter(
+            Transaction.reference == reference,
+            Transaction.user_id == user_id
+        ))
+        if not transaction:
+            raise HTTPException(status_code=404, detail="Transaction not found")
+        initial = transaction_event(transaction)
+    except Exception:
+        subscription.close()
+        raise
+    finally:
+        # Don't hold a pooled connection for the life of the stream
+        db.close()
+    
+    return _sse_response(request, subscription, initial, close_on_final=True)
+
+
+@router.get("/events")
+async def stream_wallet_events(
+    request: Request,
+    auth: tuple = Depends(get_current_user_or_api_key)
+):
+    """Server-sent events for every transaction on the caller's wallet"""
+    user_id, permissions = auth
+    check_permissions(Permission.READ, permissions)
+    
+    return _sse_response(request, _subscribe(f"user:{user_id}"))
+
 @router.get("/balance", response_model=WalletResponse)
 async def get_balance(
     request: Request,
+    response: Response,
     auth: tuple = Depends(get_current_user_or_api_key),
-    db: Session = Depends(get_db)
+    x_consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER)
 ):
-    """Get wallet balance"""
+    """Get wallet balance. Send the ETag back as If-None-Match to get a 304 while it is unchanged."""
     user_id, permissions = auth
     
-    check_permissions(["read"], permissions)
-    
-    wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
-    if not wallet:
+    check_permissions(Permission.READ, permissions)
+    
+    # Read before the balance, so the tag is never newer than the body
+    version = await _wallet_version(user_id, x_consistency_token)
+    if version is not None:
+        etag = f'"{version}"'
+        if _not_modified(request, etag):
+            return _not_modified_response(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    
+    def read(db: Session) -> Optional[WalletResponse]:
+        wallet = db.query(Wallet.wallet_number, WALLET_BALANCE).filter(Wallet.user_id == user_id).first()
+        if not wallet:
+            return None
+        return WalletResponse(
+            wallet_number=wallet.wallet_number,
+            balance=wallet.balance
+           )
+    
+    balance = await _coalesced_read(("balance", user_id), user_id, read, x_consistency_token)
+    if not balance:
         raise HTTPException(status_code=404, detail="Wallet not found")
     
-    return WalletResponse(
-        wallet_number=wallet.wallet_number,
-        balance=wallet.balance
-       )
+    return balance
 
 @router.post("/transfer", response_model=TransferResponse)
 async def transfer(
     transfer_data: TransferRequest,
     request: Request,
+    response: Response,
     auth: tuple = Depends(get_current_user_or_api_key),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_wallet_db)
 ):
     """Transfer funds to another wallet"""
     user_id, permissions = auth
     
-    check_permissions(["transfer"], permissions)
+    check_permissions(Permission.TRANSFER, permissions)
     
     sender_wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
     if not sender_wallet:
@@ -193,98 +389,230 @@ async def transfer(
     if transfer_data.amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     
-    if sender_wallet.balance < transfer_data.amount:
+    # A striped wallet's stripes may still cover it; debit() has the final say
+    if sender_wallet.balance < transfer_data.amount and not striped_wallets.count(db, sender_wallet.id):
         raise HTTPException(status_code=400, detail="Insufficient balance")
     
-    recipient_wallet = db.query(Wallet).filter(
-        Wallet.wallet_number == transfer_data.wallet_number
-    ).first()
+    recipient_shard, recipient_user_id, recipient_state = shard_router.locate_wallet(transfer_data.wallet_number)
+    if recipient_state == "moving":
+        raise HTTPException(status_code=503, detail="Recipient wallet is being migrated, retry shortly")
+    
+    if recipient_shard != db.info.get("shard", 0):
+        return await _cross_shard_transfer(db, response, sender_wallet, transfer_data, recipient_shard, recipient_user_id)
     
-    if not recipient_wallet:
+    recipient = identity_cache.wallet(db, transfer_data.wallet_number)
+    if not recipient:
         raise HTTPException(status_code=404, detail="Recipient wallet not found")
     
-    if recipient_wallet.user_id == user_id:
+    if str(recipient.user_id) == str(user_id):
         raise HTTPException(status_code=400, detail="Cannot transfer to yourself")
     
-    sender_reference = f"trn_out_{generate_id()}"
-    recipient_reference = f"trn_in_{generate_id()}"
-    
     amount = float(transfer_data.amount)
     
     try:
-        sender_wallet.balance -= amount
+        # Both rows in id order before either UPDATE, so A->B and B->A can't
+        # deadlock. A striped recipient's row isn't written: its stripes are,
+        # after every wallet row
+        written = [sender_wallet.id]
+        if not striped_wallets.count(db, recipient.wallet_id):
+            written.append(recipient.wallet_id)
+        lock_wallets(db, written)
+        
+        if not debit(db, sender_wallet.id, amount):
+            raise HTTPException(status_code=400, detail="Insufficient balance")
         
-        recipient_wallet.balance += amount
-        user = db.query(User).filter(User.id == user_id).first()
+        # Credited in SQL, so the recipient row is never loaded
+        if not credit(db, recipient.wallet_id, amount):
+            raise HTTPException(status_code=404, detail="Recipient wallet not found")
         
-        sender_transaction = Transaction(
-            user_id=user.id,
+        # One journal entry, debited from the sender and credited to the recipient
+        transaction = add_entry(db, Transaction(
+            user_id=sender_wallet.user_id,
             wallet_id=sender_wallet.id,
             sender_wallet_id=sender_wallet.id,
-            recipient_wallet_id=recipient_wallet.id,
-            amount=transfer_data.amount,
+            recipient_wallet_id=recipient.wallet_id,
+            amount=amount,
             transaction_type=TransactionType.TRANSFER,
-            status=TransactionStatus.SUCCESS,            
-            reference=sender_reference,
-            description=f"Transfer to {recipient_wallet.wallet_number}",
-            transaction_data=json.dumps({
-                "recipient_wallet": transfer_data.wallet_number,
-                "type": "outgoing",
-                "recipient_user_id": str(recipient_wallet.user_id)
-            })
+            status=TransactionStatus.SUCCESS,
+            reference=f"trn_{generate_id()}",
+            transaction_data=transfer_data_for(sender_wallet.wallet_number, transfer_data.wallet_number)
+        ), [
+            (sender_wallet.id, sender_wallet.user_id, -amount),
+            (recipient.wallet_id, recipient.user_id, amount),
+        ])
+        # Built before commit, which expires the transaction and sender
+        event, parties = transaction_event(transaction), [sender_wallet.user_id, recipient.user_id]
+        db.commit()
+        attach_consistency_token(response, db)
+        publish_transaction(event, parties)
+        
+        return TransferResponse(
+            status="success",
+            message="Transfer completed"
         )
         
-        recipient_transaction =Transaction(
-            user_id=recipient_wallet.user_id,
-            wallet_id=recipient_wallet.id,
+    except HTTPException as e:
+        db.rollback()
+        if e.status_code == 404:
+            # The cached recipient is no longer on this shard
+            identity_cache.forget_wallet(transfer_data.wallet_number)
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Transfer failed: {str(e)}")
+
+
+async def _cross_shard_transfer(
+    db: Session,
+    response: Response,
+    sender_wallet: Wallet,
+    transfer_data: TransferRequest,
+    recipient_shard: int,
+    recipient_user_id
+) -> TransferResponse:
+    """
+    Debit the sender and queue the credit in one transaction on the sender's
+    shard; the recipient's shard is credited by deliver_cross_shard_transfer,
+    in the threadpool. A failed delivery is retried by the relay job.
+    """
+    if recipient_user_id is None:
+        # Not in the directory: only a pre-sharding wallet on shard 0 can match
+        shard_db = shard_router.session(recipient_shard)
+        try:
+            recipient = identity_cache.wallet(shard_db, transfer_data.wallet_number)
+        finally:
+            shard_db.close()
+        
+        if not recipient:
+            raise HTTPException(status_code=404, detail="Recipient wallet not found")
+        recipient_user_id = recipient.user_id
+    
+    if str(recipient_user_id) == str(sender_wallet.user_id):
+        raise HTTPException(status_code=400, detail="Cannot transfer to yourself")
+    
+    amount = float(transfer_data.amount)
+    reference = f"trn_{generate_id()}"
+    
+    try:
+        if not debit(db, sender_wallet.id, amount):
+            raise HTTPException(status_code=400, detail="Insufficient balance")
+        
+        # The recipient's shard records the same entry (same reference) with the credit
+        sender_transaction = add_entry(db, Transaction(
+            user_id=sender_wallet.user_id,
+            wallet_id=sender_wallet.id,
             sender_wallet_id=sender_wallet.id,
-            recipient_wallet_id=recipient_wallet.id,
-            amount=transfer_data.amount,
+            amount=amount,
             transaction_type=TransactionType.TRANSFER,
             status=TransactionStatus.SUCCESS,
-            reference=recipient_reference,
-            description=f"Transfer from {sender_wallet.wallet_number}",
-            transaction_data=json.dumps({
-                "sender_wallet": sender_wallet.wallet_number,
-                "type": "incoming",
-                "sender_user_id": str(sender_wallet.user_id)
-            })
+            reference=reference,
+            transaction_data=transfer_data_for(sender_wallet.wallet_number, transfer_data.wallet_number)
+        ), [(sender_wallet.id, sender_wallet.user_id, -amount)])
+        
+        outbox = CrossShardTransfer(
+            id=uuid.uuid4(),
+            reference=reference,
+            sender_user_id=sender_wallet.user_id,
+            sender_wallet_number=sender_wallet.wallet_number,
+            recipient_wallet_number=transfer_data.wallet_number,
+            amount=amount
         )
         
-        db.add(sender_transaction)
-        db.add(recipient_transaction)
+        db.add(outbox)
+        event, sender_user_id = transaction_event(sender_transaction), sender_wallet.user_id
+        source_shard, outbox_id = db.info.get("shard", 0), outbox.id
         db.commit()
+        attach_consistency_token(response, db)
+        publish_transaction(event, [sender_user_id])
         
-        return TransferResponse(
-            status="success",
-            message="Transfer completed"
-        )
-        
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Transfer failed: {str(e)}")
     
+    if not await run_in_threadpool(deliver_cross_shard_transfer, source_shard, outbox_id):
+        logger.warning(f"Cross-shard credit {reference} queued for retry")
+    
+    return TransferResponse(
+        status="success",
+        message="Transfer completed"
+    )
+    
+
 
 @router.get("/transactions", response_model=list[TransactionResponse])
 async def get_transactions(
     request: Request,
+    response: Response,
+    reference: Optional[str] = Query(None, min_length=1, max_length=100, description="Reference prefix"),
+    transaction_type: Optional[TransactionType] = Query(None, alias="type"),
+    status: Optional[TransactionStatus] = Query(None),
+    min_amount: Optional[float] = Query(None, ge=0),
+    max_amount: Optional[float] = Query(None, ge=0),
+    start_date: Optional[datetime] = Query(None, description="Created at or after (ISO 8601)"),
+    end_date: Optional[datetime] = Query(None, description="Created before (ISO 8601)"),
+    counterparty: Optional[str] = Query(None, min_length=1, max_length=32, description="Counterparty wallet number"),
+    channel: Optional[str] = Query(None, min_length=1, max_length=32, description="Payment provider channel, e.g. card"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description=f"Page size; omit for the whole history (default {HISTORY_PAGE_SIZE} with `after`)"),
+    after: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     auth: tuple = Depends(get_current_user_or_api_key),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_wallet_read_db),
+    x_consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER)
 ):
-    """Get transaction history"""
+    """
+    Get transaction history, newest first. All filters are optional and
+    combine with AND. Paging is opt-in: without `limit` or `after` every
+    matching row is returned. When a page leaves more rows, the response
+    carries an X-Next-Cursor header; pass it back as `after` for the next.
+    The ETag covers the wallet's version and the query string; send it
+    back as If-None-Match to get a 304 while the page is unchanged.
+    """
     user_id, permissions = auth
     
-    check_permissions(["read"], permissions)
-    user = db.query(User).filter(User.id == user_id).first()
+    check_permissions(Permission.READ, permissions)
+    
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        raise HTTPException(status_code=400, detail="min_amount is greater than max_amount")
+    if start_date and end_date and start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    
+    version = await _wallet_version(user_id, x_consistency_token)
+    if version is not None:
+        query = hashlib.blake2b(request.url.query.encode(), digest_size=8).hexdigest()
+        etag = f'"{version}-{query}"'
+        if _not_modified(request, etag):
+            return _not_modified_response(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    
+    filters = TransactionFilters(
+        reference_prefix=reference,
+        transaction_type=transaction_type,
+        status=status,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        start_date=start_date,
+        end_date=end_date,
+        counterparty=counterparty,
+        channel=channel,
+    )
+    if after and limit is None:
+        limit = HISTORY_PAGE_SIZE
+    try:
+        transactions, next_cursor = read_history(db, user_id, filters, limit, after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == user.id
-    ).order_by(Transaction.created_at.desc()).all()
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return [
             TransactionResponse(
             type=transaction.transaction_type.value,
             amount=transaction.amount,
+            direction=transaction.direction,
             status=transaction.status.value,
             reference=transaction.reference,
             created_at=transaction.created_at,
@@ -1,7 +1,11 @@
 from pydantic import BaseModel, Field, field_validator, ConfigDict
+from typing import Literal, Optional
+import uuid
 from decimal import Decimal
 from datetime import datetime, timezone
 from app.models.transactions import TransactionType, TransactionStatus
+from app.models.scheduled_transfer import Recurrence, ScheduledTransferStatus
+from app.config import settings
 
 class WalletResponse(BaseModel):
     wallet_number: str
@@ -85,9 +89,11 @@ class BalanceResponse(BaseModel):
 class TransactionResponse(BaseModel):
     type: TransactionType
     amount: Decimal
+    direction: Literal["credit", "debit"]  # the side of this wallet; amount is unsigned
     status: TransactionStatus
     reference: str
     created_at: datetime
+    description: Optional[str] = None
     
     model_config = ConfigDict(
         from_attributes=True,
@@ -96,3 +102,60 @@ class TransactionResponse(BaseModel):
             Decimal: lambda d: float(d)
         }
     )
+
+
+class ScheduledTransferRequest(BaseModel):
+    wallet_number: str
+    amount: Decimal = Field(
+        ...,
+        gt=0,
+        description="Amount to transfer on every run in Naira (minimum: 100 NGN)"
+    )
+    recurrence: Recurrence = Recurrence.ONCE
+    start_at: Optional[datetime] = Field(None, description="First run (ISO 8601); defaults to now")
+    max_runs: Optional[int] = Field(None, ge=1, description="Stop after this many transfers; default: until cancelled")
+    description: Optional[str] = Field(None, max_length=255)
+    
+    @field_validator('amount')
+    def validate_amount(cls, v):
+        if v < 100:
+            raise ValueError("Amount must be at least 100 NGN")
+        return v
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "wallet_number": "1234567890",
+                "amount": 5000.00,
+                "recurrence": "monthly",
+                "start_at": "2026-11-01T00:00:00Z",
+                "max_runs": 12
+            }
+        }
+    )
+
+class ScheduledTransferResponse(BaseModel):
+    id: uuid.UUID
+    wallet_number: str = Field(validation_alias="recipient_wallet_number")
+    amount: Decimal
+    recurrence: Recurrence
+    status: ScheduledTransferStatus
+    next_run_at: datetime
+    runs: int
+    max_runs: Optional[int]
+    last_run_at: Optional[datetime]
+    last_error: Optional[str]
+    description: Optional[str]
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+class WalletStripesRequest(BaseModel):
+    stripes: int = Field(..., ge=0, le=settings.WALLET_MAX_STRIPES, description="Sub-balance rows; 0 turns striping off")
+
+
+class WalletStripesResponse(BaseModel):
+    wallet_number: str
+    shard: int
+    stripes: int
+    balance: Decimal
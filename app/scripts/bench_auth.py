@@ -0,0 +1,250 @@
+"""
+Microbenchmarks for the authentication hot path.
+
+Usage:
+    python -m app.scripts.bench_auth                            # 10^3..10^6 keys, JSON to stdout
+    python -m app.scripts.bench_auth --sizes 1000,1000000 --output bench.json
+    python -m app.scripts.bench_auth --compare baseline.json    # run, then diff against a baseline
+    python -m app.scripts.bench_auth --compare baseline.json --current bench.json --threshold 0.05
+
+Every request goes through get_current_user_or_api_key. This times the
+parts of it (API key hashing, JWT encode/decode, permission checks) and
+the whole dependency. The full runs use an in-memory SQLite database
+seeded with N API keys, five per user, as MAX_API_KEYS_PER_USER allows.
+
+Each case reports the median over `--repeat` rounds. In compare mode a
+case whose median is slower than the baseline by more than `--threshold`
+(default 10%) counts as a regression, and the exit status is 1.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.models.user import User
+from app.models.api_key import APIKey
+from app.auth.api_key_auth import hash_api_key, generate_api_key
+from app.auth.jwt_auth import create_access_token, verify_token, check_permissions, get_current_user_or_api_key
+from app.auth.permissions import Permission, permissions_to_mask
+
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+KEYS_PER_USER = 5
+
+
+def measure(fn, repeat: int, min_time: float) -> dict:
+    """Per-call timings of `fn`; the loop count is calibrated to run >= min_time per round"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+
+    median = statistics.median(rounds)
+    return {
+        "median_us": round(median * 1e6, 3),
+        "min_us": round(min(rounds) * 1e6, 3),
+        "stdev_us": round(statistics.pstdev(rounds) * 1e6, 3),
+        "ops_per_sec": round(1 / median, 1),
+        "iterations": number,
+        "rounds": repeat,
+    }
+
+
+def _expect_http_error(fn):
+    def call():
+        try:
+            fn()
+        except HTTPException:
+            return
+        raise AssertionError("expected an HTTPException")
+    return call
+
+
+def component_cases() -> dict:
+    from passlib.context import CryptContext
+
+    api_key = generate_api_key()
+    token = create_access_token(str(uuid.uuid4()), "bench@example.com")
+    forged = token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB")
+    read_only = Permission.READ
+
+    return {
+        "hash_api_key": lambda: hash_api_key(api_key),
+        "jwt_encode": lambda: create_access_token("3f1c7a9e-0000-4000-8000-000000000000", "bench@example.com"),
+        "jwt_decode": lambda: verify_token(token),
+        "jwt_decode_invalid": lambda: verify_token(forged),
+        "permission_from_mask": lambda: Permission(5),
+        "permissions_to_mask": lambda: permissions_to_mask(["read", "transfer"]),
+        "check_permissions_granted": lambda: check_permissions(Permission.READ, Permission.ALL),
+        "check_permissions_denied": _expect_http_error(lambda: check_permissions(Permission.TRANSFER, read_only)),
+        # Paid once per worker at import time of app.auth.jwt_auth
+        "cryptcontext_init": lambda: CryptContext(schemes=["bcrypt"], deprecated="auto"),
+    }
+
+
+def seed(size: int):
+    """In-memory database with `size` API keys; returns (sessionmaker, api_key, user_id)"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[User.__table__, APIKey.__table__])
+
+    expires_at = datetime.now(timezone.utc) + timedelta(days=365)
+    user_ids = [uuid.uuid4() for _ in range(max(1, size // KEYS_PER_USER))]
+    probe_key = generate_api_key()
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "email": f"user{i}@bench.local", "google_id": f"bench-{i}"}
+            for i, user_id in enumerate(user_ids)
+        ])
+        batch = []
+        for i in range(size):
+            raw = probe_key if i == size // 2 else f"sk_test_bench_{i}"
+            batch.append({
+                "id": uuid.uuid4(),
+                "user_id": user_ids[i % len(user_ids)],
+                "name": f"key-{i}",
+                "key": hash_api_key(raw),
+                "permission_mask": int(Permission.READ | Permission.TRANSFER),
+                "is_active": True,
+                "expires_at": expires_at,
+            })
+            if len(batch) == 50_000:
+                conn.execute(insert(APIKey), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(APIKey), batch)
+
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False), probe_key, user_ids[(size // 2) % len(user_ids)]
+
+
+def resolution_cases(size: int) -> dict:
+    Session, api_key, user_id = seed(size)
+    db = Session()
+    loop = asyncio.new_event_loop()
+    bearer = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(str(user_id), "bench@example.com"))
+
+    def resolve(**kwargs):
+        return loop.run_until_complete(get_current_user_or_api_key(db=db, **{"api_key": None, "credentials": None, **kwargs}))
+
+    return {
+        f"resolve_api_key[{size}]": lambda: resolve(api_key=api_key),
+        f"resolve_api_key_unknown[{size}]": _expect_http_error(lambda: resolve(api_key="sk_test_not_a_real_key")),
+        f"resolve_jwt[{size}]": lambda: resolve(credentials=bearer),
+    }
+
+
+def run(sizes: list, repeat: int, min_time: float, only: str = None) -> dict:
+    results = {}
+
+    def record(cases: dict):
+        for name, fn in cases.items():
+            if only and only not in name:
+                continue
+            results[name] = measure(fn, repeat, min_time)
+            print(f"{name:<40} {results[name]['median_us']:>12.2f} us  {results[name]['ops_per_sec']:>12,.0f} ops/s", file=sys.stderr)
+
+    record(component_cases())
+    for size in sizes:
+        start = time.perf_counter()
+        cases = resolution_cases(size)
+        print(f"seeded {size:,} keys in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        record(cases)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": repeat,
+            "min_time": min_time,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> dict:
+    """Median ratio per case present in both runs; ratio > 1 + threshold is a regression"""
+    cases = {}
+    for name, base in baseline["results"].items():
+        if name not in current["results"]:
+            continue
+        ratio = current["results"][name]["median_us"] / base["median_us"] if base["median_us"] else 1.0
+        cases[name] = {
+            "baseline_us": base["median_us"],
+            "current_us": current["results"][name]["median_us"],
+            "ratio": round(ratio, 3),
+            "status": "regression" if ratio > 1 + threshold else "improved" if ratio < 1 - threshold else "ok",
+        }
+
+    return {
+        "threshold": threshold,
+        "regressions": sorted(name for name, case in cases.items() if case["status"] == "regression"),
+        "cases": cases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the authentication hot path")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma separated API key counts (default: {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per round")
+    parser.add_argument("--only", help="Only run cases whose name contains this")
+    parser.add_argument("--output", help="Write results JSON here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="Baseline results JSON to compare against")
+    parser.add_argument("--current", help="With --compare: existing results JSON instead of running now")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before a regression (0.10 = 10%%)")
+    parser.add_argument("--log", action="store_true", help="Keep the app's logging (off by default, it dominates the timings)")
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.CRITICAL)
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+        current = run(sizes, args.repeat, args.min_time, args.only)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if not args.compare:
+        if not args.output:
+            print(json.dumps(current, indent=2))
+        return
+
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    report = compare(baseline, current, args.threshold)
+    print(json.dumps(report, indent=2))
+    if report["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Per-request middleware overhead, before and after route scoping.
+
+Usage:
+    python -m app.scripts.bench_middleware
+    python -m app.scripts.bench_middleware --repeat 7 --output middleware.json
+
+"legacy" is the old stack: CORSMiddleware and SessionMiddleware on every
+request. "lean" is the current one: SessionMiddleware only under /auth,
+CORSMiddleware skipped for x-api-key requests without an Origin.
+
+Two sets of cases, both driven as raw ASGI calls with no server or
+socket in the way, legacy and lean rounds interleaved:
+
+  stack[...]         - the middleware alone around a no-op endpoint
+  wallet_balance[..] - GET /wallet/balance through FastAPI and the real
+                       route, on an in-memory SQLite wallet, auth
+                       dependency stubbed out
+
+Each case is timed for an API-key client and for a browser client
+(bearer token plus Origin), which still goes through CORS.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import time
+import uuid
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.auth.jwt_auth import get_current_user_or_api_key
+from app.auth.permissions import Permission
+from app.middleware import RouteScopedMiddleware, ApiKeyFastLane
+from app.routes.wallet import router as wallet_router
+from app.sharding import get_wallet_read_db
+from app.scripts.bench_auth import measure
+
+SESSION_OPTIONS = dict(secret_key="bench-secret", session_cookie="wallet_session", max_age=14*24*60*60, same_site="lax", https_only=False)
+CORS_OPTIONS = dict(allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+
+# Requests per timed call, so event loop entry/exit does not swamp the stack
+BATCH = 100
+
+CLIENTS = {
+    "api_key": [(b"x-api-key", b"sk_test_bench")],
+    "browser": [(b"authorization", b"Bearer bench"), (b"origin", b"https://app.example.com")],
+}
+
+
+def legacy_stack(app):
+    # add_middleware order in the old main.py: CORS outermost, then sessions
+    return CORSMiddleware(SessionMiddleware(app, **SESSION_OPTIONS), **CORS_OPTIONS)
+
+
+def lean_stack(app):
+    return ApiKeyFastLane(
+        RouteScopedMiddleware(app, middleware=SessionMiddleware, prefixes=("/auth",), **SESSION_OPTIONS),
+        middleware=CORSMiddleware, **CORS_OPTIONS
+    )
+
+
+STACKS = {"legacy": legacy_stack, "lean": lean_stack}
+
+
+async def noop_endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def wallet_app(stack) -> FastAPI:
+    """FastAPI app with the wallet routes, on a single seeded SQLite wallet"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[User.__table__, Wallet.__table__])
+    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    user_id = uuid.uuid4()
+    with Session() as db:
+        db.add(User(id=user_id, email="bench@example.com", google_id="bench"))
+        db.add(Wallet(user_id=user_id, wallet_number="1000000001", balance=1000.0))
+        db.commit()
+
+    async def read_db():
+        # async so FastAPI does not hop to the threadpool, whose jitter would hide the middleware
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(wallet_router)
+    async def auth():
+        return user_id, Permission.ALL
+
+    app.dependency_overrides[get_current_user_or_api_key] = auth
+    app.dependency_overrides[get_wallet_read_db] = read_db
+    if stack is legacy_stack:
+        app.add_middleware(CORSMiddleware, **CORS_OPTIONS)
+        app.add_middleware(SessionMiddleware, **SESSION_OPTIONS)
+    else:
+        app.add_middleware(RouteScopedMiddleware, middleware=SessionMiddleware, prefixes=("/auth",), **SESSION_OPTIONS)
+        app.add_middleware(ApiKeyFastLane, middleware=CORSMiddleware, **CORS_OPTIONS)
+    return app
+
+
+def request_case(loop, app, path: str, headers: list):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench.local")] + headers, "client": ("127.0.0.1", 50000), "server": ("bench.local", 80),
+    }
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    async def batch():
+        for _ in range(BATCH):
+            await app(dict(scope), receive, send)
+
+    def call():
+        statuses.clear()
+        loop.run_until_complete(batch())
+        if set(statuses) != {200}:
+            raise RuntimeError(f"{path} answered {statuses}")
+
+    return call
+
+
+def paired(calls: dict, repeat: int, min_time: float) -> dict:
+    """Time `calls` in interleaved rounds, so machine drift hits every stack alike"""
+    number = measure(next(iter(calls.values())), 1, min_time)["iterations"]
+    rounds = {name: [] for name in calls}
+    for _ in range(repeat):
+        for name, call in calls.items():
+            start = time.perf_counter()
+            for _ in range(number):
+                call()
+            rounds[name].append((time.perf_counter() - start) / number / BATCH)
+
+    results = {}
+    for name, timings in rounds.items():
+        median = statistics.median(timings)
+        results[name] = {
+            "median_us": round(median * 1e6, 3),
+            "min_us": round(min(timings) * 1e6, 3),
+            "stdev_us": round(statistics.pstdev(timings) * 1e6, 3),
+            "ops_per_sec": round(1 / median, 1),
+            "iterations": number * BATCH,
+            "rounds": repeat,
+        }
+    return results
+
+
+def run(repeat: int, min_time: float) -> dict:
+    loop = asyncio.new_event_loop()
+    endpoints = {name: stack(noop_endpoint) for name, stack in STACKS.items()}
+    apps = {name: wallet_app(stack) for name, stack in STACKS.items()}
+
+    cases = {}
+    for client, headers in CLIENTS.items():
+        for kind, targets in (("stack", endpoints), ("wallet_balance", apps)):
+            calls = {f"{kind}[{name},{client}]": request_case(loop, target, "/wallet/balance", headers) for name, target in targets.items()}
+            cases.update(paired(calls, repeat, min_time))
+    loop.close()
+
+    overhead = {}
+    for client in CLIENTS:
+        for kind in ("stack", "wallet_balance"):
+            before = cases[f"{kind}[legacy,{client}]"]["median_us"]
+            after = cases[f"{kind}[lean,{client}]"]["median_us"]
+            overhead[f"{kind}[{client}]"] = {
+                "legacy_us": before, "lean_us": after,
+                "saved_us": round(before - after, 3), "saved_pct": round((before - after) / before * 100, 1),
+            }
+
+    return {"python": platform.python_version(), "platform": platform.platform(), "cases": cases, "overhead": overhead}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request middleware overhead")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per round")
+    parser.add_argument("--output", help="Write results JSON here instead of stdout")
+    parser.add_argument("--log", action="store_true", help="Keep the app's logging (off by default, it dominates the timings)")
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.CRITICAL)
+
+    results = run(args.repeat, args.min_time)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
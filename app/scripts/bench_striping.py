@@ -0,0 +1,171 @@
+"""
+Throughput of transfers into one hot wallet, unstriped vs striped.
+
+Usage:
+    python -m app.scripts.bench_striping --database-url postgresql://... --threads 16 --stripes 8
+    python -m app.scripts.bench_striping --database-url postgresql://... --output striping.json
+
+Creates a merchant wallet and one funded sender per thread (on an EMPTY
+or throwaway database), then runs the same work twice for --seconds
+each: every thread commits transfers from its own sender to the
+merchant, as the transfer route does (debit, credit, journal entry).
+The first run leaves the merchant unstriped, so every credit queues on
+its wallets row; the second stripes it --stripes ways first.
+
+Each run reports committed transfers per second, p50/p95/max commit
+latency in milliseconds, and the average number of backends waiting on a
+row lock (sampled from pg_stat_activity). Both runs end with a
+consolidation, and the merchant's balance is checked against the
+transfers committed.
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+import uuid
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from app.database import Base
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.models.transactions import Transaction, TransactionStatus, TransactionType
+from app.services.journal import add_entry, transfer_data
+from app.services.partitions import ensure_partitions
+from app.services.striping import WALLET_BALANCE, striped_wallets, consolidate_wallet_stripes, credit, debit, lock_wallets, set_stripes
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SENDER_BALANCE = 1_000_000_000.0
+AMOUNT = 1.0
+
+
+def create_wallets(db: Session, senders: int) -> tuple:
+    """The merchant and `senders` funded senders, as (wallet_id, user_id, wallet_number)"""
+    tag = f"{random.randrange(100_000):05d}"
+    wallets = []
+    for i in range(senders + 1):
+        user = User(email=f"bench_striping_{tag}_{i}@example.com")
+        db.add(user)
+        db.flush()
+        wallet = Wallet(
+            user_id=user.id, wallet_number=f"{tag}{i:08d}",
+            balance=SENDER_BALANCE if i else 0.0
+        )
+        db.add(wallet)
+        db.flush()
+        wallets.append((wallet.id, user.id, wallet.wallet_number))
+    db.commit()
+    return wallets[0], wallets[1:]
+
+
+def transfer(db: Session, sender: tuple, merchant: tuple):
+    lock_wallets(db, [sender[0]] if striped_wallets.count(db, merchant[0]) else [sender[0], merchant[0]])
+    if not debit(db, sender[0], AMOUNT):
+        raise RuntimeError("Sender ran dry")
+    credit(db, merchant[0], AMOUNT)
+    add_entry(db, Transaction(
+        user_id=sender[1],
+        wallet_id=sender[0],
+        amount=AMOUNT,
+        transaction_type=TransactionType.TRANSFER,
+        status=TransactionStatus.SUCCESS,
+        sender_wallet_id=sender[0],
+        recipient_wallet_id=merchant[0],
+        reference=f"trn_{uuid.uuid4().hex[:24]}",
+        transaction_data=transfer_data(sender[2], merchant[2]),
+    ), [(sender[0], sender[1], -AMOUNT), (merchant[0], merchant[1], AMOUNT)])
+    db.commit()
+
+
+def run(engine: Engine, merchant: tuple, senders: list, seconds: float) -> dict:
+    make_session = sessionmaker(bind=engine)
+    deadline = time.perf_counter() + seconds
+    timings = [[] for _ in senders]
+    waiting = []
+
+    def worker(index: int):
+        with make_session() as db:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                transfer(db, senders[index], merchant)
+                timings[index].append((time.perf_counter() - start) * 1000)
+
+    def sample_lock_waits():
+        with engine.connect() as conn:
+            while time.perf_counter() < deadline:
+                waiting.append(conn.execute(text(
+                    "SELECT count(*) FROM pg_stat_activity "
+                    "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+                )).scalar())
+                conn.rollback()
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(senders))]
+    threads.append(threading.Thread(target=sample_lock_waits))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with make_session() as db:
+        consolidate_wallet_stripes(db)
+        balance = db.execute(select(WALLET_BALANCE).where(Wallet.id == merchant[0])).scalar()
+
+    latencies = sorted(t for thread_timings in timings for t in thread_timings)
+    return {
+        "transfers": len(latencies),
+        "transfers_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        "max_ms": round(latencies[-1], 3),
+        "avg_lock_waiters": round(statistics.mean(waiting), 2) if waiting else 0.0,
+        "merchant_balance": balance,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transfers into a hot wallet, unstriped vs striped")
+    parser.add_argument("--database-url", required=True, help="Postgres database to write to (never production)")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent senders")
+    parser.add_argument("--stripes", type=int, default=8, help="Stripes for the striped run")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Duration of each run")
+    parser.add_argument("--output", help="Write results JSON here instead of stdout")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url, pool_size=args.threads + 2, max_overflow=0)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Postgres only")
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as db:
+        ensure_partitions(db)
+        merchant, senders = create_wallets(db, args.threads)
+
+    results = {"threads": args.threads, "seconds": args.seconds, "runs": {}}
+    for stripes in (0, args.stripes):
+        with Session(engine) as db:
+            set_stripes(db, merchant[0], stripes)
+            db.commit()
+            before = db.execute(select(WALLET_BALANCE).where(Wallet.id == merchant[0])).scalar()
+        logger.info(f"Running with {stripes} stripes for {args.seconds}s")
+        result = run(engine, merchant, senders, args.seconds)
+        result["balance_matches"] = result.pop("merchant_balance") - before == result["transfers"] * AMOUNT
+        results["runs"][f"stripes_{stripes}"] = result
+
+    unstriped, striped = results["runs"]["stripes_0"], results["runs"][f"stripes_{args.stripes}"]
+    results["speedup"] = round(striped["transfers_per_second"] / max(unstriped["transfers_per_second"], 0.1), 2)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
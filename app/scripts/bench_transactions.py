@@ -0,0 +1,285 @@
+"""
+Latency of filtered GET /wallet/transactions queries on a large table.
+
+Usage:
+    # Seed an EMPTY database with 10M journal entries, then time every filter
+    python -m app.scripts.bench_transactions --database-url postgresql://... --seed --rows 10000000
+    # Time again later (or against an existing dev copy)
+    python -m app.scripts.bench_transactions --database-url postgresql://... --output history.json
+
+Seeding runs server-side (INSERT ... SELECT generate_series) in chunks.
+Users get a power-law share of the entries, so the heaviest user owns a
+few percent of the table, spread over the last two years (monthly
+partitions are created for them). Each entry gets its postings in the
+same statement: one for deposits and withdrawals, a debit and a credit
+for transfers to a random other wallet. The secondary indexes of both
+tables are dropped during the load and rebuilt afterwards.
+
+Each case runs the same query the route runs (history_query) for the
+heaviest user and for a median one, `--repeat` times. It reports
+p50/p95/max in milliseconds, the indexes the plan used and how many
+monthly partitions it reads. A case whose
+p95 is over --budget-ms (default 10) fails the run with exit status 1.
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app.database import Base
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.models.transactions import Posting, Transaction, TransactionStatus, TransactionType
+from app.services.partitions import ensure_partitions, month_start
+from app.services.transaction_history import TransactionFilters, history_query, read_history
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("card", "bank", "ussd", "bank_transfer", "mobile_money")
+
+SEED_TRANSACTIONS = """
+WITH entries AS (
+    INSERT INTO transactions (id, user_id, wallet_id, amount, currency, transaction_type, status,
+                              sender_wallet_id, recipient_wallet_id, reference, transaction_data, created_at, updated_at)
+    SELECT gen_random_uuid(), w.user_id, w.id, g.amount, 'NGN', g.kind::{type_enum},
+           CASE WHEN g.r2 < 0.90 THEN 'SUCCESS' WHEN g.r2 < 0.95 THEN 'PENDING' ELSE 'FAILED' END::{status_enum},
+           CASE WHEN g.kind = 'TRANSFER' THEN w.id END,
+           CASE WHEN g.kind = 'TRANSFER' THEN c.id END,
+           CASE g.kind WHEN 'DEPOSIT' THEN 'dep_' WHEN 'WITHDRAWAL' THEN 'wdr_' ELSE 'trn_' END
+               || substr(md5(g.i::text), 1, 22),
+           CASE g.kind
+               WHEN 'DEPOSIT' THEN jsonb_build_object('provider', 'paystack', 'channel', (CAST(:channels AS text[]))[1 + floor(g.r3 * :channel_count)::int])
+               WHEN 'TRANSFER' THEN jsonb_build_object('sender_wallet', w.wallet_number, 'recipient_wallet', c.wallet_number)
+           END,
+           g.created_at, g.created_at
+    FROM (
+        SELECT i, owner,
+               CASE WHEN r1 < 0.50 THEN 'DEPOSIT' WHEN r1 < 0.95 THEN 'TRANSFER' ELSE 'WITHDRAWAL' END AS kind,
+               random() AS r2, random() AS r3,
+               -- never the owner: a wallet has one posting per entry
+               (owner + floor(random() * (:users - 1))::int) % :users + 1 AS counterparty,
+               round((1 + random() * 50000)::numeric, 2)::float8 AS amount,
+               now() - random() * interval '730 days' AS created_at
+        FROM (SELECT i, random() AS r1, floor(:users * power(random(), 3))::int + 1 AS owner FROM generate_series(:start, :stop) i) s
+    ) g
+    JOIN wallets w ON w.wallet_number = lpad(g.owner::text, 13, '0')
+    JOIN wallets c ON c.wallet_number = lpad(g.counterparty::text, 13, '0')
+    RETURNING id, wallet_id, recipient_wallet_id, amount, transaction_type, created_at
+)
+INSERT INTO postings (wallet_id, created_at, transaction_id, amount, transaction_type)
+SELECT p.wallet_id, e.created_at, e.id, p.amount, e.transaction_type
+FROM entries e
+CROSS JOIN LATERAL (VALUES
+    (e.wallet_id, CASE WHEN e.transaction_type = 'DEPOSIT' THEN e.amount ELSE -e.amount END),
+    (e.recipient_wallet_id, e.amount)
+) p (wallet_id, amount)
+WHERE p.wallet_id IS NOT NULL
+"""
+
+
+def seed(conn: Connection, rows: int, users: int, chunk: int):
+    if conn.execute(select(func.count()).select_from(User)).scalar():
+        raise SystemExit("--seed needs an empty database")
+
+    logger.info(f"Seeding {users} users/wallets")
+    conn.execute(text(
+        "INSERT INTO users (id, email, google_id) "
+        "SELECT gen_random_uuid(), 'bench' || i || '@bench.local', 'bench-' || i FROM generate_series(1, :users) i"
+    ), {"users": users})
+    conn.execute(text(
+        "INSERT INTO wallets (id, user_id, wallet_number, balance) "
+        "SELECT gen_random_uuid(), id, lpad(substr(google_id, 7), 13, '0'), 0 FROM users WHERE email LIKE '%@bench.local'"
+    ))
+    conn.commit()
+
+    with Session(conn) as db:
+        ensure_partitions(db, start=month_start(datetime.now(timezone.utc) - timedelta(days=731)))
+
+    table = Transaction.__table__
+    secondary = [*table.indexes, *Posting.__table__.indexes]
+    for index in secondary:
+        index.drop(conn, checkfirst=True)
+    conn.commit()
+
+    statement = text(SEED_TRANSACTIONS.format(
+        type_enum=table.c.transaction_type.type.name, status_enum=table.c.status.type.name
+    ))
+    start = time.perf_counter()
+    for offset in range(0, rows, chunk):
+        conn.execute(statement, {
+            "start": offset + 1, "stop": min(offset + chunk, rows), "users": users,
+            "channels": list(CHANNELS), "channel_count": len(CHANNELS),
+        })
+        conn.commit()
+        done = min(offset + chunk, rows)
+        logger.info(f"{done}/{rows} entries ({done / (time.perf_counter() - start):.0f} entries/s)")
+
+    for index in secondary:
+        logger.info(f"Building {index.name}")
+        index.create(conn)
+        conn.commit()
+    conn.execute(text("ANALYZE users"))
+    conn.execute(text("ANALYZE wallets"))
+    conn.execute(text("ANALYZE transactions"))
+    conn.execute(text("ANALYZE postings"))
+    conn.commit()
+
+
+def pick_users(conn: Connection) -> dict:
+    counts = conn.execute(
+        select(Wallet.user_id, func.count().label("n")).join(Posting, Posting.wallet_id == Wallet.id)
+        .group_by(Wallet.user_id).order_by(func.count().desc())
+    ).all()
+    return {"heaviest": counts[0], "median": counts[len(counts) // 2]}
+
+
+def sample_values(conn: Connection, user_id) -> dict:
+    """A real reference prefix and counterparty for the user, so those filters match"""
+    reference = conn.execute(
+        select(Transaction.reference).where(Transaction.user_id == user_id).order_by(Transaction.created_at.desc()).limit(1)
+    ).scalar()
+    counterparty = conn.execute(
+        select(Transaction.transaction_data["recipient_wallet"].astext).where(
+            Transaction.user_id == user_id, Transaction.transaction_data.has_key("recipient_wallet")
+        ).limit(1)
+    ).scalar()
+    return {"reference_prefix": reference[:12], "counterparty": counterparty}
+
+
+def cases(values: dict) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "no_filter": TransactionFilters(),
+        "type_status": TransactionFilters(transaction_type=TransactionType.DEPOSIT, status=TransactionStatus.SUCCESS),
+        "failed_only": TransactionFilters(status=TransactionStatus.FAILED),
+        "reference_prefix": TransactionFilters(reference_prefix=values["reference_prefix"]),
+        "amount_range": TransactionFilters(min_amount=1000, max_amount=1100),
+        "date_range_7d": TransactionFilters(start_date=now - timedelta(days=7), end_date=now),
+        "date_range_old_month": TransactionFilters(start_date=now - timedelta(days=400), end_date=now - timedelta(days=370)),
+        "counterparty": TransactionFilters(counterparty=values["counterparty"]),
+        "channel": TransactionFilters(channel="ussd"),
+        "combined": TransactionFilters(
+            transaction_type=TransactionType.TRANSFER, status=TransactionStatus.SUCCESS,
+            min_amount=10000, max_amount=20000, start_date=now - timedelta(days=90),
+        ),
+    }
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) <select>, keeping the select's bind parameters"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def _scans(plan: dict) -> list:
+    """(relation, index or None) for every scan node in an EXPLAIN plan"""
+    found = []
+    if "Relation Name" in plan:
+        found.append((plan["Relation Name"], plan.get("Index Name")))
+    for child in plan.get("Plans", []):
+        found.extend(_scans(child))
+    return found
+
+
+def parent_indexes(conn: Connection) -> dict:
+    """Partition index name -> the `transactions` index it was created from"""
+    return dict(conn.execute(text(
+        "SELECT c.relname, p.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent WHERE c.relkind = 'i'"
+    )).all())
+
+
+def time_case(conn: Connection, user_id, filters: TransactionFilters, limit: int, repeat: int, parents: dict, pages: int = 1) -> dict:
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        after = None
+        for _ in range(pages):
+            page, after = read_history(conn, user_id, filters, limit, after)
+            if not after:
+                break
+        timings.append((time.perf_counter() - start) * 1000 / pages)
+        rows = len(page)
+
+    wallet_id = conn.execute(select(Wallet.id).where(Wallet.user_id == user_id)).scalar()
+    scans = _scans(conn.execute(Explain(history_query(wallet_id, filters, limit, postgres=True))).scalar()[0]["Plan"])
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "max_ms": round(timings[-1], 3),
+        "rows": rows,
+        "indexes": sorted({parents.get(index, index) for _, index in scans if index}),
+        "partitions": len({relation for relation, _ in scans}),
+    }
+
+
+def run(conn: Connection, limit: int, repeat: int) -> dict:
+    total = conn.execute(select(func.count()).select_from(Posting)).scalar()
+    parents = parent_indexes(conn)
+    results = {"table_rows": total, "limit": limit, "repeat": repeat, "users": {}, "cases": {}}
+    for label, (user_id, count) in pick_users(conn).items():
+        results["users"][label] = {"user_id": str(user_id), "transactions": count}
+        values = sample_values(conn, user_id)
+        for name, filters in cases(values).items():
+            results["cases"][f"{name}[{label}]"] = time_case(conn, user_id, filters, limit, repeat, parents)
+        results["cases"][f"deep_page_10[{label}]"] = time_case(conn, user_id, TransactionFilters(), limit, repeat, parents, pages=10)
+        conn.rollback()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filtered transaction history queries")
+    parser.add_argument("--database-url", required=True, help="Postgres database to seed/time (never production)")
+    parser.add_argument("--seed", action="store_true", help="Seed users, wallets, entries and postings first")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Journal entries to seed")
+    parser.add_argument("--users", type=int, default=10_000, help="Users to seed")
+    parser.add_argument("--chunk", type=int, default=500_000, help="Rows per seeding statement")
+    parser.add_argument("--limit", type=int, default=100, help="Page size, as the route's `limit`")
+    parser.add_argument("--repeat", type=int, default=30, help="Timed runs per case")
+    parser.add_argument("--budget-ms", type=float, default=10.0, help="Fail when a case's p95 exceeds this")
+    parser.add_argument("--output", help="Write results JSON here instead of stdout")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Postgres only")
+    Base.metadata.create_all(engine, tables=[User.__table__, Wallet.__table__, Transaction.__table__, Posting.__table__])
+
+    with engine.connect() as conn:
+        if args.seed:
+            seed(conn, args.rows, args.users, args.chunk)
+        results = run(conn, args.limit, args.repeat)
+
+    over = {name: case["p95_ms"] for name, case in results["cases"].items() if case["p95_ms"] > args.budget_ms}
+    results["budget_ms"] = args.budget_ms
+    results["over_budget"] = over
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if over:
+        logger.error(f"{len(over)} cases over {args.budget_ms} ms at p95: {over}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Local stand-in for the Paystack API, for exercising the client's
+breaker, retries and hedging without touching the real service.
+
+Usage:
+    python -m app.scripts.fake_paystack --port 8090 --latency-ms 50 --jitter-ms 200 --error-rate 0.2
+
+Then point the app at it:
+    PAYSTACK_INITIALIZE_URL=http://127.0.0.1:8090/transaction/initialize
+    PAYSTACK_VERIFY_URL=http://127.0.0.1:8090/transaction/verify
+
+POST /_fake/config with any of latency_ms, jitter_ms, error_rate, down to
+change the behaviour at runtime; GET /_fake/config shows call counts.
+"""
+import argparse
+import asyncio
+import random
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0) -> FastAPI:
+    app = FastAPI(title="Fake Paystack")
+    state = {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate, "down": False, "calls": 0, "transactions": {}}
+
+    async def misbehave():
+        state["calls"] += 1
+        await asyncio.sleep((state["latency_ms"] + random.uniform(0, state["jitter_ms"])) / 1000)
+        if state["down"] or random.random() < state["error_rate"]:
+            return JSONResponse({"status": False, "message": "Service unavailable"}, status_code=503)
+        return None
+
+    @app.post("/transaction/initialize")
+    async def initialize(request: Request):
+        body = await request.json()
+        error = await misbehave()
+        if error:
+            return error
+        state["transactions"][body["reference"]] = body["amount"]
+        return {
+            "status": True,
+            "data": {
+                "reference": body["reference"],
+                "authorization_url": f"https://checkout.fake/{body['reference']}",
+                "access_code": body["reference"],
+            },
+        }
+
+    @app.get("/transaction/verify/{reference}")
+    async def verify(reference: str):
+        error = await misbehave()
+        if error:
+            return error
+        if reference not in state["transactions"]:
+            return JSONResponse({"status": False, "message": "Transaction reference not found"}, status_code=400)
+        return {"status": True, "data": {"status": "success", "amount": state["transactions"][reference], "reference": reference}}
+
+    @app.get("/_fake/config")
+    def get_config():
+        return {key: value for key, value in state.items() if key != "transactions"}
+
+    @app.post("/_fake/config")
+    async def set_config(request: Request):
+        for key, value in (await request.json()).items():
+            if key in ("latency_ms", "jitter_ms", "error_rate", "down"):
+                state[key] = value
+        return get_config()
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Paystack API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms, args.error_rate), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,572 @@
+"""
+Seeded synthetic dataset for scale testing: users, wallets, API keys and a
+transaction history with production-like volume.
+
+Usage:
+    python -m app.scripts.generate_dataset --database-url postgresql://localhost/wallet_dev \\
+        --users 100000 --transactions 10000000 --seed 42 --keys-output keys.ndjson
+    # Same data on another machine: same seed, counts and --end
+    python -m app.scripts.generate_dataset --database-url ... --seed 42 --end 2026-10-01
+
+The database must be empty (the schema is created if missing). Rows are
+generated in fixed blocks of BLOCK_ROWS, each from its own RNG seeded with
+(seed, block), so the dataset depends only on the seed, the counts and
+--end, never on --workers. Blocks are generated and loaded in parallel by
+a process pool: COPY on Postgres, batched inserts elsewhere (one worker).
+
+Shape of the data:
+  - sign-ups accelerate over the --days window; earlier users are the
+    heavy ones, and activity per user follows a power law (--skew)
+  - timestamps follow a Lagos day (quiet nights, busy evenings) and lean
+    towards the recent end of the window
+  - deposits (Paystack channels; some pending or failed), transfers (one
+    journal entry with a debit and a credit posting, as POST
+    /wallet/transfer writes them) and a few withdrawals, with log-normal
+    amounts
+  - 0-5 API keys per user, some expired or revoked; the plaintext keys go
+    to --keys-output so auth benchmarks can use them
+
+Afterwards every balance is set from its ledger, and wallets that would
+end up negative get a dated opening deposit, so app.scripts.reconcile
+passes. ledger_events is not filled and the target is a single database
+(an unsharded deployment or shard 0 on its own).
+"""
+import argparse
+import base64
+import csv
+import hashlib
+import io
+import json
+import logging
+import math
+import operator
+import os
+import random
+import time
+import uuid
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import accumulate
+from multiprocessing import get_context
+from typing import Dict, List, Tuple
+from sqlalchemy import JSON, DateTime, Enum, Float, Numeric, cast, create_engine, func, insert, select, text, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import Base
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.models.transactions import Posting, Transaction, TransactionStatus, TransactionType
+from app.auth.api_key_auth import hash_api_key
+from app.auth.permissions import Permission
+from app.services.partitions import ensure_partitions, month_start
+from app.services.provisioning import OPENING_REFERENCE_PREFIX
+from app.services.journal import posting_rows, reference_rows, transfer_data
+from app.services.reconciliation import POSTED
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BLOCK_ROWS = 10_000
+# Multiplier coprime to 10**13, so distinct user indexes get distinct wallet numbers
+WALLET_NUMBER_STEP = 6_700_417
+
+FIRST_NAMES = ("Adaeze", "Chinedu", "Ngozi", "Tunde", "Amaka", "Emeka", "Funmi", "Ifeanyi", "Kemi", "Obinna",
+               "Seun", "Tobi", "Uche", "Yemi", "Zainab", "Bola", "Chioma", "Dayo", "Femi", "Halima")
+LAST_NAMES = ("Okafor", "Adeyemi", "Bello", "Eze", "Ibrahim", "Nwosu", "Ogunleye", "Okonkwo", "Balogun", "Udeh",
+              "Musa", "Obi", "Adebayo", "Chukwu", "Lawal", "Onyeka", "Salami", "Yusuf", "Afolabi", "Nnamdi")
+KEY_NAMES = ("production", "staging", "backend", "mobile-app", "reporting", "payroll", "ci")
+CHANNELS = (("card", 55), ("bank", 15), ("bank_transfer", 20), ("ussd", 7), ("mobile_money", 3))
+PERMISSION_MASKS = (
+    (Permission.READ, 30), (Permission.READ | Permission.DEPOSIT, 15),
+    (Permission.READ | Permission.TRANSFER, 20), (Permission.ALL, 35),
+)
+KEY_LIFETIMES = ((timedelta(hours=1), 5), (timedelta(days=1), 15), (timedelta(days=30), 40), (timedelta(days=365), 40))
+KEYS_PER_USER = ((0, 55), (1, 25), (2, 10), (3, 5), (4, 3), (5, 2))
+KINDS = ((TransactionType.DEPOSIT, 40), (TransactionType.TRANSFER, 55), (TransactionType.WITHDRAWAL, 5))
+# Relative activity per UTC hour (Lagos is UTC+1): quiet nights, evening peak
+HOURLY_ACTIVITY = (2, 1, 1, 1, 2, 4, 7, 10, 12, 12, 11, 12, 13, 12, 11, 11, 12, 14, 16, 16, 14, 10, 6, 4)
+
+TABLE_COLUMNS = {
+    "users": ["id", "email", "name", "google_id", "created_at", "updated_at"],
+    "wallets": ["id", "user_id", "wallet_number", "balance", "created_at", "updated_at"],
+    "api_keys": ["id", "user_id", "name", "key", "permission_mask", "is_active", "expires_at", "revoked_at", "created_at"],
+    "transactions": ["id", "user_id", "wallet_id", "amount", "currency", "transaction_type", "status",
+                     "recipient_wallet_id", "sender_wallet_id", "description", "reference", "transaction_data",
+                     "created_at", "updated_at"],
+    "transaction_references": ["reference", "transaction_id", "created_at"],
+    "postings": ["wallet_id", "created_at", "transaction_id", "amount", "transaction_type"],
+}
+# Parents first, for the foreign keys
+LOAD_ORDER = ("users", "wallets", "api_keys", "transactions", "transaction_references", "postings")
+
+_engines: Dict[str, Engine] = {}
+
+
+def _weighted(choices) -> Tuple[list, list]:
+    """(values, cumulative weights) for _pick"""
+    values, weights = zip(*choices)
+    return list(values), list(accumulate(weights))
+
+
+def _pick(rng: random.Random, weighted: Tuple[list, list]):
+    return rng.choices(weighted[0], cum_weights=weighted[1])[0]
+
+
+_CHANNELS = _weighted(CHANNELS)
+_PERMISSION_MASKS = _weighted(PERMISSION_MASKS)
+_KEY_LIFETIMES = _weighted(KEY_LIFETIMES)
+_KEYS_PER_USER = _weighted(KEYS_PER_USER)
+_KINDS = _weighted(KINDS)
+_HOURS = list(accumulate(HOURLY_ACTIVITY))
+
+
+@lru_cache(maxsize=1 << 16)
+def _stable_id(seed: int, kind: str, index) -> uuid.UUID:
+    # Cached: the power law sends most rows to the same few thousand users
+    digest = hashlib.blake2b(f"{seed}:{kind}:{index}".encode(), digest_size=16).digest()
+    return uuid.UUID(bytes=digest, version=4)
+
+
+class Dataset:
+    """Everything that derives a row from (seed, index) without looking at other blocks"""
+
+    def __init__(self, seed: int, users: int, transactions: int, end: datetime, days: int, skew: float):
+        self.seed = seed
+        self.users = users
+        self.transactions = transactions
+        self.end = end
+        self.start = end - timedelta(days=days)
+        self.window = (end - self.start).total_seconds()
+        self.skew = skew
+        self.wallet_number_offset = random.Random(f"{seed}:wallet-numbers").randrange(10**13)
+
+    def rng(self, kind: str, block: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{block}")
+
+    def stable_id(self, kind: str, index) -> uuid.UUID:
+        return _stable_id(self.seed, kind, index)
+
+    def user_id(self, index: int) -> uuid.UUID:
+        return self.stable_id("user", index)
+
+    def wallet_id(self, index: int) -> uuid.UUID:
+        return self.stable_id("wallet", index)
+
+    def wallet_number(self, index: int) -> str:
+        return f"{(index * WALLET_NUMBER_STEP + self.wallet_number_offset) % 10**13:013d}"
+
+    def signed_up_at(self, index: int) -> datetime:
+        # Sign-ups grow linearly, so the user count grows with the square of time;
+        # the newest tenth of the window is left for their activity
+        return self.start + timedelta(seconds=self.window * 0.9 * math.sqrt(index / self.users))
+
+    def active_user(self, rng: random.Random) -> int:
+        """A user index; low indexes (the oldest users) are far more active"""
+        return min(int(self.users * rng.random() ** self.skew), self.users - 1)
+
+    def timestamp(self, rng: random.Random, after: datetime) -> datetime:
+        span = (self.end - after).total_seconds()
+        # Leaning towards the recent end: the user base keeps growing
+        moment = after + timedelta(seconds=span * rng.random() ** 0.7)
+        hour = bisect(_HOURS, rng.random() * _HOURS[-1])
+        moment = moment.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60),
+                                microsecond=rng.randrange(1_000_000))
+        if moment >= self.end:
+            moment -= timedelta(days=1)
+        return max(moment, after)
+
+    def token(self, rng: random.Random, size: int) -> str:
+        """Like secrets.token_urlsafe(size), from the block's RNG"""
+        return base64.urlsafe_b64encode(rng.randbytes(size)).rstrip(b"=").decode()
+
+    def blocks(self, total: int) -> List[Tuple[int, int]]:
+        return [(lo, min(lo + BLOCK_ROWS, total)) for lo in range(0, total, BLOCK_ROWS)]
+
+
+def user_block(dataset: Dataset, lo: int, hi: int) -> Tuple[Dict[str, list], list]:
+    """Users, wallets and API keys for user indexes [lo, hi), plus the plaintext keys"""
+    rng = dataset.rng("users", lo // BLOCK_ROWS)
+    rows = {"users": [], "wallets": [], "api_keys": []}
+    keys = []
+
+    for index in range(lo, hi):
+        user_id = dataset.user_id(index)
+        created_at = dataset.signed_up_at(index)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        rows["users"].append({
+            "id": user_id,
+            "email": f"{first.lower()}.{last.lower()}.{index}@synthetic.walletflow.test",
+            "name": f"{first} {last}",
+            "google_id": f"synthetic-{dataset.seed}-{index}",
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+        rows["wallets"].append({
+            "id": dataset.wallet_id(index),
+            "user_id": user_id,
+            "wallet_number": dataset.wallet_number(index),
+            "balance": 0.0,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+
+        key_count = _pick(rng, _KEYS_PER_USER)
+        for n in range(key_count):
+            key_created = dataset.timestamp(rng, created_at)
+            expires_at = key_created + _pick(rng, _KEY_LIFETIMES)
+            revoked_at = None
+            if rng.random() < 0.1:
+                revoked_at = key_created + (min(expires_at, dataset.end) - key_created) * rng.random()
+            key = settings.API_KEY_PREFIX + dataset.token(rng, 32)
+            mask = _pick(rng, _PERMISSION_MASKS)
+            rows["api_keys"].append({
+                "id": dataset.stable_id("api-key", f"{index}:{n}"),
+                "user_id": user_id,
+                "name": rng.choice(KEY_NAMES),
+                "key": hash_api_key(key),
+                "permission_mask": int(mask),
+                "is_active": revoked_at is None,
+                "expires_at": expires_at,
+                "revoked_at": revoked_at,
+                "created_at": key_created,
+            })
+            keys.append({
+                "user_id": str(user_id),
+                "wallet_number": dataset.wallet_number(index),
+                "api_key": key,
+                "permission_mask": int(mask),
+                "usable": revoked_at is None and expires_at > dataset.end,
+            })
+
+    return rows, keys
+
+
+def _amount(rng: random.Random, mu: float, sigma: float) -> float:
+    amount = min(max(math.exp(rng.gauss(mu, sigma)), 100.0), 5_000_000.0)
+    # People mostly type round numbers
+    return float(round(amount, -2)) if rng.random() < 0.6 else round(amount, 2)
+
+
+def transaction_block(dataset: Dataset, lo: int, hi: int) -> Dict[str, list]:
+    """Journal entries [lo, hi) of the history, with their postings"""
+    rng = dataset.rng("transactions", lo // BLOCK_ROWS)
+    rows, postings = [], []
+
+    def row(index: int, **values) -> dict:
+        return {
+            "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+            "user_id": dataset.user_id(index),
+            "wallet_id": dataset.wallet_id(index),
+            "currency": "NGN",
+            "recipient_wallet_id": None,
+            "sender_wallet_id": None,
+            "description": None,
+            **values,
+        }
+
+    def post(entry: dict, index: int, amount: float):
+        postings.append(posting_rows(entry, [(dataset.wallet_id(index), amount)])[0])
+
+    while len(rows) < hi - lo:
+        owner = dataset.active_user(rng)
+        kind = _pick(rng, _KINDS)
+
+        if kind == TransactionType.TRANSFER:
+            recipient = dataset.active_user(rng)
+            if recipient == owner:
+                recipient = (owner + 1) % dataset.users
+            created_at = dataset.timestamp(rng, max(dataset.signed_up_at(owner), dataset.signed_up_at(recipient)))
+            amount = _amount(rng, 8.3, 1.3)
+            entry = row(
+                owner,
+                amount=amount,
+                transaction_type=TransactionType.TRANSFER,
+                status=TransactionStatus.SUCCESS,
+                sender_wallet_id=dataset.wallet_id(owner),
+                recipient_wallet_id=dataset.wallet_id(recipient),
+                reference=f"trn_{dataset.token(rng, 16)}",
+                transaction_data=transfer_data(dataset.wallet_number(owner), dataset.wallet_number(recipient)),
+                created_at=created_at,
+                updated_at=created_at,
+            )
+            rows.append(entry)
+            post(entry, owner, -amount)
+            post(entry, recipient, amount)
+            continue
+
+        created_at = dataset.timestamp(rng, dataset.signed_up_at(owner))
+        age = (dataset.end - created_at).total_seconds()
+        roll = rng.random()
+
+        if kind == TransactionType.DEPOSIT:
+            reference = f"dep_{dataset.token(rng, 16)}"
+            # Recent deposits are often still at checkout; old pending ones were abandoned
+            if roll < (0.6 if age < 3600 else 0.02):
+                status = TransactionStatus.PENDING
+            elif roll < (0.65 if age < 3600 else 0.08):
+                status = TransactionStatus.FAILED
+            else:
+                status = TransactionStatus.SUCCESS
+            data = {
+                "authorization_url": f"https://checkout.paystack.com/{reference[4:16]}",
+                "provider": "paystack",
+            }
+            if status != TransactionStatus.PENDING:
+                data["channel"] = _pick(rng, _CHANNELS)
+            amount = _amount(rng, 9.0, 1.2)
+        else:
+            reference = f"wdr_{dataset.token(rng, 16)}"
+            status = TransactionStatus.FAILED if roll < 0.05 else TransactionStatus.SUCCESS
+            data = {"provider": "paystack", "channel": "bank_transfer"}
+            amount = _amount(rng, 9.5, 1.0)
+
+        settled_at = created_at if status == TransactionStatus.PENDING else min(
+            created_at + timedelta(seconds=rng.randrange(5, 600)), dataset.end
+        )
+        entry = row(
+            owner,
+            amount=amount,
+            transaction_type=kind,
+            status=status,
+            reference=reference,
+            transaction_data=data,
+            created_at=created_at,
+            updated_at=settled_at,
+        )
+        rows.append(entry)
+        post(entry, owner, amount if kind == TransactionType.DEPOSIT else -amount)
+
+    return {"transactions": rows, "transaction_references": reference_rows(rows), "postings": postings}
+
+
+def _csv_converters(table: str) -> list:
+    """Per column of TABLE_COLUMNS[table], how to turn a value into COPY text (None: as is)"""
+    converters = []
+    for name in TABLE_COLUMNS[table]:
+        column_type = Base.metadata.tables[table].c[name].type
+        if isinstance(column_type, Enum):
+            converters.append(operator.attrgetter("name"))  # enums are stored by name
+        elif isinstance(column_type, (JSON, JSONB)):
+            converters.append(json.dumps)
+        elif isinstance(column_type, DateTime):
+            converters.append(datetime.isoformat)
+        else:
+            converters.append(None)
+    return converters
+
+
+def write_rows(conn: Connection, table: str, rows: List[dict]):
+    if not rows:
+        return
+    columns = TABLE_COLUMNS[table]
+    if conn.dialect.name != "postgresql":
+        conn.execute(insert(Base.metadata.tables[table]), rows)
+        return
+
+    converters = list(zip(columns, _csv_converters(table)))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            value if convert is None or value is None else convert(value)
+            for column, convert in converters
+            for value in (row[column],)
+        ])
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def load_block(url: str, dataset: Dataset, kind: str, lo: int, hi: int) -> Tuple[Dict[str, int], list]:
+    """Generate one block and load it in its own DB transaction; returns row counts and plaintext keys"""
+    engine = _engines.get(url)
+    if engine is None:
+        engine = _engines[url] = create_engine(url)
+
+    keys = []
+    if kind == "users":
+        tables, keys = user_block(dataset, lo, hi)
+    else:
+        tables = transaction_block(dataset, lo, hi)
+
+    with engine.begin() as conn:
+        for table in LOAD_ORDER:
+            write_rows(conn, table, tables.get(table, []))
+    return {table: len(rows) for table, rows in tables.items()}, keys
+
+
+def _run_blocks(url: str, dataset: Dataset, kind: str, total: int, workers: int, on_result) -> float:
+    tasks = [(url, dataset, kind, lo, hi) for lo, hi in dataset.blocks(total)]
+    start = time.perf_counter()
+    if workers > 1:
+        # spawn: children must not inherit the parent's pooled connections
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            for done, result in enumerate(pool.map(load_block, *zip(*tasks)), start=1):
+                on_result(done, len(tasks), *result)
+    else:
+        for done, task in enumerate(tasks, start=1):
+            on_result(done, len(tasks), *load_block(*task))
+    return time.perf_counter() - start
+
+
+def settle_balances(conn: Connection, dataset: Dataset) -> dict:
+    """Set every balance from its ledger; wallets that would be negative get an opening deposit first"""
+    # Summed as numeric: a float sum would depend on the order the rows were loaded in
+    total = cast(func.sum(cast(Posting.amount, Numeric(20, 2))), Float)
+    ledger = select(Posting.wallet_id, total.label("total")).join(Transaction, POSTED).where(
+        Transaction.status == TransactionStatus.SUCCESS
+    ).group_by(Posting.wallet_id).subquery()
+    conn.execute(update(Wallet).where(Wallet.id == ledger.c.wallet_id).values(
+        balance=ledger.c.total, updated_at=Wallet.updated_at  # not now(): keep the dataset reproducible
+    ))
+
+    overdrawn = conn.execute(
+        select(Wallet.id, Wallet.user_id, Wallet.wallet_number, Wallet.balance, Wallet.created_at).where(Wallet.balance < 0)
+    ).all()
+    openings = []
+    for wallet in overdrawn:
+        # Rounded up to the next 1,000 so balances do not all end at exactly zero
+        amount = float(math.ceil(-wallet.balance / 1000) * 1000)
+        openings.append({
+            "id": dataset.stable_id("opening", wallet.wallet_number),
+            "user_id": wallet.user_id,
+            "wallet_id": wallet.id,
+            "amount": amount,
+            "currency": "NGN",
+            "transaction_type": TransactionType.DEPOSIT,
+            "status": TransactionStatus.SUCCESS,
+            "recipient_wallet_id": None,
+            "sender_wallet_id": None,
+            "description": "Opening balance",
+            "reference": OPENING_REFERENCE_PREFIX + wallet.wallet_number,
+            "transaction_data": None,
+            "created_at": wallet.created_at,
+            "updated_at": wallet.created_at,
+        })
+    for offset in range(0, len(openings), BLOCK_ROWS):
+        batch = openings[offset:offset + BLOCK_ROWS]
+        write_rows(conn, "transactions", batch)
+        write_rows(conn, "transaction_references", reference_rows(batch))
+        write_rows(conn, "postings", [posting_rows(entry, [(entry["wallet_id"], entry["amount"])])[0] for entry in batch])
+    if openings:
+        opening = select(Transaction.wallet_id, Transaction.amount).where(
+            Transaction.reference.startswith(OPENING_REFERENCE_PREFIX)
+        ).subquery()
+        conn.execute(update(Wallet).where(Wallet.id == opening.c.wallet_id).values(
+            balance=Wallet.balance + opening.c.amount, updated_at=Wallet.updated_at
+        ))
+    conn.commit()
+    return {"opening_deposits": len(openings), "opening_total": round(sum(row["amount"] for row in openings), 2)}
+
+
+def generate(url: str, dataset: Dataset, workers: int, keys_output: str = None, keep_indexes: bool = False) -> dict:
+    engine = create_engine(url)
+    postgres = engine.dialect.name == "postgresql"
+    if not postgres and workers > 1:
+        logger.warning(f"{engine.dialect.name} takes one writer at a time, loading with 1 worker")
+        workers = 1
+
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(User)).scalar():
+            raise SystemExit("The dataset needs an empty database")
+        if postgres:
+            with Session(conn) as db:
+                ensure_partitions(db, start=month_start(dataset.start))
+            conn.commit()
+
+    secondary = [*Transaction.__table__.indexes, *Posting.__table__.indexes] if postgres and not keep_indexes else []
+    if secondary:
+        with engine.begin() as conn:
+            for index in secondary:
+                index.drop(conn, checkfirst=True)
+
+    counts = {table: 0 for table in LOAD_ORDER}
+    keys_file = open(keys_output, "w") if keys_output else None
+    timings = {}
+
+    def on_result(done: int, total: int, block_counts: dict, keys: list):
+        for name, count in block_counts.items():
+            counts[name] += count
+        if keys_file:
+            for key in keys:
+                keys_file.write(json.dumps(key) + "\n")
+        if done % 10 == 0 or done == total:
+            logger.info(f"{done}/{total} blocks, {counts}")
+
+    try:
+        logger.info(f"Generating {dataset.users} users (seed {dataset.seed}, {workers} workers)")
+        timings["users"] = _run_blocks(url, dataset, "users", dataset.users, workers, on_result)
+        logger.info(f"Generating {dataset.transactions} journal entries")
+        timings["transactions"] = _run_blocks(url, dataset, "transactions", dataset.transactions, workers, on_result)
+    finally:
+        if keys_file:
+            keys_file.close()
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        for index in secondary:
+            logger.info(f"Building {index.name}")
+            index.create(conn)
+            conn.commit()
+        logger.info("Settling balances")
+        opening = settle_balances(conn, dataset)
+        if postgres:
+            for name in LOAD_ORDER:
+                conn.execute(text(f"ANALYZE {name}"))
+            conn.commit()
+    timings["finish"] = time.perf_counter() - start
+    engine.dispose()
+
+    elapsed = sum(timings.values())
+    rows = sum(counts.values())
+    return {
+        "seed": dataset.seed,
+        "start": dataset.start.isoformat(),
+        "end": dataset.end.isoformat(),
+        "skew": dataset.skew,
+        "workers": workers,
+        "method": "copy" if postgres else "insert",
+        **counts,
+        **opening,
+        "keys_output": keys_output,
+        "elapsed_seconds": {name: round(value, 3) for name, value in timings.items()},
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+    }
+
+
+def _end_of(value: str) -> datetime:
+    end = datetime.fromisoformat(value)
+    return end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+
+
+def main():
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic WalletFlow dataset")
+    parser.add_argument("--database-url", required=True, help="Empty database to fill (never production)")
+    parser.add_argument("--users", type=int, default=10_000, help="Users, each with one wallet")
+    parser.add_argument("--transactions", type=int, default=1_000_000, help="Journal entries (transfers add two postings)")
+    parser.add_argument("--seed", type=int, default=42, help="Same seed, counts and --end give the same dataset")
+    parser.add_argument("--end", type=_end_of, default=today, help="Newest timestamp, ISO 8601 (default: today 00:00 UTC)")
+    parser.add_argument("--days", type=int, default=730, help="History length")
+    parser.add_argument("--skew", type=float, default=3.0, help="Power-law exponent of activity per user (1 = uniform)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Generator/loader processes")
+    parser.add_argument("--keys-output", help="Write the plaintext API keys here as NDJSON")
+    parser.add_argument("--keep-indexes", action="store_true", help="Load with the transactions and postings indexes in place")
+    args = parser.parse_args()
+
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+    dataset = Dataset(args.seed, args.users, args.transactions, args.end, args.days, args.skew)
+    print(json.dumps(generate(args.database_url, dataset, args.workers, args.keys_output, args.keep_indexes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+In-place schema upgrades for databases created by older releases.
+
+`Base.metadata.create_all` only creates missing tables, so new columns on
+existing tables are added here. Every step checks the live schema first and
+is safe to re-run.
+
+Usage:
+    python -m app.scripts.migrate
+"""
+import json
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from app.database import engine
+from app.models.transactions import Posting, Transaction, TransactionReference
+from app.services.partitions import create_partition, month_start, partition_months
+from app.auth.permissions import Permission, permissions_to_mask, mask_to_permissions
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _columns(conn: Connection, table: str) -> set:
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return set()
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def _decode_permissions(raw) -> Permission:
+    # Older rows hold the list as a JSON-encoded string inside the JSON column
+    value = raw
+    while isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            break
+
+    if not isinstance(value, list):
+        return Permission.READ
+
+    known = mask_to_permissions(Permission.ALL)
+    return permissions_to_mask([name for name in value if name in known])
+
+
+def migrate_permission_mask(conn: Connection) -> bool:
+    """api_keys.permissions (JSON) -> api_keys.permission_mask (INTEGER)"""
+    columns = _columns(conn, "api_keys")
+    if "permissions" not in columns:
+        return False
+
+    if "permission_mask" not in columns:
+        conn.execute(text("ALTER TABLE api_keys ADD COLUMN permission_mask INTEGER NOT NULL DEFAULT 0"))
+
+    rows = conn.execute(text("SELECT id, permissions FROM api_keys")).fetchall()
+    for key_id, raw in rows:
+        conn.execute(
+            text("UPDATE api_keys SET permission_mask = :mask WHERE id = :id"),
+            {"mask": int(_decode_permissions(raw)), "id": key_id}
+        )
+
+    conn.execute(text("ALTER TABLE api_keys DROP COLUMN permissions"))
+    return True
+
+
+def add_revoked_at(conn: Connection) -> bool:
+    """api_keys.revoked_at, so expired keys deactivated by maintenance stay rollover-able"""
+    if "revoked_at" in _columns(conn, "api_keys"):
+        return False
+
+    conn.execute(text("ALTER TABLE api_keys ADD COLUMN revoked_at TIMESTAMP WITH TIME ZONE"))
+    # Before maintenance existed, the only way to deactivate a key was to revoke it
+    conn.execute(text("UPDATE api_keys SET revoked_at = created_at WHERE is_active = false"))
+    return True
+
+
+def _create_missing_indexes(conn: Connection, statements: list) -> bool:
+    """Run each (table, index name, CREATE INDEX) whose index does not exist yet"""
+    applied = False
+    inspector = inspect(conn)
+    for table, name, statement in statements:
+        if not inspector.has_table(table):
+            continue
+        if name in {index["name"] for index in inspector.get_indexes(table)}:
+            continue
+        conn.execute(text(statement))
+        applied = True
+    return applied
+
+
+def add_maintenance_indexes(conn: Connection) -> bool:
+    """Composite indexes used by the active-key and stale-deposit queries"""
+    return _create_missing_indexes(conn, [
+        (
+            "api_keys",
+            "ix_api_keys_user_active_expiry",
+            "CREATE INDEX ix_api_keys_user_active_expiry ON api_keys (user_id, is_active, expires_at)",
+        ),
+        (
+            "transactions",
+            "ix_transactions_type_status_created",
+            "CREATE INDEX ix_transactions_type_status_created ON transactions (transaction_type, status, created_at)",
+        ),
+    ])
+
+
+def partition_transactions(conn: Connection) -> bool:
+    """transactions -> monthly RANGE partitions on created_at (copies every row; run in a quiet window)"""
+    if conn.dialect.name != "postgresql":
+        return False
+    if conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('transactions')")).scalar() != "r":
+        return False
+
+    conn.execute(text("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE"))
+    conn.execute(text("ALTER TABLE transactions RENAME TO transactions_unpartitioned"))
+    # Index (and PK/unique constraint) names are schema-wide; free them for the new table
+    old_indexes = conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'transactions_unpartitioned'"
+    )).scalars().all()
+    for name in old_indexes:
+        conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name[:40]}_unpartitioned"'))
+
+    Transaction.__table__.create(conn, checkfirst=True)
+    oldest = conn.execute(text("SELECT min(created_at) FROM transactions_unpartitioned")).scalar()
+    for month in partition_months(start=month_start(oldest) if oldest else None):
+        create_partition(conn, month)
+
+    columns = [column.name for column in Transaction.__table__.columns]
+    source = {
+        "created_at": "COALESCE(created_at, updated_at, now())",
+        # Also covers databases that never ran convert_transaction_data_to_jsonb
+        "transaction_data": "NULLIF(transaction_data::text, '')::jsonb",
+    }
+    conn.execute(text(
+        f"INSERT INTO transactions ({', '.join(columns)}) "
+        f"SELECT {', '.join(source.get(name, name) for name in columns)} FROM transactions_unpartitioned"
+    ))
+    conn.execute(text("DROP TABLE transactions_unpartitioned"))
+    return True
+
+
+def convert_transaction_data_to_jsonb(conn: Connection) -> bool:
+    """transactions.transaction_data TEXT -> JSONB (rewrites the table; run in a quiet window)"""
+    if conn.dialect.name != "postgresql" or "transaction_data" not in _columns(conn, "transactions"):
+        return False
+
+    data_type = conn.execute(text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'transactions' AND column_name = 'transaction_data'"
+    )).scalar()
+    if data_type == "jsonb":
+        return False
+
+    conn.execute(text(
+        "ALTER TABLE transactions ALTER COLUMN transaction_data TYPE jsonb USING NULLIF(transaction_data, '')::jsonb"
+    ))
+    return True
+
+
+def add_history_filter_indexes(conn: Connection) -> bool:
+    """Indexes behind the GET /wallet/transactions filters"""
+    if conn.dialect.name != "postgresql":
+        # text_pattern_ops and GIN are Postgres-only; the rest come from the postings table
+        return False
+    return _create_missing_indexes(conn, [
+        (
+            "transactions",
+            "ix_transactions_reference_prefix",
+            "CREATE INDEX ix_transactions_reference_prefix ON transactions (reference text_pattern_ops)",
+        ),
+        (
+            "transactions",
+            "ix_transactions_data",
+            "CREATE INDEX ix_transactions_data ON transactions USING gin (transaction_data jsonb_path_ops)",
+        ),
+    ])
+
+
+# Per-row history and reconciliation indexes, replaced by the postings table's
+OBSOLETE_TRANSACTION_INDEXES = (
+    "ix_transactions_user_created",
+    "ix_transactions_user_type_status_created",
+    "ix_transactions_user_amount",
+    "ix_transactions_wallet_status",
+)
+
+UNPOSTED = "NOT EXISTS (SELECT 1 FROM postings p WHERE p.transaction_id = t.id)"
+
+# Legacy transfers were an outgoing row owned by the sender and an incoming
+# row owned by the recipient, written together with the same amount; the
+# n-th of each between the same two wallets and amount belong together
+PAIR_TRANSFERS = f"""
+CREATE TEMPORARY TABLE transfer_pairs AS
+WITH legs AS (
+    SELECT t.id, t.created_at, t.transaction_type, t.sender_wallet_id, t.recipient_wallet_id, t.amount,
+           t.wallet_id = t.sender_wallet_id AS outgoing,
+           row_number() OVER (
+               PARTITION BY t.sender_wallet_id, t.recipient_wallet_id, t.amount, t.wallet_id = t.sender_wallet_id
+               ORDER BY t.created_at, t.id
+           ) AS n
+    FROM transactions t
+    WHERE t.transaction_type = 'TRANSFER'
+      AND t.wallet_id IN (t.sender_wallet_id, t.recipient_wallet_id)
+      AND {UNPOSTED}
+)
+SELECT o.id AS out_id, o.created_at, o.transaction_type, o.sender_wallet_id, o.recipient_wallet_id,
+       o.amount, i.id AS in_id
+FROM legs o
+JOIN legs i ON i.sender_wallet_id = o.sender_wallet_id AND i.recipient_wallet_id = o.recipient_wallet_id
+           AND i.amount = o.amount AND i.n = o.n AND NOT i.outgoing
+WHERE o.outgoing
+"""
+
+POST_PAIRS = """
+INSERT INTO postings (wallet_id, created_at, transaction_id, amount, transaction_type)
+SELECT sender_wallet_id, created_at, out_id, -amount, transaction_type FROM transfer_pairs
+UNION ALL
+SELECT recipient_wallet_id, created_at, out_id, amount, transaction_type FROM transfer_pairs
+"""
+
+SENDER_NUMBER = "(SELECT wallet_number FROM wallets WHERE id = transactions.sender_wallet_id)"
+RECIPIENT_NUMBER = "(SELECT wallet_number FROM wallets WHERE id = transactions.recipient_wallet_id)"
+ENTRY_DATA = {
+    "postgresql": (
+        f"jsonb_build_object('sender_wallet', {SENDER_NUMBER}, 'recipient_wallet', {RECIPIENT_NUMBER}) "
+        "|| jsonb_strip_nulls(jsonb_build_object('scheduled_transfer_id', transaction_data -> 'scheduled_transfer_id'))"
+    ),
+    "sqlite": (
+        "CASE WHEN json_extract(transaction_data, '$.scheduled_transfer_id') IS NULL "
+        f"THEN json_object('sender_wallet', {SENDER_NUMBER}, 'recipient_wallet', {RECIPIENT_NUMBER}) "
+        f"ELSE json_object('sender_wallet', {SENDER_NUMBER}, 'recipient_wallet', {RECIPIENT_NUMBER}, "
+        "'scheduled_transfer_id', json_extract(transaction_data, '$.scheduled_transfer_id')) END"
+    ),
+}
+
+# The sender's row becomes the entry; its default description is derived by history now
+REWRITE_PAIRED_ENTRIES = """
+UPDATE transactions
+SET transaction_data = {data},
+    description = CASE WHEN description = 'Transfer to ' || {recipient} THEN NULL ELSE description END
+WHERE id IN (SELECT out_id FROM transfer_pairs)
+"""
+
+# Everything else (deposits, withdrawals, cross-shard and unpaired transfer
+# rows) keeps its row and gets the one posting its owner's balance saw
+POST_SINGLE_ROWS = f"""
+INSERT INTO postings (wallet_id, created_at, transaction_id, amount, transaction_type)
+SELECT t.wallet_id, t.created_at, t.id,
+       CASE WHEN t.transaction_type = 'WITHDRAWAL'
+                 OR (t.transaction_type = 'TRANSFER' AND t.sender_wallet_id = t.wallet_id)
+            THEN -t.amount ELSE t.amount END,
+       t.transaction_type
+FROM transactions t
+WHERE {UNPOSTED}
+"""
+
+
+def move_history_to_postings(conn: Connection) -> bool:
+    """Transfer row pairs -> one journal entry with a debit and a credit posting (run in a quiet window)"""
+    inspector = inspect(conn)
+    if not inspector.has_table("transactions"):
+        return False
+
+    obsolete = set(OBSOLETE_TRANSACTION_INDEXES) & {index["name"] for index in inspector.get_indexes("transactions")}
+    Posting.__table__.create(conn, checkfirst=True)
+    if conn.dialect.name == "postgresql":
+        oldest = conn.execute(text("SELECT min(created_at) FROM transactions")).scalar()
+        for month in partition_months(start=month_start(oldest) if oldest else None):
+            create_partition(conn, month, "postings")
+
+    if not conn.execute(text(f"SELECT 1 FROM transactions t WHERE {UNPOSTED} LIMIT 1")).first():
+        applied = False
+    else:
+        conn.execute(text(PAIR_TRANSFERS))
+        pairs = conn.execute(text("SELECT count(*) FROM transfer_pairs")).scalar()
+        conn.execute(text(POST_PAIRS))
+        conn.execute(text(REWRITE_PAIRED_ENTRIES.format(data=ENTRY_DATA[conn.dialect.name], recipient=RECIPIENT_NUMBER)))
+        conn.execute(text("DELETE FROM transactions WHERE id IN (SELECT in_id FROM transfer_pairs)"))
+        conn.execute(text("DROP TABLE transfer_pairs"))
+        singles = conn.execute(text(POST_SINGLE_ROWS)).rowcount
+        logger.info(f"Folded {pairs} transfer pairs into entries, posted {singles} other rows")
+        applied = True
+
+    for name in sorted(obsolete):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    return applied or bool(obsolete)
+
+
+def add_wallet_version(conn: Connection) -> bool:
+    """wallets.version and wallet_stripes.version, for ETags on wallet reads"""
+    applied = False
+    for table in ("wallets", "wallet_stripes"):
+        columns = _columns(conn, table)
+        if columns and "version" not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version BIGINT NOT NULL DEFAULT 0"))
+            applied = True
+    return applied
+
+
+# Legacy databases may hold a reference twice (the old constraint included
+# created_at); the oldest entry keeps it
+BACKFILL_REFERENCES = """
+INSERT INTO transaction_references (reference, transaction_id, created_at)
+SELECT t.reference, t.id, t.created_at FROM transactions t
+WHERE NOT EXISTS (SELECT 1 FROM transaction_references r WHERE r.reference = t.reference)
+ORDER BY t.created_at
+ON CONFLICT (reference) DO NOTHING
+"""
+
+
+def add_transaction_references(conn: Connection) -> bool:
+    """transaction_references, which keeps references unique across partitions, replacing uq_transactions_reference"""
+    if not inspect(conn).has_table("transactions"):
+        return False
+
+    TransactionReference.__table__.create(conn, checkfirst=True)
+    backfilled = conn.execute(text(BACKFILL_REFERENCES)).rowcount
+    if backfilled:
+        logger.info(f"Backfilled {backfilled} transaction references")
+    applied = backfilled > 0
+    # SQLite can't drop a constraint; it is only redundant there
+    if conn.dialect.name == "postgresql" and conn.execute(text(
+        "SELECT 1 FROM pg_constraint WHERE conname = 'uq_transactions_reference'"
+    )).first():
+        conn.execute(text("ALTER TABLE transactions DROP CONSTRAINT uq_transactions_reference"))
+        applied = True
+    return applied
+
+
+MIGRATIONS = [
+    migrate_permission_mask,
+    add_revoked_at,
+    add_maintenance_indexes,
+    partition_transactions,
+    convert_transaction_data_to_jsonb,
+    add_history_filter_indexes,
+    move_history_to_postings,
+    add_wallet_version,
+    add_transaction_references,
+]
+
+
+def migrate():
+    for step in MIGRATIONS:
+        with engine.begin() as conn:
+            if step(conn):
+                logger.info(f"Applied {step.__name__}")
+            else:
+                logger.info(f"Skipped {step.__name__} (already applied)")
+
+
+if __name__ == "__main__":
+    migrate()
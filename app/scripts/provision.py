@@ -0,0 +1,64 @@
+"""
+Bulk-provision users and wallets from a partner export.
+
+Usage:
+    python -m app.scripts.provision customers.csv
+    python -m app.scripts.provision customers.ndjson --batch-size 20000 --workers 8 --rejects rejects.ndjson
+    python -m app.scripts.provision customers.csv --resume       # continue after a failure
+
+CSV needs a header row; NDJSON is one JSON object per line. Fields:
+email (required), name, google_id, opening_balance. Progress is logged
+after every batch and checkpointed to <input>.checkpoint.json (or
+--checkpoint); --resume skips the batches recorded there. Users that
+already exist (by email) are left as they are.
+"""
+import argparse
+import json
+import logging
+import sys
+from app.config import settings
+from app.services.provisioning import provision, count_records, detect_format, FORMATS, ProvisioningError
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def log_progress(progress: dict):
+    total = f"/{progress['total']}" if progress["total"] else ""
+    eta = f", ETA {progress['eta_seconds']}s" if progress["eta_seconds"] is not None else ""
+    logger.info(
+        f"{progress['rows_done']}{total} rows ({progress['rows_per_sec']} rows/s{eta}): "
+        f"{progress['users_created']} users, {progress['wallets_created']} wallets, "
+        f"{progress['existing_users']} existing, {progress['rejected']} rejected"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk user and wallet provisioning")
+    parser.add_argument("path", help="CSV or NDJSON input file")
+    parser.add_argument("--format", choices=FORMATS, help="Input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=settings.PROVISIONING_BATCH_SIZE, help="Records per COPY batch")
+    parser.add_argument("--workers", type=int, default=settings.PROVISIONING_WORKERS, help="Batches loaded concurrently")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint")
+    parser.add_argument("--rejects", help="Append rejected records (record number, reason) to this NDJSON file")
+    parser.add_argument("--no-count", action="store_true", help="Skip the initial pass that counts records for the ETA")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    total = None if args.no_count else count_records(args.path, fmt)
+
+    try:
+        summary = provision(
+            args.path, fmt, args.batch_size, args.workers, checkpoint_path=args.checkpoint, resume=args.resume,
+            total=total, progress=log_progress, rejects_path=args.rejects,
+        )
+    except ProvisioningError as e:
+        logger.error(str(e))
+        sys.exit(2)
+
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
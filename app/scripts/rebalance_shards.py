@@ -0,0 +1,242 @@
+"""
+Move users (wallet and its stripes, scheduled transfers and transaction
+history) between shards.
+
+Usage:
+    python -m app.scripts.rebalance_shards --status
+    python -m app.scripts.rebalance_shards --user-id <uuid> --to-shard 2
+    python -m app.scripts.rebalance_shards --from-shard 0 --to-shard 1 --limit 100
+
+A move marks the user `moving` in the directory, so writes for that wallet
+get a 503. It then waits out the directory cache, copies the rows to the
+target shard, and deletes them from the source. A transfer entry shared
+with a user who stays is split: each shard keeps its own copy of the
+entry with that side's posting, as for a cross-shard transfer. Re-running after a crash
+resumes the move: the copy uses merge and the directory only flips back to
+`active` at the end.
+"""
+import argparse
+import logging
+import time
+import uuid
+from sqlalchemy import func, or_, select
+from app.config import settings
+from app.sharding import shard_router
+from app.models.user import User
+from app.models.wallet import Wallet, WalletStripe
+from app.models.transactions import Posting, Transaction, TransactionReference
+from app.models.shard import UserShard
+from app.models.scheduled_transfer import ScheduledTransfer
+from app.services.partitions import ensure_partitions, month_start
+from app.services.reconciliation import POSTED
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _row_values(obj) -> dict:
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+def _directory_entry(directory, user_id: uuid.UUID) -> UserShard:
+    entry = directory.query(UserShard).filter(UserShard.user_id == user_id).with_for_update().first()
+    if entry:
+        return entry
+
+    # Pre-sharding users live on shard 0 without a directory row
+    wallet = directory.query(Wallet).filter(Wallet.user_id == user_id).first()
+    if not wallet:
+        raise Exception(f"No wallet found for user {user_id}")
+    entry = UserShard(user_id=user_id, wallet_number=wallet.wallet_number, shard=0, state="active")
+    directory.add(entry)
+    directory.flush()
+    return entry
+
+
+def mark_moving(user_ids: list):
+    """Flag users as `moving` up front so one cache wait covers the whole batch"""
+    directory = shard_router.session(0)
+    try:
+        for user_id in user_ids:
+            entry = _directory_entry(directory, user_id)
+            entry.state = "moving"
+            shard_router.forget(user_id, entry.wallet_number)
+        directory.commit()
+    finally:
+        directory.close()
+
+
+def move_user(user_id: uuid.UUID, target: int, wait: bool = True) -> int:
+    """Move one user to `target`; returns the number of postings copied"""
+    directory = shard_router.session(0)
+    try:
+        entry = _directory_entry(directory, user_id)
+        source = entry.shard
+        if source == target and entry.state == "active":
+            directory.commit()
+            return 0
+
+        entry.state = "moving"
+        directory.commit()
+        shard_router.forget(user_id, entry.wallet_number)
+
+        if wait:
+            # Let every worker's directory cache see the `moving` state
+            time.sleep(settings.SHARD_DIRECTORY_CACHE_SECONDS)
+
+        copied = 0
+        if source != target:
+            src = shard_router.session(source)
+            dst = shard_router.session(target)
+            try:
+                wallet = src.query(Wallet).filter(Wallet.user_id == user_id).with_for_update().first()
+                if wallet:
+                    oldest = src.query(func.min(Posting.created_at)).filter(Posting.wallet_id == wallet.id).scalar()
+                    if oldest:
+                        # The target may have no partitions that far back
+                        ensure_partitions(dst, start=month_start(oldest))
+
+                    user = src.query(User).filter(User.id == user_id).first()
+                    dst.merge(User(**_row_values(user)))
+                    dst.merge(Wallet(**_row_values(wallet)))
+                    # Postings have no relationship to order their inserts after the wallet's
+                    dst.flush()
+                    stripes = src.query(WalletStripe).filter(WalletStripe.wallet_id == wallet.id)
+                    for stripe in stripes.with_for_update():
+                        dst.merge(WalletStripe(**_row_values(stripe)))
+                    schedules = src.query(ScheduledTransfer).filter(ScheduledTransfer.wallet_id == wallet.id)
+                    for schedule in schedules:
+                        dst.merge(ScheduledTransfer(**_row_values(schedule)))
+
+                    owned = src.query(Posting).filter(Posting.wallet_id == wallet.id)
+                    entries = src.query(Posting, Transaction).join(Transaction, POSTED).filter(Posting.wallet_id == wallet.id)
+                    for posting, transaction in entries.yield_per(1000):
+                        values = _row_values(transaction)
+                        # The target's copy of the entry belongs to this wallet; counterparty
+                        # wallets stay behind, their numbers remain in transaction_data
+                        values.update(user_id=user_id, wallet_id=wallet.id)
+                        for column in ("sender_wallet_id", "recipient_wallet_id"):
+                            if values[column] != wallet.id:
+                                values[column] = None
+                        dst.merge(Transaction(**values))
+                        # Both halves of a cross-shard transfer share a reference; the
+                        # target's own half keeps it
+                        if dst.get(TransactionReference, transaction.reference) is None:
+                            dst.add(TransactionReference(
+                                reference=transaction.reference,
+                                transaction_id=transaction.id,
+                                created_at=transaction.created_at,
+                            ))
+                        dst.merge(Posting(**_row_values(posting)))
+                        copied += 1
+                    dst.commit()
+
+                    owned.delete(synchronize_session=False)
+                    # Entries the counterparty still has a posting for stay, handed over to them
+                    remaining = select(Posting.wallet_id).where(POSTED).limit(1).scalar_subquery()
+                    src.query(Transaction).filter(
+                        Transaction.wallet_id == wallet.id,
+                        remaining.isnot(None)
+                    ).update({Transaction.wallet_id: remaining}, synchronize_session=False)
+                    gone = select(Transaction.id).where(Transaction.wallet_id == wallet.id)
+                    src.query(TransactionReference).filter(
+                        TransactionReference.transaction_id.in_(gone)
+                    ).delete(synchronize_session=False)
+                    src.query(Transaction).filter(
+                        Transaction.wallet_id == wallet.id
+                    ).delete(synchronize_session=False)
+                    src.query(Transaction).filter(
+                        Transaction.user_id == user_id
+                    ).update({
+                        Transaction.user_id: select(Wallet.user_id).where(Wallet.id == Transaction.wallet_id).scalar_subquery()
+                    }, synchronize_session=False)
+                    src.query(Transaction).filter(
+                        Transaction.sender_wallet_id == wallet.id
+                    ).update({Transaction.sender_wallet_id: None}, synchronize_session=False)
+                    src.query(Transaction).filter(
+                        Transaction.recipient_wallet_id == wallet.id
+                    ).update({Transaction.recipient_wallet_id: None}, synchronize_session=False)
+                    schedules.delete(synchronize_session=False)
+                    stripes.delete(synchronize_session=False)
+                    src.query(Wallet).filter(Wallet.id == wallet.id).delete(synchronize_session=False)
+                    if source != 0:
+                        # Shard 0 keeps the global users row
+                        src.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+                    src.commit()
+            finally:
+                src.close()
+                dst.close()
+
+        entry.shard = target
+        entry.state = "active"
+        directory.commit()
+        shard_router.forget(user_id, entry.wallet_number)
+        logger.info(f"Moved user {user_id} from shard {source} to shard {target} ({copied} postings)")
+        return copied
+    finally:
+        directory.close()
+
+
+def shard_status() -> dict:
+    counts = {}
+    for shard in range(shard_router.shard_count):
+        db = shard_router.session(shard)
+        try:
+            counts[shard] = {
+                "wallets": db.query(func.count(Wallet.id)).scalar(),
+                "transactions": db.query(func.count(Transaction.id)).scalar(),
+                "postings": db.query(func.count(Posting.transaction_id)).scalar(),
+            }
+        finally:
+            db.close()
+    return counts
+
+
+def users_on_shard(shard: int, limit: int) -> list:
+    directory = shard_router.session(0)
+    try:
+        if shard != 0:
+            rows = directory.query(UserShard.user_id).filter(UserShard.shard == shard).limit(limit)
+            return [row.user_id for row in rows]
+
+        # Shard 0 also holds users without a directory row
+        rows = directory.query(Wallet.user_id).outerjoin(
+            UserShard, UserShard.user_id == Wallet.user_id
+        ).filter(or_(UserShard.user_id.is_(None), UserShard.shard == 0)).limit(limit)
+        return [row.user_id for row in rows]
+    finally:
+        directory.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebalance users between shards")
+    parser.add_argument("--status", action="store_true", help="Show wallet/transaction counts per shard")
+    parser.add_argument("--user-id", action="append", default=[], help="User to move (repeatable)")
+    parser.add_argument("--from-shard", type=int, help="Move users off this shard")
+    parser.add_argument("--to-shard", type=int, help="Destination shard")
+    parser.add_argument("--limit", type=int, default=100, help="Max users to move with --from-shard")
+    parser.add_argument("--no-wait", action="store_true", help="Skip waiting for directory caches (no live traffic)")
+    args = parser.parse_args()
+
+    if args.status:
+        for shard, counts in shard_status().items():
+            print(f"shard {shard}: {counts['wallets']} wallets, {counts['transactions']} transactions, {counts['postings']} postings")
+        return
+
+    if args.to_shard is None or not 0 <= args.to_shard < shard_router.shard_count:
+        parser.error(f"--to-shard must be between 0 and {shard_router.shard_count - 1}")
+
+    user_ids = [uuid.UUID(user_id) for user_id in args.user_id]
+    if args.from_shard is not None:
+        user_ids += users_on_shard(args.from_shard, args.limit)
+
+    start = time.perf_counter()
+    mark_moving(user_ids)
+    if not args.no_wait:
+        time.sleep(settings.SHARD_DIRECTORY_CACHE_SECONDS)
+    copied = sum(move_user(user_id, args.to_shard, wait=False) for user_id in user_ids)
+    logger.info(f"Moved {len(user_ids)} users ({copied} postings) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Prove every wallet balance against its transaction ledger.
+
+Usage:
+    python -m app.scripts.reconcile                                  # SQL aggregation, one process
+    python -m app.scripts.reconcile --workers 8 --report discrepancies.csv
+    python -m app.scripts.reconcile --method numpy --chunk-size 100000 --workers 4
+
+Prints a JSON summary (wallets, transactions, rows/sec, discrepancy count)
+and writes the mismatching wallets to --report as CSV. Exits 1 when any
+wallet is off by more than --tolerance, so it can gate a daily cron.
+"""
+import argparse
+import csv
+import json
+import logging
+import sys
+from app.sharding import shard_router
+from app.services.reconciliation import reconcile, METHODS, REPORT_COLUMNS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile wallet balances against the transaction ledger")
+    parser.add_argument("--method", choices=METHODS, default="sql", help="Aggregation strategy (default: sql)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--partitions", type=int, help="Wallet-id ranges per shard (default: 4 x workers)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per streamed chunk (numpy/python)")
+    parser.add_argument("--tolerance", type=float, default=0.005, help="Allowed absolute difference per wallet")
+    parser.add_argument("--shard", type=int, action="append", help="Only these shards (repeatable, default: all)")
+    parser.add_argument("--report", help="Write discrepancies to this CSV file")
+    args = parser.parse_args()
+
+    shards = args.shard or range(shard_router.shard_count)
+    engines = {shard: shard_router.engines[shard] for shard in shards}
+
+    summary = reconcile(engines, args.method, args.workers, args.partitions, args.chunk_size, args.tolerance)
+    discrepancies = summary.pop("discrepancies")
+
+    if args.report:
+        with open(args.report, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_COLUMNS)
+            writer.writerows(discrepancies)
+        summary["report"] = args.report
+
+    print(json.dumps(summary, indent=2))
+    if discrepancies:
+        logger.error(f"{len(discrepancies)} wallets do not match their ledger")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Run the maintenance jobs outside the API process (cron, k8s CronJob, ...).
+
+Usage:
+    python -m app.scripts.run_maintenance                      # every job once
+    python -m app.scripts.run_maintenance --job fail_stale_deposits
+    python -m app.scripts.run_maintenance --loop               # keep running on the configured interval
+"""
+import argparse
+import asyncio
+import json
+import logging
+from app.services.maintenance import MaintenanceScheduler, DEFAULT_JOBS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WalletFlow maintenance jobs")
+    parser.add_argument("--job", action="append", choices=sorted(DEFAULT_JOBS), help="Job to run (repeatable, default: all)")
+    parser.add_argument("--loop", action="store_true", help="Keep running on MAINTENANCE_INTERVAL_SECONDS")
+    args = parser.parse_args()
+
+    jobs = {name: DEFAULT_JOBS[name] for name in args.job} if args.job else None
+    scheduler = MaintenanceScheduler(jobs=jobs)
+
+    if args.loop:
+        asyncio.run(scheduler.run_forever())
+    else:
+        metrics = asyncio.run(scheduler.run_once())
+        print(json.dumps(metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
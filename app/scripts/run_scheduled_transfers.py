@@ -0,0 +1,36 @@
+"""
+Run due scheduled transfers outside the API process (cron, k8s CronJob, ...).
+Set SCHEDULED_TRANSFERS_ENABLED=false on the API when using this.
+
+Usage:
+    python -m app.scripts.run_scheduled_transfers                 # drain what is due once
+    python -m app.scripts.run_scheduled_transfers --workers 8
+    python -m app.scripts.run_scheduled_transfers --loop          # keep running on the configured interval
+"""
+import argparse
+import asyncio
+import json
+import logging
+from app.config import settings
+from app.services.scheduled_transfers import ScheduledTransferExecutor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WalletFlow scheduled transfer executor")
+    parser.add_argument("--workers", type=int, default=settings.SCHEDULED_TRANSFER_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=settings.SCHEDULED_TRANSFER_BATCH_SIZE)
+    parser.add_argument("--loop", action="store_true", help="Keep running on SCHEDULED_TRANSFER_INTERVAL_SECONDS")
+    args = parser.parse_args()
+
+    executor = ScheduledTransferExecutor(workers=args.workers, batch_size=args.batch_size)
+
+    if args.loop:
+        asyncio.run(executor.run_forever())
+    else:
+        print(json.dumps(executor.run_once(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Production entry point: a pre-forking supervisor around uvicorn.
+
+Usage:
+    python -m app.server                       # workers sized automatically
+    python -m app.server --workers 4 --port 8080
+
+The master imports the app once (preload), creates the schema, binds the
+listening socket and forks the workers, which all accept on it. Workers
+inherit the schema_ready flag and skip init_db() in their lifespan. Workers run
+uvicorn on uvloop with the httptools parser (falling back to asyncio and h11
+when those are not installed), and exit after SERVER_MAX_REQUESTS plus a
+random jitter so the master replaces them one at a time.
+
+Without SERVER_WORKERS the worker count is the number of usable CPUs,
+capped so every worker's connection pools fit in SERVER_DB_CONNECTION_SHARE
+of each Postgres database's max_connections.
+
+SIGTERM or SIGINT stops the workers from accepting and lets in-flight
+requests finish for up to SERVER_GRACEFUL_TIMEOUT_SECONDS; a second signal
+kills them. Worker stats are reported under `server` in GET /admin/metrics.
+
+POSIX only. For development keep using `uvicorn app.main:app --reload`.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import uvicorn
+from sqlalchemy import text
+from app.config import settings
+from app import worker_stats
+
+logger = logging.getLogger("app.server")
+
+# A worker that dies this soon after starting counts towards a crash loop
+MIN_WORKER_LIFETIME_SECONDS = 5.0
+MAX_FAST_FAILURES = 5
+
+
+def usable_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _pool_capacity(db_engine) -> int:
+    """Most connections one worker can open through this engine"""
+    pool = db_engine.pool
+    if not hasattr(pool, "size"):
+        return 1
+    return pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+
+
+def db_worker_limit(engines, share: float = settings.SERVER_DB_CONNECTION_SHARE) -> Optional[int]:
+    """How many workers the Postgres databases have connections for; None if unbounded"""
+    limits = []
+    for db_engine in engines:
+        if db_engine.dialect.name != "postgresql":
+            continue
+        with db_engine.connect() as conn:
+            max_connections = int(conn.execute(text("SHOW max_connections")).scalar())
+            reserved = int(conn.execute(text("SHOW superuser_reserved_connections")).scalar())
+        limits.append(int((max_connections - reserved) * share) // _pool_capacity(db_engine))
+    return min(limits) if limits else None
+
+
+def plan_workers(requested: int, engines) -> int:
+    if requested > 0:
+        return requested
+
+    cpus = usable_cpus()
+    try:
+        db_limit = db_worker_limit(engines)
+    except Exception as e:
+        logger.warning(f"Could not read database connection limits: {str(e)}")
+        db_limit = None
+
+    if db_limit is None:
+        workers = cpus
+    else:
+        if db_limit < 1:
+            logger.warning("Connection pools exceed SERVER_DB_CONNECTION_SHARE of max_connections, starting 1 worker")
+        workers = max(1, min(cpus, db_limit))
+    logger.info(f"Starting {workers} workers ({cpus} CPUs, database room for {db_limit if db_limit is not None else 'any number'})")
+    return workers
+
+
+def _implementation(module: str, fallback: str) -> str:
+    if importlib.util.find_spec(module):
+        return module
+    logger.warning(f"{module} is not installed, falling back to {fallback}")
+    return fallback
+
+
+class Supervisor:
+    """Forks `workers` uvicorn servers on one shared socket and keeps them running"""
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        max_requests: int = settings.SERVER_MAX_REQUESTS,
+        max_requests_jitter: int = settings.SERVER_MAX_REQUESTS_JITTER,
+        graceful_timeout: float = settings.SERVER_GRACEFUL_TIMEOUT_SECONDS
+    ):
+        self.config = config
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.children: Dict[int, Tuple[int, float]] = {}  # pid -> (slot, started)
+        self.stopping = False
+        self.deadline = 0.0
+        self.fast_failures = 0
+        self.exit_code = 0
+        self.socket = None
+
+    def _spawn(self, index: int):
+        # Jitter keeps workers started together from all recycling at once
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests > 0 else 0
+        slot = worker_stats.slots[index]
+        slot.generation += 1
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(slot, limit)
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+
+        slot.pid = pid
+        self.children[pid] = (index, time.monotonic())
+
+    def _run_worker(self, slot: worker_stats.WorkerSlot, limit: int):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        slot.pid = os.getpid()
+        slot.started_at = slot.updated_at = time.time()
+        slot.requests = slot.connections = 0
+        slot.max_requests = limit
+
+        self.config.limit_max_requests = limit or None
+        server = uvicorn.Server(self.config)
+
+        def report():
+            while True:
+                slot.requests = server.server_state.total_requests
+                slot.connections = len(server.server_state.connections)
+                slot.updated_at = time.time()
+                time.sleep(1)
+
+        threading.Thread(target=report, name="worker-stats", daemon=True).start()
+        server.run(sockets=[self.socket])
+
+    def _stop(self, signum, frame):
+        if self.stopping:
+            logger.warning("Second signal, killing workers")
+            self._signal_children(signal.SIGKILL)
+            return
+        logger.info(f"Received {signal.Signals(signum).name}, draining {len(self.children)} workers")
+        self.stopping = True
+        self.deadline = time.monotonic() + self.graceful_timeout + 5
+        self._signal_children(signal.SIGTERM)
+
+    def _signal_children(self, signum: int):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self, pid: int, status: int):
+        index, started = self.children.pop(pid)
+        worker_stats.slots[index].pid = 0
+        if self.stopping:
+            return
+
+        code = os.waitstatus_to_exitcode(status)
+        if code == 0:
+            logger.info(f"Worker {pid} recycled")
+            self.fast_failures = 0
+        else:
+            logger.warning(f"Worker {pid} exited with {code}")
+            if time.monotonic() - started < MIN_WORKER_LIFETIME_SECONDS:
+                self.fast_failures += 1
+                if self.fast_failures >= MAX_FAST_FAILURES:
+                    logger.error("Workers keep failing on startup, shutting down")
+                    self.exit_code = 1
+                    self._stop(signal.SIGTERM, None)
+                    return
+                time.sleep(1)
+        self._spawn(index)
+
+    def run(self) -> int:
+        self.socket = self.config.bind_socket()
+        worker_stats.allocate(self.workers)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for index in range(self.workers):
+            self._spawn(index)
+
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self._reap(pid, status)
+                continue
+            if self.stopping and time.monotonic() > self.deadline:
+                logger.warning(f"{len(self.children)} workers still running after the graceful timeout, killing them")
+                self._signal_children(signal.SIGKILL)
+                self.deadline = float("inf")
+            time.sleep(0.1)
+
+        self.socket.close()
+        logger.info("All workers stopped")
+        return self.exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WalletFlow API server")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS, help="0 sizes from CPUs and DB limits")
+    parser.add_argument("--max-requests", type=int, default=settings.SERVER_MAX_REQUESTS)
+    parser.add_argument("--graceful-timeout", type=float, default=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+
+    # Preload: import once in the master so workers fork with the app ready
+    from app.main import app, init_db
+    from app.database import replica_engines
+    from app.sharding import shard_router
+
+    engines = [*shard_router.engines, *replica_engines]
+    init_db()
+    workers = plan_workers(args.workers, engines)
+    # Workers must not inherit the master's DB connections
+    for db_engine in engines:
+        db_engine.dispose()
+
+    if workers > 1 and settings.EVENT_BROADCAST_BACKEND == "local":
+        logger.warning("EVENT_BROADCAST_BACKEND=local only reaches SSE clients on the worker that handled the event")
+
+    config = uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        loop=_implementation("uvloop", "asyncio"),
+        http=_implementation("httptools", "h11"),
+        lifespan="on",
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        access_log=settings.SERVER_ACCESS_LOG,
+        proxy_headers=True,
+    )
+    supervisor = Supervisor(config, workers, max_requests=args.max_requests, graceful_timeout=args.graceful_timeout)
+    sys.exit(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Write-behind API key usage counters.
+
+Authenticating a request by API key only bumps an in-memory counter for
+(key, UTC day, endpoint). Every API_KEY_USAGE_FLUSH_SECONDS each worker
+swaps its counters out and upserts them into api_key_usage in bulk,
+API_KEY_USAGE_FLUSH_BATCH rows per statement, adding to the stored
+counts. A request never writes to the database itself.
+
+- Bounded: a worker holds at most API_KEY_USAGE_MAX_PENDING counters.
+  Requests for a new counter beyond that are counted as `dropped`, not
+  tracked.
+- Crash-tolerant: a batch that fails to flush is merged back and retried
+  on the next flush. Shutdown flushes once more. A killed worker loses
+  at most one interval of counts, and a lost count never affects a
+  request.
+
+Counters appear under `api_key_usage` in GET /admin/metrics.
+"""
+import asyncio
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.api_key import APIKeyUsage
+import logging
+
+logger = logging.getLogger(__name__)
+
+UsageKey = Tuple[object, date, str]
+
+
+def _upsert(db: Session, rows: List[dict]):
+    if db.get_bind().dialect.name == "postgresql":
+        statement, latest = postgresql.insert(APIKeyUsage).values(rows), func.greatest
+    else:
+        statement, latest = sqlite.insert(APIKeyUsage).values(rows), func.max
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[APIKeyUsage.api_key_id, APIKeyUsage.day, APIKeyUsage.endpoint],
+        set_={
+            "request_count": APIKeyUsage.request_count + statement.excluded.request_count,
+            "last_used_at": latest(APIKeyUsage.last_used_at, statement.excluded.last_used_at),
+        }
+    ))
+
+
+class UsageTracker:
+    def __init__(
+        self,
+        interval_seconds: float = settings.API_KEY_USAGE_FLUSH_SECONDS,
+        batch_size: int = settings.API_KEY_USAGE_FLUSH_BATCH,
+        max_pending: int = settings.API_KEY_USAGE_MAX_PENDING
+    ):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        # (key, day, endpoint) -> [count, last_used_at]
+        self._pending: Dict[UsageKey, list] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            "recorded": 0, "dropped": 0, "flushes": 0, "flushed_rows": 0,
+            "failed_flushes": 0, "last_flush_ms": 0.0, "last_error": None,
+        }
+
+    def record(self, api_key_id, endpoint: str):
+        now = datetime.now(timezone.utc)
+        key = (api_key_id, now.date(), endpoint)
+        with self._lock:
+            counter = self._pending.get(key)
+            if counter is None:
+                if len(self._pending) >= self.max_pending:
+                    self.metrics["dropped"] += 1
+                    return
+                self._pending[key] = [1, now]
+            else:
+                counter[0] += 1
+                counter[1] = now
+            self.metrics["recorded"] += 1
+
+    def _restore(self, batch: Dict[UsageKey, list]):
+        """Merge an unflushed batch back, within max_pending"""
+        with self._lock:
+            for key, (count, last_used_at) in batch.items():
+                counter = self._pending.get(key)
+                if counter is not None:
+                    counter[0] += count
+                    counter[1] = max(counter[1], last_used_at)
+                elif len(self._pending) < self.max_pending:
+                    self._pending[key] = [count, last_used_at]
+                else:
+                    self.metrics["dropped"] += count
+
+    def flush(self) -> int:
+        """Upsert every pending counter; returns the rows written"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        items = list(batch.items())
+        written = 0
+        db = SessionLocal()
+        try:
+            for offset in range(0, len(items), self.batch_size):
+                chunk = items[offset:offset + self.batch_size]
+                _upsert(db, [
+                    {"api_key_id": api_key_id, "day": day, "endpoint": endpoint,
+                     "request_count": count, "last_used_at": last_used_at}
+                    for (api_key_id, day, endpoint), (count, last_used_at) in chunk
+                ])
+                db.commit()
+                written += len(chunk)
+        except Exception as e:
+            db.rollback()
+            self._restore(dict(items[written:]))
+            self.metrics["failed_flushes"] += 1
+            self.metrics["last_error"] = str(e)
+            logger.error(f"API key usage flush failed, {len(items) - written} counters kept for retry: {str(e)}")
+        else:
+            self.metrics["last_error"] = None
+        finally:
+            db.close()
+
+        self.metrics["flushes"] += 1
+        self.metrics["flushed_rows"] += written
+        self.metrics["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return written
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await asyncio.to_thread(self.flush)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever())
+            logger.info(f"API key usage flusher started (every {self.interval_seconds}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+        logger.info("API key usage flusher stopped")
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), **self.metrics}
+
+
+usage_tracker = UsageTracker()
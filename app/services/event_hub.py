@@ -0,0 +1,250 @@
+import asyncio
+import json
+import queue
+import select
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import text
+from app.config import settings
+from app.database import engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "walletflow_events"
+NOTIFY_QUEUE_SIZE = 10_000
+
+
+class Subscription:
+    """Bounded per-client queue; when full the oldest event is dropped"""
+
+    def __init__(self, hub: "EventHub", topics: Set[str], queue_size: int):
+        self.hub = hub
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.hub.metrics["dropped"] += 1
+        self.queue.put_nowait(event)
+        self.hub.metrics["delivered"] += 1
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+
+class LocalBackend:
+    """Single-process broadcast: publish goes straight to this worker's subscribers"""
+
+    def __init__(self):
+        self.hub: Optional["EventHub"] = None
+
+    def start(self, hub: "EventHub"):
+        self.hub = hub
+
+    def stop(self):
+        pass
+
+    def publish(self, topic: str, event: dict):
+        self.hub.dispatch(topic, event)
+
+
+class PostgresNotifyBackend:
+    """
+    Cross-worker broadcast over Postgres LISTEN/NOTIFY. Every worker listens
+    on one dedicated connection and re-dispatches to its local subscribers.
+
+    publish only queues the notification, so it never touches the database
+    on the event loop. A notifier thread sends whatever has queued up in
+    one statement; when the queue is full, publish fails and the event is
+    not pushed.
+    """
+
+    def __init__(self, channel: str = NOTIFY_CHANNEL, queue_size: int = NOTIFY_QUEUE_SIZE):
+        self.channel = channel
+        self.hub: Optional["EventHub"] = None
+        self._outbox: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self, hub: "EventHub"):
+        self.hub = hub
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._listen, name="event-hub-listener", daemon=True),
+            threading.Thread(target=self._notify, name="event-hub-notifier", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def publish(self, topic: str, event: dict):
+        self._outbox.put_nowait(json.dumps({"topic": topic, "event": event}, default=str))
+
+    def _notify(self):
+        # Sends what is left in the queue before stopping
+        while not (self._stop.is_set() and self._outbox.empty()):
+            try:
+                payloads = [self._outbox.get(timeout=1.0)]
+            except queue.Empty:
+                continue
+            while True:
+                try:
+                    payloads.append(self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+                        {"channel": self.channel, "payloads": payloads}
+                    )
+            except Exception as e:
+                logger.error(f"Event hub failed to send {len(payloads)} notifications: {str(e)}")
+
+    def _listen(self):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.autocommit = True
+                dbapi_connection.cursor().execute(f"LISTEN {self.channel}")
+                logger.info(f"Event hub listening on {self.channel}")
+
+                while not self._stop.is_set():
+                    if select.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notify = dbapi_connection.notifies.pop(0)
+                        message = json.loads(notify.payload)
+                        self.hub.dispatch_threadsafe(message["topic"], message["event"])
+            except Exception as e:
+                logger.error(f"Event hub listener error: {str(e)}")
+                self._stop.wait(2)
+            finally:
+                if connection is not None:
+                    connection.invalidate()
+
+
+class EventHub:
+    """
+    In-process pub/sub for push endpoints. Topics are plain strings such as
+    `reference:<ref>` or `user:<id>`.
+    """
+
+    def __init__(self, backend=None, queue_size: int = settings.SSE_QUEUE_SIZE, max_subscribers: int = settings.SSE_MAX_SUBSCRIBERS):
+        self.backend = backend or LocalBackend()
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._topics: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._subscribers = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.metrics = {"published": 0, "delivered": 0, "dropped": 0, "rejected": 0}
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.backend.start(self)
+
+    def stop(self):
+        self.backend.stop()
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    def subscribe(self, topics: Iterable[str]) -> Optional[Subscription]:
+        if self._subscribers >= self.max_subscribers:
+            self.metrics["rejected"] += 1
+            return None
+
+        subscription = Subscription(self, set(topics), self.queue_size)
+        for topic in subscription.topics:
+            self._topics[topic].add(subscription)
+        self._subscribers += 1
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription):
+        removed = False
+        for topic in subscription.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                removed = True
+                if not subscribers:
+                    del self._topics[topic]
+        if removed:
+            self._subscribers -= 1
+
+    def dispatch(self, topic: str, event: dict):
+        for subscription in list(self._topics.get(topic, ())):
+            subscription.offer(event)
+
+    def dispatch_threadsafe(self, topic: str, event: dict):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.dispatch, topic, event)
+
+    def publish(self, topic: str, event: dict):
+        """Fan an event out to every worker; callable from the loop or a thread"""
+        self.metrics["published"] += 1
+        try:
+            if isinstance(self.backend, LocalBackend):
+                try:
+                    asyncio.get_running_loop()
+                    self.backend.publish(topic, event)
+                except RuntimeError:
+                    self.dispatch_threadsafe(topic, event)
+            else:
+                self.backend.publish(topic, event)
+        except Exception as e:
+            # Push is best effort; clients can always fall back to polling
+            logger.error(f"Failed to publish event on {topic}: {str(e)}")
+
+
+FINAL_STATUSES = ("success", "failed")
+
+
+def transaction_event(transaction) -> dict:
+    return {
+        "reference": transaction.reference,
+        "type": transaction.transaction_type.value,
+        "status": transaction.status.value,
+        "amount": transaction.amount,
+    }
+
+
+def publish_transaction(event: dict, user_ids: Iterable):
+    """
+    Push a committed transaction's event to its reference stream and each
+    party's. Build the event with transaction_event before committing, so
+    the expired transaction isn't reloaded.
+    """
+    event_hub.publish(f"reference:{event['reference']}", event)
+    for user_id in user_ids:
+        event_hub.publish(f"user:{user_id}", event)
+
+
+def format_sse(event: dict, name: str = "transaction") -> str:
+    return f"event: {name}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def _build_backend():
+    if settings.EVENT_BROADCAST_BACKEND == "postgres":
+        return PostgresNotifyBackend()
+    return LocalBackend()
+
+
+event_hub = EventHub(backend=_build_backend())
@@ -0,0 +1,159 @@
+"""
+In-process cache of identities that never change once created:
+
+  wallet_number -> (wallet_id, user_id)
+  user_id       -> email
+
+Both maps are bounded LRUs, one per worker, so a repeat payee or depositor
+costs no DB round-trip. Wallet ids survive shard moves (rebalancing copies
+rows with their ids), so entries are never invalidated.
+
+Unknown wallet numbers are remembered for IDENTITY_CACHE_NEGATIVE_SECONDS,
+so a burst of guessed numbers hits the database once per number. A wallet
+created with a number another worker has just cached as unknown is found
+once that entry expires.
+
+With IDENTITY_CACHE_PREWARM_WALLETS set, each worker loads the wallets that
+received the most transfers over the last IDENTITY_CACHE_PREWARM_DAYS at
+startup, so merchants are resolved from memory from the first request.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.models.transactions import Posting, TransactionType
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WalletIdentity(NamedTuple):
+    wallet_id: uuid.UUID
+    user_id: uuid.UUID
+
+
+class LRUCache:
+    """Thread-safe bounded mapping; the least recently read entry is evicted first"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class IdentityCache:
+    def __init__(
+        self,
+        max_entries: int = settings.IDENTITY_CACHE_SIZE,
+        negative_seconds: float = settings.IDENTITY_CACHE_NEGATIVE_SECONDS
+    ):
+        self.negative_seconds = negative_seconds
+        self._wallets = LRUCache(max_entries)
+        self._emails = LRUCache(max_entries)
+        self.metrics = {"hits": 0, "misses": 0, "negative_hits": 0, "prewarmed": 0}
+
+    def wallet(self, db: Session, wallet_number: str) -> Optional[WalletIdentity]:
+        """(wallet_id, user_id) of a wallet on `db`'s shard, or None when it has no such wallet"""
+        cached = self._wallets.get(wallet_number)
+        if isinstance(cached, WalletIdentity):
+            self.metrics["hits"] += 1
+            return cached
+        # Unknown numbers are cached as the time they stop being trusted
+        if cached is not None and cached > time.monotonic():
+            self.metrics["negative_hits"] += 1
+            return None
+
+        self.metrics["misses"] += 1
+        row = db.execute(
+            select(Wallet.id, Wallet.user_id).where(Wallet.wallet_number == wallet_number)
+        ).first()
+        if row is None:
+            self._wallets.put(wallet_number, time.monotonic() + self.negative_seconds)
+            return None
+
+        identity = WalletIdentity(row.id, row.user_id)
+        self._wallets.put(wallet_number, identity)
+        return identity
+
+    def email(self, db: Session, user_id) -> Optional[str]:
+        user_id = user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
+        email = self._emails.get(user_id)
+        if email is not None:
+            self.metrics["hits"] += 1
+            return email
+
+        self.metrics["misses"] += 1
+        email = db.execute(select(User.email).where(User.id == user_id)).scalar()
+        if email is not None:
+            self._emails.put(user_id, email)
+        return email
+
+    def forget_wallet(self, wallet_number: str):
+        self._wallets.pop(wallet_number)
+
+    def prewarm(self, db: Session, limit: int = settings.IDENTITY_CACHE_PREWARM_WALLETS,
+                days: int = settings.IDENTITY_CACHE_PREWARM_DAYS) -> int:
+        """Load the wallets on `db`'s shard that received the most transfers lately"""
+        if limit <= 0:
+            return 0
+
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        hot = select(Posting.wallet_id, func.count().label("received")).where(
+            Posting.created_at >= since,
+            Posting.transaction_type == TransactionType.TRANSFER,
+            Posting.amount > 0
+        ).group_by(Posting.wallet_id).order_by(func.count().desc()).limit(limit).subquery()
+
+        rows = db.execute(
+            select(Wallet.wallet_number, Wallet.id, Wallet.user_id).join(hot, hot.c.wallet_id == Wallet.id)
+        ).all()
+        for row in rows:
+            self._wallets.put(row.wallet_number, WalletIdentity(row.id, row.user_id))
+        self.metrics["prewarmed"] += len(rows)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "wallets": len(self._wallets),
+            "emails": len(self._emails),
+            "evictions": self._wallets.evictions + self._emails.evictions,
+            **self.metrics,
+        }
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,76 @@
+"""
+Double-entry journal writes.
+
+Each economic event is one `transactions` row (the entry) plus one Posting
+per wallet whose balance it moves, signed (credits positive). A transfer
+is a single entry with a debit and a credit posting instead of two full
+rows. Its header carries both wallet numbers once, in transaction_data:
+
+  {"sender_wallet": "...", "recipient_wallet": "..."}
+
+and history derives "Transfer to/from <number>" from them per side.
+Every entry also gets a transaction_references row, which keeps its
+reference unique across partitions. Callers still update the wallet
+balances themselves, under their locks.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, List, Tuple
+from sqlalchemy.orm import Session
+from app.models.transactions import Posting, Transaction, TransactionReference
+from app.services.ledger_events import record_transaction_event
+
+
+def transfer_data(sender_wallet_number: str, recipient_wallet_number: str, **extra) -> dict:
+    return {"sender_wallet": sender_wallet_number, "recipient_wallet": recipient_wallet_number, **extra}
+
+
+def add_entry(db: Session, transaction: Transaction, postings: Iterable[Tuple[uuid.UUID, uuid.UUID, float]]) -> Transaction:
+    """
+    Add `transaction` with a posting for each (wallet_id, user_id, amount),
+    and a ledger event per posting. Nothing is committed; the flush fails
+    with an IntegrityError if the reference is taken.
+    """
+    if transaction.id is None:
+        transaction.id = uuid.uuid4()
+    if transaction.created_at is None:
+        transaction.created_at = datetime.now(timezone.utc)
+
+    db.add(transaction)
+    db.add(TransactionReference(
+        reference=transaction.reference,
+        transaction_id=transaction.id,
+        created_at=transaction.created_at,
+    ))
+    for wallet_id, user_id, amount in postings:
+        db.add(Posting(
+            wallet_id=wallet_id,
+            created_at=transaction.created_at,
+            transaction_id=transaction.id,
+            amount=amount,
+            transaction_type=transaction.transaction_type,
+        ))
+        record_transaction_event(db, transaction, user_id=user_id, wallet_id=wallet_id)
+    return transaction
+
+
+def posting_rows(entry: dict, postings: Iterable[Tuple[uuid.UUID, float]]) -> List[dict]:
+    """Posting dicts for a bulk-inserted entry dict, from (wallet_id, amount) pairs"""
+    return [
+        {
+            "wallet_id": wallet_id,
+            "created_at": entry["created_at"],
+            "transaction_id": entry["id"],
+            "amount": amount,
+            "transaction_type": entry["transaction_type"],
+        }
+        for wallet_id, amount in postings
+    ]
+
+
+def reference_rows(entries: Iterable[dict]) -> List[dict]:
+    """transaction_references dicts for bulk-inserted entry dicts"""
+    return [
+        {"reference": entry["reference"], "transaction_id": entry["id"], "created_at": entry["created_at"]}
+        for entry in entries
+    ]
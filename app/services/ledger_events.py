@@ -0,0 +1,121 @@
+import uuid
+from typing import List, Optional, Tuple
+from sqlalchemy import insert, select, literal, literal_column, tuple_
+from sqlalchemy.orm import Session
+from app.models.ledger_event import LedgerEvent, current_txid
+from app.models.transactions import Transaction, TransactionStatus
+
+CREATED = "transaction.created"
+STATUS_CHANGED = "transaction.status_changed"
+
+FEED_COLUMNS = [
+    "id", "event_type", "reference", "transaction_id", "user_id", "wallet_id",
+    "transaction_type", "status", "amount", "created_at",
+]
+
+
+def record_transaction_event(db: Session, transaction: Transaction, event_type: str = CREATED, user_id=None, wallet_id=None):
+    """
+    Add the outbox row for `transaction` as seen by one of its wallets
+    (default: the entry's own); committed with the caller's transaction
+    """
+    if transaction.id is None:
+        transaction.id = uuid.uuid4()
+
+    db.add(LedgerEvent(
+        event_type=event_type,
+        transaction_id=transaction.id,
+        reference=transaction.reference,
+        user_id=user_id or transaction.user_id,
+        wallet_id=wallet_id or transaction.wallet_id,
+        transaction_type=transaction.transaction_type,
+        status=transaction.status,
+        amount=transaction.amount,
+    ))
+
+
+def record_transaction_events(db: Session, rows: List[dict]):
+    """Bulk variant for transactions inserted from dicts; `rows` need their ids set"""
+    if not rows:
+        return
+
+    db.execute(insert(LedgerEvent), [
+        {
+            "event_type": CREATED,
+            "transaction_id": row["id"],
+            "reference": row["reference"],
+            "user_id": row["user_id"],
+            "wallet_id": row["wallet_id"],
+            "transaction_type": row["transaction_type"],
+            "status": row["status"],
+            "amount": row["amount"],
+        } for row in rows
+    ])
+
+
+def record_status_changes(db: Session, transaction_ids: list, status: TransactionStatus):
+    """Set-based variant for bulk status updates (maintenance jobs)"""
+    if not transaction_ids:
+        return
+
+    rows = select(
+        literal(STATUS_CHANGED),
+        Transaction.id,
+        Transaction.reference,
+        Transaction.user_id,
+        Transaction.wallet_id,
+        Transaction.transaction_type,
+        literal(status, Transaction.__table__.c.status.type),
+        Transaction.amount,
+        current_txid(),
+    ).where(Transaction.id.in_(transaction_ids), Transaction.status == status)
+
+    db.execute(LedgerEvent.__table__.insert().from_select([
+        "event_type", "transaction_id", "reference", "user_id", "wallet_id",
+        "transaction_type", "status", "amount", "txid",
+    ], rows))
+
+
+def encode_cursor(txid: int, event_id: int) -> str:
+    return f"{txid}.{event_id}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    if not cursor:
+        return -1, 0
+    txid, event_id = cursor.split(".")
+    return int(txid), int(event_id)
+
+
+def read_feed(db: Session, after: Optional[str], limit: int) -> Tuple[List[list], Optional[str]]:
+    """
+    Events strictly after `after`, oldest first. On Postgres only rows from
+    transactions older than the current snapshot's xmin are returned, so a
+    slow transaction can never commit "behind" a cursor a consumer already
+    holds.
+    """
+    txid, event_id = decode_cursor(after)
+    table = LedgerEvent.__table__
+
+    query = select(
+        table.c.txid, table.c.id, table.c.event_type, table.c.reference,
+        table.c.transaction_id, table.c.user_id, table.c.wallet_id,
+        table.c.transaction_type, table.c.status, table.c.amount, table.c.created_at,
+    ).where(
+        tuple_(table.c.txid, table.c.id) > tuple_(literal(txid), literal(event_id))
+    ).order_by(table.c.txid, table.c.id).limit(limit)
+
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.where(table.c.txid < literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint"))
+
+    rows = db.execute(query).fetchall()
+
+    events = [
+        [
+            row.id, row.event_type, row.reference, str(row.transaction_id), str(row.user_id),
+            str(row.wallet_id), row.transaction_type.value, row.status.value, row.amount, row.created_at,
+        ]
+        for row in rows
+    ]
+    next_cursor = encode_cursor(rows[-1].txid, rows[-1].id) if rows else after
+    return events, next_cursor
@@ -0,0 +1,235 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.sharding import shard_router, relay_cross_shard_transfers
+from app.services.ledger_events import record_status_changes
+from app.services.partitions import ensure_partitions, archive_partitions
+from app.services.striping import consolidate_wallet_stripes, touch
+from app.models.api_key import APIKey
+from app.models.transactions import Transaction, TransactionStatus, TransactionType
+import logging
+
+logger = logging.getLogger(__name__)
+
+HOT_TABLES = ("api_keys", "transactions", "postings")
+
+
+def deactivate_expired_keys(
+    db: Session,
+    batch_size: int = settings.MAINTENANCE_BATCH_SIZE,
+    max_batches: int = settings.MAINTENANCE_MAX_BATCHES
+) -> int:
+    """Flip is_active off for keys past expires_at, one bounded batch at a time"""
+    total = 0
+    now = datetime.now(timezone.utc)
+
+    for _ in range(max_batches):
+        ids = [row.id for row in db.query(APIKey.id).filter(
+            APIKey.is_active == True,
+            APIKey.expires_at <= now
+        ).limit(batch_size).with_for_update(skip_locked=True)]
+
+        if not ids:
+            break
+
+        db.query(APIKey).filter(
+            APIKey.id.in_(ids),
+            APIKey.is_active == True
+        ).update({APIKey.is_active: False}, synchronize_session=False)
+        db.commit()
+
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    return total
+
+
+def fail_stale_deposits(
+    db: Session,
+    max_age_hours: int = settings.STALE_DEPOSIT_MAX_AGE_HOURS,
+    batch_size: int = settings.MAINTENANCE_BATCH_SIZE,
+    max_batches: int = settings.MAINTENANCE_MAX_BATCHES
+) -> int:
+    """Mark PENDING deposits older than max_age_hours as FAILED"""
+    total = 0
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+
+    for _ in range(max_batches):
+        ids = [row.id for row in db.query(Transaction.id).filter(
+            Transaction.transaction_type == TransactionType.DEPOSIT,
+            Transaction.status == TransactionStatus.PENDING,
+            Transaction.created_at < cutoff
+        ).limit(batch_size).with_for_update(skip_locked=True)]
+
+        if not ids:
+            break
+
+        # Re-check the status so a webhook that landed in between wins
+        db.query(Transaction).filter(
+            Transaction.id.in_(ids),
+            Transaction.status == TransactionStatus.PENDING,
+            Transaction.created_at < cutoff
+        ).update({Transaction.status: TransactionStatus.FAILED}, synchronize_session=False)
+        record_status_changes(db, ids, TransactionStatus.FAILED)
+        touch(db, [row.wallet_id for row in db.query(Transaction.wallet_id).filter(Transaction.id.in_(ids)).distinct()])
+        db.commit()
+
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    return total
+
+
+def vacuum_analyze_hints(
+    db: Session,
+    auto_vacuum: bool = settings.MAINTENANCE_AUTO_VACUUM,
+    dead_ratio_threshold: float = 0.2,
+    stale_stats_ratio: float = 0.1
+) -> int:
+    """
+    Inspect pg_stat_user_tables for the hot tables and log VACUUM/ANALYZE
+    hints. With auto_vacuum enabled the suggested command is run as well.
+    Returns the number of tables that needed attention. No-op off Postgres.
+    """
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return 0
+
+    # A partitioned table has no stats of its own; its partitions do
+    rows = db.execute(text(
+        "SELECT relname, n_live_tup, n_dead_tup, n_mod_since_analyze "
+        "FROM pg_stat_user_tables WHERE relname = ANY(:tables) "
+        "OR relid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = ANY(SELECT to_regclass(t) FROM unnest(CAST(:tables AS text[])) t))"
+    ), {"tables": list(HOT_TABLES)}).fetchall()
+    db.commit()
+
+    commands = []
+    for relname, live, dead, modified in rows:
+        live = max(live, 1)
+        if dead / live > dead_ratio_threshold:
+            commands.append(f"VACUUM (ANALYZE) {relname}")
+            logger.warning(f"{relname}: {dead} dead tuples vs {live} live, VACUUM recommended")
+        elif modified / live > stale_stats_ratio:
+            commands.append(f"ANALYZE {relname}")
+            logger.info(f"{relname}: {modified} rows modified since last analyze, ANALYZE recommended")
+
+    if auto_vacuum and commands:
+        # VACUUM cannot run inside a transaction block
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for command in commands:
+                conn.execute(text(command))
+                logger.info(f"Ran {command}")
+
+    return len(commands)
+
+
+DEFAULT_JOBS: Dict[str, Callable[[Session], int]] = {
+    "deactivate_expired_keys": deactivate_expired_keys,
+    "fail_stale_deposits": fail_stale_deposits,
+    "vacuum_analyze_hints": vacuum_analyze_hints,
+    "relay_cross_shard_transfers": relay_cross_shard_transfers,
+    "ensure_transaction_partitions": ensure_partitions,
+    "archive_transaction_partitions": archive_partitions,
+    "consolidate_wallet_stripes": consolidate_wallet_stripes,
+}
+
+# Jobs over wallet/transaction tables run once per shard; the rest on shard 0
+SHARD_JOBS = {
+    "fail_stale_deposits", "vacuum_analyze_hints", "relay_cross_shard_transfers",
+    "ensure_transaction_partitions", "archive_transaction_partitions", "consolidate_wallet_stripes",
+}
+
+
+class MaintenanceScheduler:
+    """
+    Runs the maintenance jobs on a fixed interval inside the app's event loop.
+
+    Jobs are synchronous SQLAlchemy code, so each one runs in a worker thread
+    with its own session per shard. Per-job throughput is kept in `metrics`.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: int = settings.MAINTENANCE_INTERVAL_SECONDS,
+        jobs: Optional[Dict[str, Callable[[Session], int]]] = None
+    ):
+        self.interval_seconds = interval_seconds
+        self.jobs = dict(jobs or DEFAULT_JOBS)
+        self.metrics: Dict[str, dict] = {
+            name: {
+                "runs": 0,
+                "rows_total": 0,
+                "last_rows": 0,
+                "last_duration_ms": 0.0,
+                "last_rows_per_sec": 0.0,
+                "last_run_at": None,
+                "last_error": None,
+            } for name in self.jobs
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    def run_job(self, name: str) -> dict:
+        job = self.jobs[name]
+        metrics = self.metrics[name]
+        shards = range(shard_router.shard_count) if name in SHARD_JOBS else [0]
+        start = time.perf_counter()
+        rows = 0
+        metrics["last_error"] = None
+        for shard in shards:
+            db = shard_router.session(shard)
+            try:
+                rows += job(db)
+            except Exception as e:
+                db.rollback()
+                metrics["last_error"] = str(e)
+                logger.error(f"Maintenance job {name} failed on shard {shard}: {str(e)}")
+            finally:
+                db.close()
+
+        duration = time.perf_counter() - start
+        metrics["runs"] += 1
+        metrics["rows_total"] += rows
+        metrics["last_rows"] = rows
+        metrics["last_duration_ms"] = round(duration * 1000, 2)
+        metrics["last_rows_per_sec"] = round(rows / duration, 1) if duration > 0 else 0.0
+        metrics["last_run_at"] = datetime.now(timezone.utc).isoformat()
+
+        if rows:
+            logger.info(f"Maintenance job {name}: {rows} rows in "
+                        f"{metrics['last_duration_ms']}ms ({metrics['last_rows_per_sec']} rows/s)")
+        return metrics
+
+    async def run_once(self) -> Dict[str, dict]:
+        for name in self.jobs:
+            await asyncio.to_thread(self.run_job, name)
+        return self.metrics
+
+    async def run_forever(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever())
+            logger.info(f"Maintenance scheduler started (every {self.interval_seconds}s)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Maintenance scheduler stopped")
+
+
+maintenance_scheduler = MaintenanceScheduler()
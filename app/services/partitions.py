@@ -0,0 +1,213 @@
+"""
+Monthly range partitions of `transactions` and `postings` (Postgres only).
+Both tables always have the same months.
+
+  transactions                 PARTITION BY RANGE (created_at)
+    transactions_y2026m10      [2026-10-01, 2026-11-01) UTC
+    transactions_y2026m11      ...
+  postings
+    postings_y2026m10          ...
+
+There is deliberately no DEFAULT partition. With one, Postgres can no longer
+read partitions in created_at order, so an unfiltered "newest first" page
+would probe every month instead of stopping at the newest that fills it.
+Instead, ensure_partitions keeps TRANSACTION_PARTITIONS_AHEAD months ready
+beyond the current one; it runs at startup and as a maintenance job, and
+before anything copies in rows with older timestamps.
+
+archive_partitions takes months older than TRANSACTION_RETENTION_MONTHS out
+of both tables:
+
+  detach  - the partitions become plain tables in the `archive` schema
+  export  - the partitions are written to <TRANSACTION_ARCHIVE_DIR>/<name>.csv.gz
+            with COPY, then dropped
+
+Either way the month's per-wallet successful totals are first folded into
+transaction_archive_totals, which reconciliation adds back.
+"""
+import gzip
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.orm import Query, Session
+from app.config import settings
+from app.models.transactions import Posting, Transaction, TransactionArchiveTotal, TransactionStatus
+from app.services.reconciliation import POSTED
+import logging
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MODES = ("detach", "export")
+ARCHIVE_SCHEMA = "archive"
+PARTITIONED_TABLES = ("transactions", "postings")
+PARTITION_NAME = re.compile(r"^[a-z_]+_y(\d{4})m(\d{2})$")
+
+
+def month_start(value: datetime) -> date:
+    value = value.astimezone(timezone.utc) if value.tzinfo else value
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date, table: str = "transactions") -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def _bounds(month: date) -> tuple:
+    return (
+        datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+        datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=timezone.utc),
+    )
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('transactions')"
+    )).scalar() == "p"
+
+
+def list_partitions(db: Session, table: str = "transactions") -> List[date]:
+    """Months that have a partition of `table` attached, oldest first"""
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass)"
+    ), {"table": table}).scalars()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def create_partition(db: Session, month: date, table: str = "transactions") -> None:
+    name = partition_name(month, table)
+    lo, hi = _bounds(month)
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+    ))
+
+
+def partition_months(ahead: int = settings.TRANSACTION_PARTITIONS_AHEAD, start: Optional[date] = None) -> List[date]:
+    """Months from `start` (default: this month) through `ahead` months after this one"""
+    current = month_start(datetime.now(timezone.utc))
+    month = min(start, current) if start else current
+    months = []
+    while month <= add_months(current, ahead):
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def ensure_partitions(db: Session, ahead: int = settings.TRANSACTION_PARTITIONS_AHEAD, start: Optional[date] = None) -> int:
+    """Create the missing partitions among partition_months(ahead, start)"""
+    if not is_partitioned(db):
+        return 0
+
+    created = 0
+    for table in PARTITIONED_TABLES:
+        existing = set(list_partitions(db, table))
+        for month in partition_months(ahead, start):
+            if month not in existing:
+                create_partition(db, month, table)
+                db.commit()
+                logger.info(f"Created partition {partition_name(month, table)}")
+                created += 1
+    return created
+
+
+def _fold_totals(db: Session, month: date) -> int:
+    lo, hi = _bounds(month)
+    totals = select(
+        literal(partition_name(month), TransactionArchiveTotal.partition.type),
+        Posting.wallet_id, func.sum(Posting.amount), func.count()
+    ).join(Transaction, POSTED).where(
+        Transaction.status == TransactionStatus.SUCCESS, Posting.created_at >= lo, Posting.created_at < hi
+    ).group_by(Posting.wallet_id)
+    insert = TransactionArchiveTotal.__table__.insert().from_select(
+        ["partition", "wallet_id", "amount", "transactions"], totals
+    )
+    return db.execute(insert).rowcount
+
+
+def _export(db: Session, name: str, archive_dir: str) -> str:
+    """COPY the detached partition into a gzip file; returns its path"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial = path + ".partial"
+    cursor = db.connection().connection.cursor()
+    with open(partial, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+    return path
+
+
+def archive_partitions(
+    db: Session,
+    retention_months: int = settings.TRANSACTION_RETENTION_MONTHS,
+    mode: str = settings.TRANSACTION_ARCHIVE_MODE,
+    archive_dir: str = settings.TRANSACTION_ARCHIVE_DIR,
+) -> int:
+    """
+    Take months that ended more than retention_months ago out of
+    `transactions` and `postings`, one DB transaction per month. Returns
+    how many months were archived; retention_months=0 disables the job.
+    """
+    if retention_months <= 0 or not is_partitioned(db):
+        return 0
+    if mode not in ARCHIVE_MODES:
+        raise ValueError(f"Unknown archive mode: {mode}")
+
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), -retention_months)
+    archived = 0
+    for month in list_partitions(db):
+        if month >= cutoff:
+            break
+        name = partition_name(month)
+        try:
+            wallets = _fold_totals(db, month)
+            where = []
+            for table in PARTITIONED_TABLES:
+                partition = partition_name(month, table)
+                db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+                if mode == "detach":
+                    db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+                    db.execute(text(f"ALTER TABLE {partition} SET SCHEMA {ARCHIVE_SCHEMA}"))
+                    where.append(f"{ARCHIVE_SCHEMA}.{partition}")
+                else:
+                    where.append(_export(db, partition, archive_dir))
+                    db.execute(text(f"DROP TABLE {partition}"))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        archived += 1
+        logger.info(f"Archived {name} to {', '.join(where)} ({wallets} wallet totals kept)")
+    return archived
+
+
+def recent_first(query: Query, window: timedelta = timedelta(hours=settings.STALE_DEPOSIT_MAX_AGE_HOURS)):
+    """
+    query.first(), trying only the partitions covering the last `window`
+    before the older ones. Lookups by reference carry no created_at, so
+    without this they probe every partition's index. Most of them are for
+    deposits that are still pending, which are never older than
+    STALE_DEPOSIT_MAX_AGE_HOURS.
+    """
+    cutoff = datetime.now(timezone.utc) - window
+    found = query.filter(Transaction.created_at >= cutoff).first()
+    if found is None:
+        found = query.filter(Transaction.created_at < cutoff).first()
+    return found
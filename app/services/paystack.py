@@ -1,20 +1,83 @@
+import asyncio
 import httpx
 import uuid
 import hashlib
 import hmac
+import random
+import time
 from typing import Optional, Any
 from decimal import Decimal
 from app.config import settings
 from sqlalchemy.orm import Session
 from app.models.transactions import Transaction, TransactionStatus
 from app.models.wallet import Wallet
+from app.sharding import shard_router, shard_for_reference
+from app.services.ledger_events import record_transaction_event, STATUS_CHANGED
+from app.services.event_hub import publish_transaction, transaction_event
+from app.services.partitions import recent_first
+from app.services.striping import credit
+from app.services.single_flight import single_flight
 from fastapi import HTTPException
-import json
 import logging
 
 
 logger = logging.getLogger(__name__)
 
+class PaystackUnavailable(Exception):
+    """Paystack call refused (breaker open, bulkhead full) or failed within its budget"""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open fails
+    fast for `reset_timeout` seconds, then half_open lets one trial call
+    through and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == "open":
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._trial_started = None
+
+        if self.state == "half_open":
+            # A trial that never reported back (cancelled) expires after reset_timeout
+            if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+                return False
+            self._trial_started = now
+        return True
+
+    def release_trial(self):
+        """A call ended without reaching Paystack (bulkhead full, budget spent); let the next one try"""
+        if self.state == "half_open":
+            self._trial_started = None
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._trial_started = None
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
 class Paystack:
     def __init__(self):
         self.secret_key = settings.PAYSTACK_SECRET_KEY
@@ -23,6 +86,121 @@ class Paystack:
             "Authorization": f"Bearer {self.secret_key}",
             "Content-Type": "application/json"
         }
+        self.max_concurrency = settings.PAYSTACK_MAX_CONCURRENCY
+        self.breaker = CircuitBreaker(settings.PAYSTACK_BREAKER_FAILURES, settings.PAYSTACK_BREAKER_RESET_SECONDS)
+        self._bulkhead = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = 0
+        self._http: Optional[httpx.AsyncClient] = None
+        self.counters = {
+            "calls": 0, "succeeded": 0, "failed": 0, "timeouts": 0,
+            "retries": 0, "hedges": 0, "rejected_breaker": 0, "rejected_bulkhead": 0,
+        }
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(limits=httpx.Limits(max_connections=self.max_concurrency))
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.snapshot(),
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            **self.counters,
+        }
+
+    async def _request(self, method: str, url: str, deadline: float, **kwargs) -> httpx.Response:
+        """One HTTP attempt inside the bulkhead, bounded by the call's deadline"""
+        loop = asyncio.get_running_loop()
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            self.counters["timeouts"] += 1
+            self.breaker.release_trial()
+            raise PaystackUnavailable("Paystack call budget exhausted")
+
+        try:
+            await asyncio.wait_for(self._bulkhead.acquire(), timeout=min(settings.PAYSTACK_BULKHEAD_WAIT_SECONDS, remaining))
+        except asyncio.TimeoutError:
+            self.counters["rejected_bulkhead"] += 1
+            self.breaker.release_trial()
+            raise PaystackUnavailable("Too many concurrent Paystack calls")
+
+        self._in_flight += 1
+        try:
+            response = await self._client().request(
+                method, url, headers=self.headers, timeout=max(deadline - loop.time(), 0.001), **kwargs
+            )
+        except httpx.TimeoutException:
+            self.counters["timeouts"] += 1
+            self.breaker.record_failure()
+            raise PaystackUnavailable("Paystack timed out")
+        except httpx.TransportError as e:
+            self.breaker.record_failure()
+            raise PaystackUnavailable(f"Paystack unreachable: {str(e)}")
+        finally:
+            self._in_flight -= 1
+            self._bulkhead.release()
+
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+            raise PaystackUnavailable(f"Paystack returned {response.status_code}")
+
+        self.breaker.record_success()
+        return response
+
+    async def _hedged(self, attempt):
+        """Start a second identical request if the first is slower than PAYSTACK_HEDGE_AFTER_MS"""
+        hedge_after = settings.PAYSTACK_HEDGE_AFTER_MS / 1000
+        if not hedge_after:
+            return await attempt()
+
+        pending = {asyncio.ensure_future(attempt())}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if not done:
+                self.counters["hedges"] += 1
+                pending.add(asyncio.ensure_future(attempt()))
+
+            error = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _call(self, attempt, budget: float, retries: int = 0, hedge: bool = False) -> httpx.Response:
+        """Breaker check, then up to `retries` jittered retries within `budget` seconds"""
+        self.counters["calls"] += 1
+        if not self.breaker.allow():
+            self.counters["rejected_breaker"] += 1
+            raise PaystackUnavailable("Paystack circuit open")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget
+        for retry in range(retries + 1):
+            try:
+                response = await (self._hedged(lambda: attempt(deadline)) if hedge else attempt(deadline))
+                self.counters["succeeded"] += 1
+                return response
+            except PaystackUnavailable:
+                # Full jitter: sleep U(0, base * 2^n)
+                delay = random.uniform(0, settings.PAYSTACK_RETRY_BACKOFF_SECONDS * 2 ** retry)
+                if retry == retries or self.breaker.state == "open" or loop.time() + delay >= deadline:
+                    self.counters["failed"] += 1
+                    raise
+                self.counters["retries"] += 1
+                await asyncio.sleep(delay)
 
     def verify_paystack_signature(self, payload: bytes, signature: str) -> bool:
         """Verify Paystack webhook signature"""
@@ -62,13 +240,11 @@ class Paystack:
         if metadata:
             payload["metadata"] = metadata
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                self.initialize_url,
-                json=payload,
-                headers=self.headers,
-                timeout=30.0,
-            )
+        # Not idempotent: no retries or hedging
+        response = await self._call(
+            lambda deadline: self._request("POST", self.initialize_url, deadline, json=payload),
+            budget=settings.PAYSTACK_INITIALIZE_BUDGET_SECONDS
+        )
         
         if response.status_code == 200:
             data = response.json()
@@ -80,19 +256,21 @@ class Paystack:
             raise Exception(f"Paystack error: {response.text}")
     
     async def verify_transaction(self, reference: str):
-        """Verify a transaction status"""
-        
+        """Verify a transaction status; concurrent verifies of one reference share a call"""
+        return await single_flight.do(("paystack_verify", reference), lambda: self._verify(reference))
+    
+    async def _verify(self, reference: str):
         if not self.secret_key:
             raise Exception("Paystack secret key not configured")
         
         url = f"{settings.PAYSTACK_VERIFY_URL}/{reference}"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=self.headers,
-                timeout=30.0,
-            )
+        response = await self._call(
+            lambda deadline: self._request("GET", url, deadline),
+            budget=settings.PAYSTACK_VERIFY_BUDGET_SECONDS,
+            retries=settings.PAYSTACK_VERIFY_RETRIES,
+            hedge=True
+        )
         
         if response.status_code == 200:
             data = response.json()
@@ -107,14 +285,22 @@ class Paystack:
         
     async def handle_charge_success(self, data: dict, db: Session):
         """Handle Successful payment charge"""
+        shard_db = None
         try:
             reference = data["data"]["reference"]
             amount = data["data"]["amount"] / 100
             logger.info(f"Processing successful charge for reference: {reference} - ₦{amount}")
+            
+            metadata = data["data"].get("metadata")
+            owner_id = metadata.get("user_id") if isinstance(metadata, dict) else None
+            shard = shard_for_reference(reference, owner_id)
+            if shard != 0:
+                db = shard_db = shard_router.session(shard)
         
-            transaction = db.query(Transaction).filter(
+            # Locked, so a redelivered webhook waits here and then sees SUCCESS
+            transaction = recent_first(db.query(Transaction).filter(
                 Transaction.reference == reference
-            ).first()
+            ).with_for_update())
             
             if not transaction:
                 logger.error(f"Transaction with reference {reference} not found")
@@ -128,28 +314,33 @@ class Paystack:
                 return {"status": True}
             
             transaction.status = TransactionStatus.SUCCESS
-            transaction.transaction_data = json.dumps(data["data"])
+            transaction.transaction_data = data["data"]
+            record_transaction_event(db, transaction, STATUS_CHANGED)
         
             wallet = db.query(Wallet).filter(
                 Wallet.user_id == transaction.user_id
             ).first()
         
             if wallet:
-                old_balance = wallet.balance
-                wallet.balance += amount
-                logger.info(f"Wallet {wallet.wallet_number} credited: "
-                            f"₦{old_balance} - ₦{wallet.balance}")
+                credit(db, wallet.id, amount)
+                logger.info(f"Wallet {wallet.wallet_number} credited: ₦{amount}")
             
             else:
                 logger.error(f"Wallet not found for user: {transaction.user_id}")
         
+            # Built before commit, which expires the transaction
+            event, user_id = transaction_event(transaction), transaction.user_id
             db.commit()
+            publish_transaction(event, [user_id])
             logger.info(f"Transaction {reference} completed successfully")
             
         except Exception as e:
             db.rollback()
             logger.error(f"Error handling charge.success: {str(e)}")
             raise
+        finally:
+            if shard_db:
+                shard_db.close()
 
     
 paystack = Paystack()
\ No newline at end of file
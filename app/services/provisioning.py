@@ -0,0 +1,531 @@
+"""
+Bulk user and wallet provisioning for partner migrations.
+
+Input is CSV (with a header row) or NDJSON, one customer per record:
+`email` (required), `name`, `google_id`, `opening_balance`. Records are
+loaded in batches:
+
+  1. COPY the batch into a temporary staging table on shard 0
+  2. resolve emails that already have a user, and re-draw pre-generated
+     wallet numbers that collide with existing ones
+  3. merge set-based into users, user_shards, wallets, and (for opening
+     balances) transactions + postings + ledger_events, with ON CONFLICT DO NOTHING
+
+Rows for other shards are copied and merged there the same way after
+shard 0 commits. Each batch is idempotent: an existing user keeps its
+wallet and balance, and an opening balance is only credited together with
+the wallet it creates. Re-running a half-applied batch converges, so
+resuming is skipping the batches the checkpoint file records as done.
+
+Postgres only, because of COPY.
+"""
+import csv
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Union
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from app.config import settings
+from app.models.transactions import Transaction, TransactionStatus, TransactionType
+from app.services.ledger_events import CREATED
+from app.sharding import shard_router
+import logging
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+OPENING_REFERENCE_PREFIX = "OPEN_"
+DEADLOCK_DETECTED = "40P01"
+
+STAGING_COLUMNS = ["line", "email", "name", "google_id", "user_id", "wallet_number", "opening_balance", "shard"]
+
+CREATE_STAGING = """
+CREATE TEMP TABLE provision_staging (
+    line bigint PRIMARY KEY,
+    email text NOT NULL,
+    name text,
+    google_id text,
+    user_id uuid NOT NULL DEFAULT gen_random_uuid(),
+    wallet_number text NOT NULL,
+    opening_balance double precision,
+    shard integer NOT NULL,
+    existing boolean NOT NULL DEFAULT false
+) ON COMMIT DROP
+"""
+
+MERGE_WALLETS = """
+WITH new_wallets AS (
+    INSERT INTO wallets (id, user_id, wallet_number, balance)
+    SELECT gen_random_uuid(), user_id, wallet_number, COALESCE(opening_balance, 0)
+    FROM provision_staging WHERE shard = %(shard)s
+    ON CONFLICT DO NOTHING
+    RETURNING id, user_id, wallet_number, balance
+), opening AS (
+    INSERT INTO transactions (id, user_id, wallet_id, amount, currency, transaction_type, status, description, reference)
+    SELECT gen_random_uuid(), user_id, id, balance, 'NGN',
+           CAST(%(deposit)s AS {type_enum}), CAST(%(success)s AS {status_enum}),
+           'Opening balance', %(prefix)s || wallet_number
+    FROM new_wallets WHERE balance > 0
+    ON CONFLICT DO NOTHING
+    RETURNING id, reference, user_id, wallet_id, amount, created_at
+), postings AS (
+    INSERT INTO postings (wallet_id, created_at, transaction_id, amount, transaction_type)
+    SELECT wallet_id, created_at, id, amount, CAST(%(deposit)s AS {type_enum})
+    FROM opening
+    RETURNING 1
+), events AS (
+    INSERT INTO ledger_events (event_type, transaction_id, reference, user_id, wallet_id, transaction_type, status, amount, txid)
+    SELECT %(created)s, id, reference, user_id, wallet_id,
+           CAST(%(deposit)s AS {type_enum}), CAST(%(success)s AS {status_enum}), amount,
+           pg_current_xact_id()::text::bigint
+    FROM opening
+    RETURNING 1
+)
+SELECT (SELECT count(*) FROM new_wallets), (SELECT count(*) FROM opening), (SELECT COALESCE(sum(amount), 0) FROM opening)
+""".format(
+    type_enum=Transaction.__table__.c.transaction_type.type.name,
+    status_enum=Transaction.__table__.c.status.type.name,
+)
+
+
+class ProvisioningError(Exception):
+    """Input or checkpoint problem that stops a provisioning run"""
+
+
+def detect_format(path: str) -> str:
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def read_records(path: str, fmt: str) -> Iterator[Union[dict, ValueError]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        # Rejected per record by _clean instead of failing the run
+                        yield ValueError(f"invalid JSON: {str(e)}")
+
+
+def count_records(path: str, fmt: str) -> int:
+    return sum(1 for _ in read_records(path, fmt))
+
+
+def new_wallet_numbers(count: int) -> List[str]:
+    """`count` random 13-digit wallet numbers (not checked for uniqueness)"""
+    raw = os.urandom(8 * count)
+    return [f"{int.from_bytes(raw[i:i + 8], 'big') % 10**13:013d}" for i in range(0, len(raw), 8)]
+
+
+def _clean(record) -> dict:
+    if isinstance(record, ValueError):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+
+    email = (record.get("email") or "").strip()
+    if "@" not in email:
+        raise ValueError("missing or invalid email")
+
+    opening_balance = record.get("opening_balance")
+    if opening_balance in (None, ""):
+        opening_balance = None
+    else:
+        opening_balance = float(opening_balance)
+        if opening_balance < 0:
+            raise ValueError("negative opening_balance")
+
+    return {
+        "email": email,
+        "name": (record.get("name") or "").strip() or None,
+        "google_id": (record.get("google_id") or "").strip() or None,
+        "opening_balance": opening_balance,
+    }
+
+
+def _copy_rows(conn: Connection, table: str, columns: List[str], rows: List[list]):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def _redraw_collisions(conn: Connection, sharded: bool):
+    """Give new wallets whose pre-generated number is already taken a fresh one"""
+    taken = "EXISTS (SELECT 1 FROM wallets w WHERE w.wallet_number = s.wallet_number AND w.user_id <> s.user_id)"
+    if sharded:
+        taken += " OR EXISTS (SELECT 1 FROM user_shards d WHERE d.wallet_number = s.wallet_number AND d.user_id <> s.user_id)"
+
+    while True:
+        lines = [row[0] for row in conn.exec_driver_sql(f"SELECT s.line FROM provision_staging s WHERE {taken}")]
+        if not lines:
+            return
+        logger.info(f"Re-drawing {len(lines)} colliding wallet numbers")
+        conn.exec_driver_sql(
+            "UPDATE provision_staging SET wallet_number = %(wallet_number)s WHERE line = %(line)s",
+            [{"line": line, "wallet_number": number} for line, number in zip(lines, new_wallet_numbers(len(lines)))]
+        )
+
+
+def _merge_wallets(conn: Connection, shard: int) -> tuple:
+    counts = tuple(conn.exec_driver_sql(MERGE_WALLETS, {
+        "shard": shard,
+        "deposit": TransactionType.DEPOSIT.name,
+        "success": TransactionStatus.SUCCESS.name,
+        "created": CREATED,
+        "prefix": OPENING_REFERENCE_PREFIX,
+    }).one())
+
+    # A wallet number taken concurrently would leave a user without a wallet;
+    # roll the batch back so the retry draws again
+    missing = conn.exec_driver_sql(
+        "SELECT count(*) FROM provision_staging s WHERE shard = %(shard)s "
+        "AND NOT EXISTS (SELECT 1 FROM wallets w WHERE w.user_id = s.user_id)", {"shard": shard}
+    ).scalar()
+    if missing:
+        raise ProvisioningError(f"{missing} wallets could not be created on shard {shard}, retry the batch")
+    return counts
+
+
+def load_batch(records: List[tuple]) -> dict:
+    """
+    Provision one batch of (line, record) pairs; returns its counters.
+    Safe to re-run after a failure part-way through.
+    """
+    result = {"rows": len(records), "users_created": 0, "existing_users": 0, "wallets_created": 0,
+              "opening_balances": 0, "opening_total": 0.0, "rejected": []}
+    sharded = shard_router.shard_count > 1
+
+    cleaned, emails = [], set()
+    for line, record in records:
+        try:
+            row = _clean(record)
+        except (ValueError, TypeError) as e:
+            result["rejected"].append({"line": line, "reason": str(e)})
+            continue
+        if row["email"] in emails:
+            result["rejected"].append({"line": line, "reason": "duplicate email in input"})
+            continue
+        emails.add(row["email"])
+        cleaned.append((line, row))
+
+    if not cleaned:
+        return result
+
+    wallet_numbers = new_wallet_numbers(len(cleaned))
+    while len(set(wallet_numbers)) < len(wallet_numbers):
+        wallet_numbers = new_wallet_numbers(len(cleaned))
+
+    if sharded:
+        # Placement needs the id up front; unsharded, staging draws it server-side
+        columns = STAGING_COLUMNS
+        staged = []
+        for (line, row), wallet_number in zip(cleaned, wallet_numbers):
+            user_id = uuid.uuid4()
+            staged.append([line, row["email"], row["name"], row["google_id"], user_id, wallet_number,
+                           row["opening_balance"], shard_router.placement(user_id)])
+    else:
+        columns = [column for column in STAGING_COLUMNS if column != "user_id"]
+        staged = [
+            [line, row["email"], row["name"], row["google_id"], wallet_number, row["opening_balance"], 0]
+            for (line, row), wallet_number in zip(cleaned, wallet_numbers)
+        ]
+
+    shard_rows: Dict[int, List[list]] = {}
+    with shard_router.engines[0].begin() as conn:
+        conn.exec_driver_sql(CREATE_STAGING)
+        _copy_rows(conn, "provision_staging", columns, staged)
+
+        result["existing_users"] = conn.exec_driver_sql(
+            "UPDATE provision_staging s SET user_id = u.id, existing = true FROM users u WHERE u.email = s.email"
+        ).rowcount
+        if sharded:
+            conn.exec_driver_sql(
+                "UPDATE provision_staging s SET wallet_number = d.wallet_number, shard = d.shard "
+                "FROM user_shards d WHERE d.user_id = s.user_id"
+            )
+        # Pre-sharding users have no directory row and keep their shard 0 wallet
+        conn.exec_driver_sql(
+            "UPDATE provision_staging s SET wallet_number = w.wallet_number, shard = 0 "
+            "FROM wallets w WHERE w.user_id = s.user_id"
+        )
+        _redraw_collisions(conn, sharded)
+
+        result["users_created"] = conn.exec_driver_sql(
+            "INSERT INTO users (id, email, name, google_id) "
+            "SELECT user_id, email, name, google_id FROM provision_staging WHERE NOT existing "
+            "ON CONFLICT DO NOTHING"
+        ).rowcount
+        # New emails whose google_id already belongs to someone else
+        for line, email in conn.exec_driver_sql(
+            "DELETE FROM provision_staging s WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = s.user_id) "
+            "RETURNING line, email"
+        ):
+            result["rejected"].append({"line": line, "reason": f"conflicts with an existing user ({email})"})
+
+        if sharded:
+            conn.exec_driver_sql(
+                "INSERT INTO user_shards (user_id, wallet_number, shard, state) "
+                "SELECT user_id, wallet_number, shard, 'active' FROM provision_staging ON CONFLICT DO NOTHING"
+            )
+            for row in conn.exec_driver_sql(
+                f"SELECT {', '.join(STAGING_COLUMNS)} FROM provision_staging WHERE shard <> 0"
+            ):
+                shard_rows.setdefault(row.shard, []).append(list(row))
+
+        wallets, openings, total = _merge_wallets(conn, 0)
+        result["wallets_created"] += wallets
+        result["opening_balances"] += openings
+        result["opening_total"] += total
+
+    # Shard 0 is committed first: a retry finds these users by email and
+    # picks up their wallet number and shard from the directory
+    for shard, rows in shard_rows.items():
+        with shard_router.engines[shard].begin() as conn:
+            conn.exec_driver_sql(CREATE_STAGING)
+            _copy_rows(conn, "provision_staging", STAGING_COLUMNS, rows)
+            conn.exec_driver_sql(
+                "INSERT INTO users (id, email, name, google_id) "
+                "SELECT user_id, email, name, google_id FROM provision_staging ON CONFLICT DO NOTHING"
+            )
+            wallets, openings, total = _merge_wallets(conn, shard)
+            result["wallets_created"] += wallets
+            result["opening_balances"] += openings
+            result["opening_total"] += total
+
+    return result
+
+
+class Checkpoint:
+    """Progress of one input file, written after every committed batch"""
+
+    def __init__(self, path: str, source: str, batch_size: int):
+        self.path = path
+        stat = os.stat(source)
+        self.state = {
+            "source": os.path.abspath(source),
+            "source_size": stat.st_size,
+            "source_mtime": stat.st_mtime,
+            "batch_size": batch_size,
+            "rows_done": 0,
+            "batches_done": 0,
+            "totals": {"users_created": 0, "existing_users": 0, "wallets_created": 0,
+                       "opening_balances": 0, "opening_total": 0.0, "rejected": 0},
+            "completed": False,
+            "updated_at": None,
+        }
+
+    def load(self):
+        """Continue from the saved state; the input must not have changed since"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            saved = json.load(f)
+        if (saved["source_size"], saved["source_mtime"]) != (self.state["source_size"], self.state["source_mtime"]):
+            raise ProvisioningError(f"{self.state['source']} changed since checkpoint {self.path} was written")
+        self.state = saved
+
+    def save(self):
+        self.state["updated_at"] = datetime.now(timezone.utc).isoformat()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def _load_with_retry(records: List[tuple], attempts: int = 3) -> dict:
+    """load_batch, retried when parallel batches deadlock or a wallet number is taken concurrently"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return load_batch(records)
+        except (DBAPIError, ProvisioningError) as e:
+            retryable = isinstance(e, ProvisioningError) or getattr(e.orig, "pgcode", None) == DEADLOCK_DETECTED
+            if not retryable or attempt == attempts:
+                raise
+            logger.warning(f"Retrying batch starting at record {records[0][0]}: {str(e)}")
+
+
+def provision(
+    path: str,
+    fmt: Optional[str] = None,
+    batch_size: int = settings.PROVISIONING_BATCH_SIZE,
+    workers: int = settings.PROVISIONING_WORKERS,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False,
+    total: Optional[int] = None,
+    progress: Optional[Callable[[dict], None]] = None,
+    rejects_path: Optional[str] = None
+) -> dict:
+    """
+    Provision every record in `path`; returns the checkpoint state plus
+    throughput. Up to `workers` batches load concurrently, each on its own
+    connection. The checkpoint only advances over the contiguous prefix of
+    finished batches, so a resume may re-run (harmlessly) a few batches that
+    had completed out of order; their users then count as existing.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ProvisioningError(f"Unknown format: {fmt}")
+    if shard_router.engines[0].dialect.name != "postgresql":
+        raise ProvisioningError("Bulk provisioning needs Postgres (COPY)")
+
+    checkpoint = Checkpoint(checkpoint_path or path + ".checkpoint.json", path, batch_size)
+    if resume:
+        checkpoint.load()
+        batch_size = checkpoint.state["batch_size"]
+    state = checkpoint.state
+    totals = state["totals"]
+
+    records = islice(enumerate(read_records(path, fmt), start=1), state["rows_done"], None)
+    rejects = open(rejects_path, "a") if rejects_path else None
+    start = time.perf_counter()
+    rows_this_run = 0
+    next_batch = state["batches_done"]
+    finished: Dict[int, int] = {}  # batch index -> rows, completed beyond the checkpoint
+    in_flight = {}
+
+    def submit():
+        nonlocal next_batch
+        batch = list(islice(records, batch_size))
+        if batch:
+            in_flight[pool.submit(_load_with_retry, batch)] = next_batch
+            next_batch += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="provision") as pool:
+            for _ in range(workers * 2):
+                submit()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    result = future.result()
+
+                    for key in ("users_created", "existing_users", "wallets_created", "opening_balances", "opening_total"):
+                        totals[key] += result[key]
+                    totals["rejected"] += len(result["rejected"])
+                    if rejects:
+                        for reject in result["rejected"]:
+                            rejects.write(json.dumps(reject) + "\n")
+                        rejects.flush()
+
+                    rows_this_run += result["rows"]
+                    finished[index] = result["rows"]
+                    while state["batches_done"] in finished:
+                        state["rows_done"] += finished.pop(state["batches_done"])
+                        state["batches_done"] += 1
+                    checkpoint.save()
+                    submit()
+
+                elapsed = time.perf_counter() - start
+                rate = rows_this_run / elapsed if elapsed else 0.0
+                if progress:
+                    progress({
+                        "rows_done": state["rows_done"],
+                        "total": total,
+                        "rows_per_sec": round(rate, 1),
+                        "eta_seconds": round((total - state["rows_done"]) / rate, 1) if total and rate else None,
+                        **totals,
+                    })
+    finally:
+        if rejects:
+            rejects.close()
+
+    state["completed"] = True
+    checkpoint.save()
+
+    elapsed = time.perf_counter() - start
+    return {
+        **state,
+        "checkpoint": checkpoint.path,
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows_this_run / elapsed, 1) if elapsed else None,
+    }
+
+
+class ProvisioningJobs:
+    """
+    Background provisioning runs started from the admin API, one thread
+    each. Uploads and checkpoints live in PROVISIONING_DIR, so a failed job
+    can be resumed, also by another worker or after a restart.
+    """
+
+    def __init__(self, directory: str = settings.PROVISIONING_DIR):
+        self.directory = directory
+        self.jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        return f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+
+    def paths(self, job_id: str, fmt: str) -> dict:
+        if not job_id.replace("-", "").isalnum():
+            raise ProvisioningError("Invalid job id")
+        base = os.path.join(self.directory, job_id)
+        return {
+            "source": f"{base}.{fmt}",
+            "checkpoint": f"{base}.checkpoint.json",
+            "rejects": f"{base}.rejects.ndjson",
+        }
+
+    def find(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job:
+                return dict(job)
+
+        for fmt in FORMATS:
+            paths = self.paths(job_id, fmt)
+            if os.path.exists(paths["source"]):
+                state = None
+                if os.path.exists(paths["checkpoint"]):
+                    with open(paths["checkpoint"]) as f:
+                        state = json.load(f)
+                return {"id": job_id, "format": fmt, "status": "completed" if state and state["completed"] else "stopped",
+                        "progress": state, "error": None}
+        return None
+
+    def start(self, job_id: str, fmt: str, resume: bool = False) -> dict:
+        paths = self.paths(job_id, fmt)
+        with self._lock:
+            if self.jobs.get(job_id, {}).get("status") == "running":
+                raise ProvisioningError("Job is already running")
+            job = self.jobs[job_id] = {"id": job_id, "format": fmt, "status": "running", "progress": None, "error": None}
+
+        def report(progress: dict):
+            job["progress"] = progress
+
+        def run():
+            try:
+                job["progress"] = provision(
+                    paths["source"], fmt, checkpoint_path=paths["checkpoint"], resume=resume,
+                    total=count_records(paths["source"], fmt), progress=report, rejects_path=paths["rejects"],
+                )
+                job["status"] = "completed"
+                logger.info(f"Provisioning job {job_id} completed: {job['progress']['rows_done']} rows")
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                logger.error(f"Provisioning job {job_id} failed: {str(e)}")
+
+        threading.Thread(target=run, name=f"provision-{job_id}", daemon=True).start()
+        return dict(job)
+
+
+provisioning_jobs = ProvisioningJobs()
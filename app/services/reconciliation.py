@@ -0,0 +1,191 @@
+"""
+Ledger-vs-balance reconciliation.
+
+Every wallet's balance (stripes included) must equal the sum of its postings (credits
+positive, debits negative) whose journal entry succeeded, including the
+totals kept for archived partitions.
+
+The wallet-id space is split into ranges and each range is reconciled on
+its own, in a process pool when workers > 1. Three methods:
+
+  sql    - the database does the GROUP BY (default, fastest)
+  numpy  - postings streamed in chunks, summed with np.bincount
+  python - same streaming, summed in a dict (no NumPy needed)
+"""
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, create_engine, func, select
+from sqlalchemy.engine import Connection, Engine
+from app.models.wallet import Wallet
+from app.models.transactions import Posting, Transaction, TransactionArchiveTotal, TransactionStatus
+from app.services.striping import WALLET_BALANCE
+import logging
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("sql", "numpy", "python")
+REPORT_COLUMNS = ["shard", "wallet_id", "wallet_number", "user_id", "balance", "ledger", "difference", "transactions"]
+
+# Join condition of a posting to its journal entry (created_at lets Postgres prune partitions)
+POSTED = and_(Transaction.id == Posting.transaction_id, Transaction.created_at == Posting.created_at)
+
+_engines: Dict[str, Engine] = {}
+
+
+def uuid_ranges(partitions: int) -> List[Tuple[Optional[uuid.UUID], Optional[uuid.UUID]]]:
+    """Split the UUID space into equal [lo, hi) ranges; None means unbounded"""
+    step = (1 << 128) // partitions
+    bounds = [uuid.UUID(int=i * step) for i in range(1, partitions)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def _in_range(column, lo, hi) -> list:
+    conditions = []
+    if lo is not None:
+        conditions.append(column >= lo)
+    if hi is not None:
+        conditions.append(column < hi)
+    return conditions
+
+
+def _wallets(conn: Connection, lo, hi) -> list:
+    return conn.execute(
+        select(Wallet.id, Wallet.wallet_number, Wallet.user_id, WALLET_BALANCE).where(*_in_range(Wallet.id, lo, hi))
+    ).all()
+
+
+def ledger_totals_sql(conn: Connection, lo, hi) -> Tuple[list, Dict[uuid.UUID, tuple]]:
+    ledger = select(
+        Posting.wallet_id, func.sum(Posting.amount), func.count()
+    ).join(Transaction, POSTED).where(
+        Transaction.status == TransactionStatus.SUCCESS, *_in_range(Posting.wallet_id, lo, hi)
+    ).group_by(Posting.wallet_id)
+
+    totals = {row[0]: (row[1], row[2]) for row in conn.execute(ledger)}
+    return _wallets(conn, lo, hi), totals
+
+
+def ledger_totals_streamed(conn: Connection, lo, hi, chunk_size: int, vectorized: bool) -> Tuple[list, Dict[uuid.UUID, tuple]]:
+    wallets = _wallets(conn, lo, hi)
+    index = {wallet.id: i for i, wallet in enumerate(wallets)}
+    stream = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+        select(Posting.wallet_id, Posting.amount).join(Transaction, POSTED).where(
+            Transaction.status == TransactionStatus.SUCCESS, *_in_range(Posting.wallet_id, lo, hi)
+        )
+    )
+
+    if vectorized:
+        import numpy as np
+
+        sums = np.zeros(len(wallets))
+        counts = np.zeros(len(wallets), dtype=np.int64)
+        for chunk in stream.partitions(chunk_size):
+            wallet_ids, amounts = zip(*chunk)
+            codes = np.fromiter((index[wallet_id] for wallet_id in wallet_ids), dtype=np.int64, count=len(wallet_ids))
+            sums += np.bincount(codes, weights=np.asarray(amounts, dtype=np.float64), minlength=len(wallets))
+            counts += np.bincount(codes, minlength=len(wallets))
+        totals = {wallets[i].id: (float(sums[i]), int(counts[i])) for i in np.flatnonzero(counts)}
+    else:
+        sums: Dict[uuid.UUID, float] = {}
+        counts: Dict[uuid.UUID, int] = {}
+        for chunk in stream.partitions(chunk_size):
+            for wallet_id, amount in chunk:
+                sums[wallet_id] = sums.get(wallet_id, 0.0) + amount
+                counts[wallet_id] = counts.get(wallet_id, 0) + 1
+        totals = {wallet_id: (sums[wallet_id], counts[wallet_id]) for wallet_id in sums}
+
+    return wallets, totals
+
+
+def add_archived_totals(conn: Connection, lo, hi, totals: Dict[uuid.UUID, tuple]) -> Dict[uuid.UUID, tuple]:
+    """Fold in what archived transactions partitions carried for these wallets"""
+    archived = conn.execute(
+        select(
+            TransactionArchiveTotal.wallet_id,
+            func.sum(TransactionArchiveTotal.amount),
+            func.sum(TransactionArchiveTotal.transactions),
+        ).where(*_in_range(TransactionArchiveTotal.wallet_id, lo, hi)).group_by(TransactionArchiveTotal.wallet_id)
+    )
+    for wallet_id, amount, count in archived:
+        live_amount, live_count = totals.get(wallet_id, (0.0, 0))
+        totals[wallet_id] = ((live_amount or 0.0) + amount, live_count + int(count))
+    return totals
+
+
+def reconcile_partition(url: str, shard: int, lo, hi, method: str, chunk_size: int, tolerance: float) -> dict:
+    """Reconcile wallets with lo <= id < hi on one shard; runs in a pool worker"""
+    engine = _engines.get(url)
+    if engine is None:
+        engine = _engines[url] = create_engine(url)
+
+    with engine.connect() as conn:
+        if method == "sql":
+            wallets, totals = ledger_totals_sql(conn, lo, hi)
+        else:
+            wallets, totals = ledger_totals_streamed(conn, lo, hi, chunk_size, vectorized=method == "numpy")
+        totals = add_archived_totals(conn, lo, hi, totals)
+
+    discrepancies = []
+    for wallet in wallets:
+        ledger, count = totals.get(wallet.id, (0.0, 0))
+        balance = wallet.balance or 0.0
+        if abs(balance - (ledger or 0.0)) > tolerance:
+            discrepancies.append([
+                shard, str(wallet.id), wallet.wallet_number, str(wallet.user_id),
+                balance, ledger or 0.0, round(balance - (ledger or 0.0), 6), count,
+            ])
+
+    return {
+        "wallets": len(wallets),
+        "transactions": sum(count for _, count in totals.values()),
+        "discrepancies": discrepancies,
+    }
+
+
+def reconcile(
+    engines: Dict[int, Engine],
+    method: str = "sql",
+    workers: int = 1,
+    partitions: Optional[int] = None,
+    chunk_size: int = 50_000,
+    tolerance: float = 0.005
+) -> dict:
+    """Reconcile every wallet on the given {shard: engine}; returns totals, rows/sec and discrepancies"""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    if method == "numpy":
+        import numpy  # noqa: F401 - fail before starting workers
+
+    partitions = partitions or max(1, workers * 4)
+    tasks = [
+        (engine.url.render_as_string(hide_password=False), shard, lo, hi, method, chunk_size, tolerance)
+        for shard, engine in engines.items()
+        for lo, hi in uuid_ranges(partitions)
+    ]
+
+    start = time.perf_counter()
+    if workers > 1:
+        # spawn: children must not inherit the parent's pooled connections
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            results = list(pool.map(reconcile_partition, *zip(*tasks)))
+    else:
+        results = [reconcile_partition(*task) for task in tasks]
+    elapsed = time.perf_counter() - start
+
+    transactions = sum(result["transactions"] for result in results)
+    discrepancies = [row for result in results for row in result["discrepancies"]]
+    return {
+        "method": method,
+        "shards": len(engines),
+        "partitions": len(tasks),
+        "workers": workers,
+        "wallets": sum(result["wallets"] for result in results),
+        "transactions": transactions,
+        "discrepancy_count": len(discrepancies),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_sec": round(transactions / elapsed, 1) if elapsed else None,
+        "discrepancies": discrepancies,
+    }
@@ -0,0 +1,423 @@
+"""
+Executor for scheduled and recurring transfers.
+
+Every SCHEDULED_TRANSFER_INTERVAL_SECONDS a pool of worker threads drains
+the due transfers on each shard, one batch per DB transaction:
+
+  1. claim up to SCHEDULED_TRANSFER_BATCH_SIZE due rows with
+     FOR UPDATE SKIP LOCKED, so workers (in this process or another API
+     worker) take disjoint batches
+  2. lock every wallet the batch touches, in id order
+  3. per sender, accept its transfers oldest first while the balance covers
+     them (a striped sender's stripes are swept into its wallet row first);
+     each sender and recipient gets a single balance update
+  4. bulk-insert one journal entry per transfer with its debit and credit
+     postings and ledger events, advance the schedules and commit
+
+Recipients on another shard are credited through the cross-shard outbox,
+as with POST /wallet/transfer. A transfer whose recipient is being moved
+between shards stays due for the next batch. Occurrences missed while the
+executor was down are skipped rather than replayed.
+"""
+import asyncio
+import calendar
+import enum
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from sqlalchemy import Text, bindparam, cast, func, insert, or_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from app.auth.api_key_auth import generate_id
+from app.config import settings
+from app.models.scheduled_transfer import Recurrence, ScheduledTransfer, ScheduledTransferStatus
+from app.models.shard import CrossShardTransfer
+from app.models.transactions import Posting, Transaction, TransactionReference, TransactionStatus, TransactionType
+from app.models.wallet import Wallet
+from app.services.event_hub import publish_transaction, transaction_event
+from app.services.journal import posting_rows, reference_rows, transfer_data
+from app.services.ledger_events import record_transaction_events
+from app.services.striping import take_stripes
+from app.sharding import shard_router, deliver_cross_shard_transfer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands timestamps back without a timezone
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def occurrence_at(starts_at: datetime, recurrence: Recurrence, occurrence: int) -> datetime:
+    """When occurrence n (0-based) of a schedule is due"""
+    if recurrence == Recurrence.DAILY:
+        return starts_at + timedelta(days=occurrence)
+    if recurrence == Recurrence.WEEKLY:
+        return starts_at + timedelta(weeks=occurrence)
+    if recurrence == Recurrence.MONTHLY:
+        year, month = divmod(starts_at.year * 12 + starts_at.month - 1 + occurrence, 12)
+        # The 31st falls back to the last day of shorter months
+        day = min(starts_at.day, calendar.monthrange(year, month + 1)[1])
+        return starts_at.replace(year=year, month=month + 1, day=day)
+    return starts_at
+
+
+def _advance(transfer: ScheduledTransfer, now: datetime, error: Optional[str] = None) -> dict:
+    """Column updates recording the due occurrence's outcome and scheduling the next one"""
+    changes = {
+        "id": transfer.id,
+        "last_run_at": now,
+        "last_error": error,
+        "runs": transfer.runs if error else transfer.runs + 1,
+        "failures": transfer.failures + 1 if error else 0,
+        "status": transfer.status,
+        "occurrence": transfer.occurrence,
+        "next_run_at": transfer.next_run_at,
+    }
+
+    if transfer.recurrence == Recurrence.ONCE:
+        changes["status"] = ScheduledTransferStatus.FAILED if error else ScheduledTransferStatus.COMPLETED
+    elif changes["failures"] >= settings.SCHEDULED_TRANSFER_MAX_FAILURES:
+        changes["status"] = ScheduledTransferStatus.FAILED
+    elif transfer.max_runs is not None and changes["runs"] >= transfer.max_runs:
+        changes["status"] = ScheduledTransferStatus.COMPLETED
+    else:
+        starts_at = _aware(transfer.starts_at)
+        occurrence = transfer.occurrence + 1
+        while occurrence_at(starts_at, transfer.recurrence, occurrence) <= now:
+            occurrence += 1
+        changes["occurrence"] = occurrence
+        changes["next_run_at"] = occurrence_at(starts_at, transfer.recurrence, occurrence)
+    return changes
+
+
+def _as_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, enum.Enum):
+        return value.name  # enum columns store member names
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _update_many(db: Session, model, rows: List[dict]):
+    """
+    Per-row updates keyed by id, as a single UPDATE on Postgres. Each column
+    travels as one text[] parameter and is unnested back into rows, so the
+    statement has the same shape (and cached compilation) for any batch.
+    """
+    if not rows:
+        return
+    if db.get_bind().dialect.name != "postgresql":
+        db.execute(update(model), rows)
+        return
+
+    table = model.__table__
+    names = list(rows[0])
+    changes = func.unnest(*[
+        bindparam(name, [_as_text(row[name]) for row in rows], type_=ARRAY(Text)) for name in names
+    ]).table_valued(*names).render_derived(name="changes")
+    db.execute(table.update().where(table.c.id == cast(changes.c.id, table.c.id.type)).values({
+        name: cast(changes.c[name], table.c[name].type) for name in names if name != "id"
+    }))
+
+
+def _remote_recipients(numbers: set) -> Dict[str, tuple]:
+    """wallet_number -> (shard, user_id) for recipients that live on other shards"""
+    found, unknown = {}, defaultdict(set)
+    for number in numbers:
+        target, user_id, _ = shard_router.locate_wallet(number)
+        if user_id is not None:
+            found[number] = (target, user_id)
+        else:
+            # Not in the directory: only a pre-sharding wallet on shard 0 can match
+            unknown[target].add(number)
+
+    for target, wanted in unknown.items():
+        target_db = shard_router.session(target)
+        try:
+            for number, user_id in target_db.query(Wallet.wallet_number, Wallet.user_id).filter(
+                Wallet.wallet_number.in_(wanted)
+            ):
+                found[number] = (target, user_id)
+        finally:
+            target_db.close()
+    return found
+
+
+def run_batch(db: Session, batch_size: int = settings.SCHEDULED_TRANSFER_BATCH_SIZE) -> dict:
+    """Claim and execute one batch of due transfers on db's shard"""
+    shard = db.info.get("shard", 0)
+    now = datetime.now(timezone.utc)
+    result = {"claimed": 0, "executed": 0, "failed": 0, "deferred": 0}
+
+    due = db.query(ScheduledTransfer).filter(
+        ScheduledTransfer.status == ScheduledTransferStatus.ACTIVE,
+        ScheduledTransfer.next_run_at <= now
+    ).order_by(ScheduledTransfer.next_run_at).limit(batch_size).with_for_update(skip_locked=True).all()
+    result["claimed"] = len(due)
+    if not due:
+        db.commit()
+        return result
+
+    local, remote, moving = set(), set(), set()
+    for number in {transfer.recipient_wallet_number for transfer in due}:
+        target, _, state = shard_router.locate_wallet(number)
+        if state == "moving":
+            moving.add(number)
+        elif target == shard:
+            local.add(number)
+        else:
+            remote.add(number)
+    remote_recipients = _remote_recipients(remote) if remote else {}
+
+    by_sender = defaultdict(list)
+    for transfer in due:
+        by_sender[transfer.wallet_id].append(transfer)
+
+    wallets = db.query(Wallet).filter(or_(
+        Wallet.id.in_(list(by_sender)),
+        Wallet.wallet_number.in_(list(local))
+    )).order_by(Wallet.id).with_for_update().all()
+    by_id = {wallet.id: wallet for wallet in wallets}
+    by_number = {wallet.wallet_number: wallet for wallet in wallets}
+
+    # Striped senders spend their stripes too; they are swept into the wallet row
+    deltas = defaultdict(float, take_stripes(db, [wallet_id for wallet_id in by_sender if wallet_id in by_id]))
+    entries, postings, events, outbox, schedules = [], [], [], [], []
+    for wallet_id, transfers in by_sender.items():
+        sender = by_id.get(wallet_id)
+        available = sender.balance + deltas[wallet_id] if sender else 0.0
+        for transfer in transfers:
+            number = transfer.recipient_wallet_number
+            if number in moving:
+                result["deferred"] += 1
+                continue
+
+            recipient = by_number.get(number)
+            recipient_user_id = recipient.user_id if recipient else remote_recipients.get(number, (None, None))[1]
+            error = None
+            if sender is None:
+                error = "Sender wallet not found"
+            elif recipient_user_id is None:
+                error = "Recipient wallet not found"
+            elif str(recipient_user_id) == str(sender.user_id):
+                error = "Cannot transfer to yourself"
+            elif transfer.amount > available:
+                error = "Insufficient balance"
+
+            if error:
+                schedules.append(_advance(transfer, now, error))
+                result["failed"] += 1
+                continue
+
+            available -= transfer.amount
+            deltas[sender.id] -= transfer.amount
+            entry = {
+                "id": uuid.uuid4(),
+                "user_id": sender.user_id,
+                "wallet_id": sender.id,
+                "sender_wallet_id": sender.id,
+                "recipient_wallet_id": recipient.id if recipient else None,
+                "amount": transfer.amount,
+                "transaction_type": TransactionType.TRANSFER,
+                "status": TransactionStatus.SUCCESS,
+                "reference": f"trn_{generate_id()}",
+                "description": transfer.description or None,
+                "transaction_data": transfer_data(sender.wallet_number, number, scheduled_transfer_id=str(transfer.id)),
+                "created_at": now,
+            }
+            entries.append(entry)
+            legs = [(sender, -transfer.amount)]
+            if recipient:
+                deltas[recipient.id] += transfer.amount
+                legs.append((recipient, transfer.amount))
+            else:
+                outbox.append({
+                    "id": uuid.uuid4(),
+                    "reference": entry["reference"],
+                    "sender_user_id": sender.user_id,
+                    "sender_wallet_number": sender.wallet_number,
+                    "recipient_wallet_number": number,
+                    "amount": transfer.amount,
+                })
+            postings.extend(posting_rows(entry, [(wallet.id, amount) for wallet, amount in legs]))
+            events.extend({**entry, "user_id": wallet.user_id, "wallet_id": wallet.id} for wallet, _ in legs)
+            schedules.append(_advance(transfer, now))
+            result["executed"] += 1
+
+    # The wallets are locked, so each gets its final balance in one write
+    _update_many(db, Wallet, [
+        {"id": wallet_id, "balance": by_id[wallet_id].balance + delta, "version": by_id[wallet_id].version + 1}
+        for wallet_id, delta in deltas.items()
+    ])
+    _update_many(db, ScheduledTransfer, schedules)
+    if entries:
+        db.execute(insert(Transaction), entries)
+        db.execute(insert(TransactionReference), reference_rows(entries))
+        db.execute(insert(Posting), postings)
+        record_transaction_events(db, events)
+    if outbox:
+        db.execute(insert(CrossShardTransfer), outbox)
+    db.commit()
+
+    parties = defaultdict(list)
+    for event in events:
+        parties[event["id"]].append(event["user_id"])
+    for entry in entries:
+        publish_transaction(transaction_event(SimpleNamespace(**entry)), parties[entry["id"]])
+    for row in outbox:
+        if not deliver_cross_shard_transfer(shard, row["id"]):
+            logger.warning(f"Cross-shard credit {row['reference']} queued for retry")
+    return result
+
+
+def backlog(now: Optional[datetime] = None) -> dict:
+    """Due transfers across all shards and how late the oldest one is"""
+    now = now or datetime.now(timezone.utc)
+    depth, oldest = 0, None
+    for shard in range(shard_router.shard_count):
+        db = shard_router.session(shard)
+        try:
+            count, first = db.query(func.count(ScheduledTransfer.id), func.min(ScheduledTransfer.next_run_at)).filter(
+                ScheduledTransfer.status == ScheduledTransferStatus.ACTIVE,
+                ScheduledTransfer.next_run_at <= now
+            ).one()
+        finally:
+            db.close()
+        depth += count
+        if first is not None:
+            oldest = min(oldest, _aware(first)) if oldest else _aware(first)
+    return {
+        "backlog": depth,
+        "backlog_oldest_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0.0,
+    }
+
+
+class ScheduledTransferExecutor:
+    """
+    Runs due transfers on a fixed interval inside the app's event loop.
+
+    Each wake-up drains every shard with up to `workers` threads, each
+    claiming its own batches; without SKIP LOCKED (SQLite) a single worker
+    runs. Batch latency and backlog depth are kept in `metrics`.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: int = settings.SCHEDULED_TRANSFER_INTERVAL_SECONDS,
+        workers: int = settings.SCHEDULED_TRANSFER_WORKERS,
+        batch_size: int = settings.SCHEDULED_TRANSFER_BATCH_SIZE,
+        max_batches: int = settings.SCHEDULED_TRANSFER_MAX_BATCHES
+    ):
+        self.interval_seconds = interval_seconds
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.metrics = {
+            "runs": 0,
+            "batches": 0,
+            "executed": 0,
+            "failed": 0,
+            "deferred": 0,
+            "last_batch_ms": 0.0,
+            "batch_p50_ms": 0.0,
+            "batch_p95_ms": 0.0,
+            "last_run_ms": 0.0,
+            "last_run_at": None,
+            "last_error": None,
+            "backlog": 0,
+            "backlog_oldest_seconds": 0.0,
+        }
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _record(self, result: dict, duration_ms: float):
+        with self._lock:
+            self.metrics["batches"] += 1
+            for key in ("executed", "failed", "deferred"):
+                self.metrics[key] += result[key]
+            self._latencies.append(duration_ms)
+            ordered = sorted(self._latencies)
+            self.metrics["last_batch_ms"] = round(duration_ms, 2)
+            self.metrics["batch_p50_ms"] = round(ordered[len(ordered) // 2], 2)
+            self.metrics["batch_p95_ms"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2)
+
+    def _drain(self, shard: int):
+        """One pool worker: claim batches on `shard` until none are left"""
+        for _ in range(self.max_batches):
+            db = shard_router.session(shard)
+            start = time.perf_counter()
+            try:
+                result = run_batch(db, self.batch_size)
+            except Exception as e:
+                db.rollback()
+                self.metrics["last_error"] = str(e)
+                logger.error(f"Scheduled transfer batch failed on shard {shard}: {str(e)}")
+                return
+            finally:
+                db.close()
+
+            if not result["claimed"]:
+                return
+            self._record(result, (time.perf_counter() - start) * 1000)
+            if result["claimed"] < self.batch_size or result["deferred"] == result["claimed"]:
+                return
+
+    def run_once(self) -> dict:
+        start = time.perf_counter()
+        executed_before = self.metrics["executed"]
+        self.metrics["last_error"] = None
+
+        workers = self.workers if shard_router.engines[0].dialect.name == "postgresql" else 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scheduled-transfers") as pool:
+            drains = [pool.submit(self._drain, shard) for shard in range(shard_router.shard_count) for _ in range(workers)]
+            for drain in drains:
+                drain.result()
+
+        self.metrics.update(backlog())
+        self.metrics["runs"] += 1
+        self.metrics["last_run_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self.metrics["last_run_at"] = datetime.now(timezone.utc).isoformat()
+
+        executed = self.metrics["executed"] - executed_before
+        if executed:
+            logger.info(f"Scheduled transfers: {executed} executed in {self.metrics['last_run_ms']}ms "
+                        f"(batch p95 {self.metrics['batch_p95_ms']}ms, backlog {self.metrics['backlog']})")
+        return self.metrics
+
+    async def run_forever(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                self.metrics["last_error"] = str(e)
+                logger.error(f"Scheduled transfer run failed: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever())
+            logger.info(f"Scheduled transfer executor started (every {self.interval_seconds}s, {self.workers} workers)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Scheduled transfer executor stopped")
+
+
+scheduled_transfer_executor = ScheduledTransferExecutor()
@@ -0,0 +1,70 @@
+"""
+Single-flight coalescing of identical concurrent reads within a worker.
+
+The first caller for a key starts the call as its own task (the leader).
+Callers arriving while it runs await that same task instead of starting
+another, so N concurrent balance polls for one wallet cost one query.
+The result, or the exception, fans out to every waiter.
+
+- Nothing is cached: a call arriving after the task finished starts a
+  new one. A coalesced result is as old as the moment its task started.
+- Every caller waits at most SINGLE_FLIGHT_TIMEOUT_SECONDS and then gets
+  SingleFlightTimeout. The task itself keeps running for the others.
+  Tasks older than the timeout are not joined, so a stuck query doesn't
+  hold every later caller too.
+- The task is shared, not owned: a leader whose client disconnects
+  doesn't cancel it under the waiters.
+
+Counters (leaders, coalesced, timeouts, errors, in_flight) appear under
+`single_flight` in GET /admin/metrics.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightTimeout(Exception):
+    """A coalesced call did not finish within the timeout"""
+
+
+class SingleFlight:
+    def __init__(self, timeout: float = settings.SINGLE_FLIGHT_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        # Only touched from the event loop, so no lock
+        self._flights: Dict[Hashable, Tuple[float, asyncio.Task]] = {}
+        self.metrics = {"leaders": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of `call()`, shared with every concurrent caller of the same key"""
+        flight = self._flights.get(key)
+        if flight is not None and time.monotonic() - flight[0] < self.timeout:
+            self.metrics["coalesced"] += 1
+            task = flight[1]
+        else:
+            self.metrics["leaders"] += 1
+            task = asyncio.ensure_future(call())
+            self._flights[key] = (time.monotonic(), task)
+            task.add_done_callback(lambda done: self._land(key, done))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            raise SingleFlightTimeout(f"{key!r} did not finish within {self.timeout}s")
+
+    def _land(self, key: Hashable, task: asyncio.Task):
+        # A newer flight may have replaced a stale one under this key
+        if self._flights.get(key, (None, None))[1] is task:
+            del self._flights[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.metrics["errors"] += 1
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), **self.metrics}
+
+
+single_flight = SingleFlight()
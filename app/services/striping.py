@@ -0,0 +1,200 @@
+"""
+Striped balances for hot wallets.
+
+Every credit to a wallet updates its wallets row, so a merchant receiving
+hundreds of transfers a second has them all queue on that one row lock.
+A striped wallet (opt-in, PUT /admin/wallets/{wallet_number}/stripes)
+also has N wallet_stripes rows, and its balance is wallets.balance plus
+the stripes:
+
+- credits land on a random stripe; the stripe count is cached per worker
+  for WALLET_STRIPE_CACHE_SECONDS, and a stale count only means a credit
+  falls back to the wallets row
+- debits take from the wallets row, then from any single stripe that
+  covers them, and otherwise sweep every stripe into the wallets row
+  first; no row is ever taken below zero
+- reads sum the stripes in the same query (WALLET_BALANCE)
+
+The consolidate_wallet_stripes maintenance job sweeps the stripes back
+into the wallets row, so debits rarely need a fallback. Locks are always
+taken wallet rows first, in id order (lock_wallets), then stripes.
+
+Every write that moves money also bumps the version of the row it hits,
+and touch() bumps it for history changes that move none. A wallet's
+version (WALLET_VERSION) is wallets.version plus its stripes' versions,
+so it only ever grows; consolidation moves no money and leaves it alone.
+"""
+import random
+import threading
+import time
+import uuid
+from typing import Dict, Iterable
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.wallet import Wallet, WalletStripe
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A wallet's full balance, for selects over wallets
+WALLET_BALANCE = (Wallet.balance + func.coalesce(
+    select(func.sum(WalletStripe.balance)).where(WalletStripe.wallet_id == Wallet.id).scalar_subquery(), 0.0
+)).label("balance")
+
+# Grows with every change to the wallet's balance or history
+WALLET_VERSION = (Wallet.version + func.coalesce(
+    select(func.sum(WalletStripe.version)).where(WalletStripe.wallet_id == Wallet.id).scalar_subquery(), 0
+)).label("version")
+
+
+class StripeDirectory:
+    """Stripe count of every striped wallet, per shard, reloaded every cache_seconds"""
+
+    def __init__(self, cache_seconds: int = settings.WALLET_STRIPE_CACHE_SECONDS):
+        self.cache_seconds = cache_seconds
+        self._by_shard: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def count(self, db: Session, wallet_id) -> int:
+        shard = db.info.get("shard", 0)
+        entry = self._by_shard.get(shard)
+        if entry is None or entry[0] <= time.monotonic():
+            counts = {
+                str(row[0]): row[1]
+                for row in db.execute(select(WalletStripe.wallet_id, func.count()).group_by(WalletStripe.wallet_id))
+            }
+            entry = (time.monotonic() + self.cache_seconds, counts)
+            with self._lock:
+                self._by_shard[shard] = entry
+        return entry[1].get(str(wallet_id), 0)
+
+    def forget(self, shard: int):
+        with self._lock:
+            self._by_shard.pop(shard, None)
+
+
+striped_wallets = StripeDirectory()
+
+
+def credit(db: Session, wallet_id, amount: float) -> bool:
+    """Add `amount` to the wallet; False when it is not on this shard"""
+    stripes = striped_wallets.count(db, wallet_id)
+    if stripes:
+        credited = db.execute(update(WalletStripe).where(
+            WalletStripe.wallet_id == wallet_id,
+            WalletStripe.stripe == random.randrange(stripes)
+        ).values(balance=WalletStripe.balance + amount, version=WalletStripe.version + 1)).rowcount
+        if credited:
+            return True
+    return db.execute(
+        update(Wallet).where(Wallet.id == wallet_id).values(balance=Wallet.balance + amount, version=Wallet.version + 1)
+    ).rowcount > 0
+
+
+def _take(db: Session, model, condition, amount: float) -> bool:
+    return db.execute(
+        update(model).where(condition, model.balance >= amount).values(
+            balance=model.balance - amount, version=model.version + 1
+        )
+    ).rowcount > 0
+
+
+def debit(db: Session, wallet_id, amount: float) -> bool:
+    """Take `amount` from the wallet; False when its whole balance doesn't cover it"""
+    if _take(db, Wallet, Wallet.id == wallet_id, amount):
+        return True
+
+    stripes = [row.stripe for row in db.execute(
+        select(WalletStripe.stripe).where(WalletStripe.wallet_id == wallet_id, WalletStripe.balance >= amount)
+    )]
+    random.shuffle(stripes)
+    for stripe in stripes:
+        # Re-checked in the UPDATE: a concurrent debit may have drained it
+        if _take(db, WalletStripe, (WalletStripe.wallet_id == wallet_id) & (WalletStripe.stripe == stripe), amount):
+            return True
+
+    # Spread over several rows: gather them into the wallet row and retry
+    if consolidate(db, wallet_id):
+        return _take(db, Wallet, Wallet.id == wallet_id, amount)
+    return False
+
+
+def take_stripes(db: Session, wallet_ids: Iterable) -> Dict[uuid.UUID, float]:
+    """
+    Zero the stripes of these wallets and return what each held. The caller
+    adds it to wallets.balance, and must already hold the wallet rows.
+    """
+    wallet_ids = list(wallet_ids)
+    if not wallet_ids:
+        return {}
+
+    # Lock every stripe, not just the funded ones, so none is credited in between
+    rows = db.execute(select(WalletStripe.wallet_id, WalletStripe.balance).where(
+        WalletStripe.wallet_id.in_(wallet_ids)
+    ).order_by(WalletStripe.wallet_id, WalletStripe.stripe).with_for_update()).all()
+
+    taken: Dict[uuid.UUID, float] = {}
+    for wallet_id, balance in rows:
+        if balance:
+            taken[wallet_id] = taken.get(wallet_id, 0.0) + balance
+    if taken:
+        db.execute(update(WalletStripe).where(WalletStripe.wallet_id.in_(list(taken))).values(balance=0.0))
+    return taken
+
+
+def consolidate(db: Session, wallet_id) -> float:
+    """Sweep the wallet's stripes into its wallets row; returns the amount moved"""
+    # FOR NO KEY UPDATE: inserts referencing the wallet (postings) don't wait on it
+    db.execute(select(Wallet.id).where(Wallet.id == wallet_id).with_for_update(key_share=True))
+    amount = take_stripes(db, [wallet_id]).get(wallet_id, 0.0)
+    if amount:
+        db.execute(update(Wallet).where(Wallet.id == wallet_id).values(balance=Wallet.balance + amount))
+    return amount
+
+
+def lock_wallets(db: Session, wallet_ids: Iterable) -> list:
+    """
+    Lock wallet rows in id order (FOR NO KEY UPDATE), so transactions that
+    write several wallets, e.g. reciprocal transfers, can't deadlock.
+    Returns the ids found.
+    """
+    return db.execute(
+        select(Wallet.id).where(Wallet.id.in_(list(wallet_ids))).order_by(Wallet.id).with_for_update(key_share=True)
+    ).scalars().all()
+
+
+def touch(db: Session, wallet_ids: Iterable):
+    """Bump the version of wallets whose history changed without moving money"""
+    wallet_ids = lock_wallets(db, wallet_ids)
+    if wallet_ids:
+        db.execute(update(Wallet).where(Wallet.id.in_(wallet_ids)).values(version=Wallet.version + 1))
+
+
+def set_stripes(db: Session, wallet_id, stripes: int):
+    """Stripe a wallet N ways (0 unstripes it); its balance is consolidated first"""
+    consolidate(db, wallet_id)
+    # The removed stripes' versions move to the wallet row, so WALLET_VERSION never goes back
+    removed = db.execute(select(func.coalesce(func.sum(WalletStripe.version), 0)).where(
+        WalletStripe.wallet_id == wallet_id, WalletStripe.stripe >= stripes
+    )).scalar()
+    if removed:
+        db.execute(update(Wallet).where(Wallet.id == wallet_id).values(version=Wallet.version + removed))
+    db.execute(delete(WalletStripe).where(WalletStripe.wallet_id == wallet_id, WalletStripe.stripe >= stripes))
+    existing = set(db.execute(select(WalletStripe.stripe).where(WalletStripe.wallet_id == wallet_id)).scalars())
+    db.add_all(
+        WalletStripe(wallet_id=wallet_id, stripe=stripe, balance=0.0)
+        for stripe in range(stripes) if stripe not in existing
+    )
+    striped_wallets.forget(db.info.get("shard", 0))
+
+
+def consolidate_wallet_stripes(db: Session) -> int:
+    """Maintenance job: sweep every funded stripe into its wallet, one wallet per DB transaction"""
+    wallet_ids = db.execute(select(WalletStripe.wallet_id).where(WalletStripe.balance != 0).distinct()).scalars().all()
+    db.commit()
+
+    for wallet_id in wallet_ids:
+        consolidate(db, wallet_id)
+        db.commit()
+    return len(wallet_ids)
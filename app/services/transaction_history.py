@@ -0,0 +1,175 @@
+"""
+Filtered, keyset-paginated transaction history.
+
+A user's history is their wallet's postings, each joined to its journal
+entry for the status, reference and description. Every filter is pushed
+into SQL and backed by an index:
+
+  wallet_id + created_at (+ id)           postings primary key
+  type                                    ix_postings_wallet_type_created
+  amount range                            ix_postings_wallet_amount (signed amounts)
+  reference prefix                        ix_transactions_reference_prefix (text_pattern_ops)
+  counterparty wallet, provider fields    ix_transactions_data (GIN jsonb_path_ops)
+
+Date ranges are applied while walking the wallet's postings, newest first,
+and status or channel checked against each posting's entry as it is read;
+a narrow amount range is cheaper to fetch by amount and sort. A reference
+prefix or counterparty starts from the entries that match instead. Both tables
+are partitioned by month on created_at, so date filters and cursors also
+limit which partitions are read, and an unfiltered first page stops at the
+newest partition that fills it. Paging is opt-in: without a limit the whole
+history is returned. Pages continue from an opaque (created_at, id) cursor
+instead of OFFSET, so deep pages cost the same as the first.
+
+A transfer's entry is shared by both parties, so each row also carries the
+posting's direction (credit or debit for this wallet), and its description
+is derived per side ("Transfer to/from <wallet number>") unless the entry
+has its own.
+"""
+import base64
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, case, func, literal, or_, select, true, tuple_
+from sqlalchemy.orm import Session
+from app.models.transactions import Posting, Transaction, TransactionStatus, TransactionType
+from app.models.wallet import Wallet
+from app.services.reconciliation import POSTED
+
+POSTING_COLUMNS = (
+    Posting.transaction_id.label("id"),
+    Posting.transaction_type,
+    func.abs(Posting.amount).label("amount"),
+    case((Posting.amount < 0, literal("debit")), else_=literal("credit")).label("direction"),
+    Posting.created_at,
+)
+
+# Read from the entry; the description depends on which side the posting is
+ENTRY_COLUMNS = (
+    Transaction.status,
+    Transaction.reference,
+    case(
+        (Posting.transaction_type != TransactionType.TRANSFER, Transaction.description),
+        (Posting.amount < 0, func.coalesce(
+            Transaction.description,
+            literal("Transfer to ") + Transaction.transaction_data["recipient_wallet"].as_string()
+        )),
+        else_=func.coalesce(
+            literal("Transfer from ") + Transaction.transaction_data["sender_wallet"].as_string(),
+            Transaction.description
+        ),
+    ).label("description"),
+)
+
+
+@dataclass
+class TransactionFilters:
+    reference_prefix: Optional[str] = None
+    transaction_type: Optional[TransactionType] = None
+    status: Optional[TransactionStatus] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    counterparty: Optional[str] = None
+    channel: Optional[str] = None
+
+
+def encode_cursor(created_at: datetime, transaction_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{transaction_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Raises ValueError on anything that is not a cursor we issued"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, transaction_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(transaction_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _amount_range(min_amount: Optional[float], max_amount: Optional[float]):
+    """Match |amount| in [min, max] against the signed posting amount, as index ranges"""
+    if min_amount is not None and max_amount is not None:
+        return or_(Posting.amount.between(min_amount, max_amount), Posting.amount.between(-max_amount, -min_amount))
+    if min_amount is not None:
+        return or_(Posting.amount >= min_amount, Posting.amount <= -min_amount)
+    return Posting.amount.between(-max_amount, max_amount)
+
+
+def _data_has(key: str, value: str, postgres: bool):
+    """transaction_data[key] == value; as jsonb containment on Postgres, so the GIN index answers it"""
+    if postgres:
+        return Transaction.transaction_data.contains({key: value})
+    return Transaction.transaction_data[key].as_string() == value
+
+
+def history_query(wallet_id, filters: TransactionFilters, limit: Optional[int], after: Optional[str] = None, postgres: bool = False):
+    """
+    SELECT for one page of a wallet's history, newest first. With `postgres`
+    each posting fetches its entry through a LATERAL subquery, instead of a
+    join, unless a reference prefix or counterparty is given, and JSON
+    filters use jsonb containment; elsewhere they compare extracted values.
+    """
+    conditions = [Posting.wallet_id == wallet_id]
+    entry_conditions = []
+
+    if filters.reference_prefix:
+        entry_conditions.append(Transaction.reference.startswith(filters.reference_prefix, autoescape=True))
+    if filters.transaction_type:
+        conditions.append(Posting.transaction_type == filters.transaction_type)
+    if filters.status:
+        entry_conditions.append(Transaction.status == filters.status)
+    if filters.min_amount is not None or filters.max_amount is not None:
+        conditions.append(_amount_range(filters.min_amount, filters.max_amount))
+    if filters.start_date:
+        conditions.append(Posting.created_at >= filters.start_date)
+    if filters.end_date:
+        conditions.append(Posting.created_at < filters.end_date)
+    if filters.counterparty:
+        sent_to = _data_has("recipient_wallet", filters.counterparty, postgres)
+        received_from = _data_has("sender_wallet", filters.counterparty, postgres)
+        # The first OR is the one the GIN index can answer; the second picks the side
+        entry_conditions.extend([
+            or_(sent_to, received_from),
+            or_(and_(Posting.amount < 0, sent_to), and_(Posting.amount >= 0, received_from)),
+        ])
+    if filters.channel:
+        entry_conditions.append(_data_has("channel", filters.channel, postgres))
+    if after:
+        created_at, transaction_id = decode_cursor(after)
+        # The plain bound is what lets Postgres skip partitions newer than the cursor
+        conditions.extend([
+            Posting.created_at <= created_at,
+            tuple_(Posting.created_at, Posting.transaction_id) < (created_at, transaction_id),
+        ])
+
+    # A reference prefix or counterparty matches few entries, found faster from
+    # their own indexes than by probing the wallet's postings one at a time
+    if postgres and not (filters.reference_prefix or filters.counterparty):
+        # Joined on (id, created_at), Postgres multiplies the two selectivities,
+        # expects almost no rows and sorts the wallet's whole history. Probed per
+        # posting instead, the page is read in index order and stops at `limit`;
+        # LIMIT 1 keeps the subquery from being flattened back into a join.
+        entry = select(*ENTRY_COLUMNS).where(POSTED, *entry_conditions).limit(1).lateral("entry")
+        query = select(*POSTING_COLUMNS, *entry.c).select_from(Posting).join(entry, true())
+    else:
+        query = select(*POSTING_COLUMNS, *ENTRY_COLUMNS).select_from(Posting).join(Transaction, POSTED)
+        conditions.extend(entry_conditions)
+
+    return query.where(*conditions).order_by(Posting.created_at.desc(), Posting.transaction_id.desc()).limit(limit)
+
+
+def read_history(db: Session, user_id, filters: TransactionFilters, limit: Optional[int], after: Optional[str] = None) -> Tuple[List, Optional[str]]:
+    """(rows, next_cursor); next_cursor is None on the last page, and always without a limit"""
+    # Looked up first rather than as a subquery: with the wallet id as a constant
+    # the planner sees how many postings this wallet has (a few heavy wallets own most)
+    wallet_id = db.execute(select(Wallet.id).where(Wallet.user_id == user_id)).scalar()
+    if wallet_id is None:
+        return [], None
+    bind = db.get_bind() if isinstance(db, Session) else db
+    rows = db.execute(history_query(wallet_id, filters, limit, after, postgres=bind.dialect.name == "postgresql")).all()
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if limit and len(rows) == limit else None
+    return rows, next_cursor
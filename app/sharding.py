@@ -0,0 +1,278 @@
+"""
+Shard routing for wallets and transactions.
+
+Shard 0 is the primary database (DATABASE_URL). It keeps the global tables:
+users, api_keys and the `user_shards` directory. SHARD_URLS adds shards
+1..N-1. Every shard holds the wallets and transactions of its users plus a
+copy of their `users` row, so foreign keys stay local to the shard.
+
+With no SHARD_URLS there is a single shard and no directory lookups happen.
+"""
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+from app.database import engine, replica_router, CONSISTENCY_TOKEN_HEADER
+from app.auth.jwt_auth import get_current_user_or_api_key
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.models.transactions import Transaction, TransactionReference, TransactionStatus, TransactionType
+from app.models.shard import UserShard, CrossShardTransfer
+from app.services.journal import add_entry, transfer_data
+from app.services.striping import credit
+from app.services.event_hub import publish_transaction, transaction_event
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _as_uuid(value) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+class ShardRouter:
+    """Map users and wallet numbers to shard engines"""
+
+    def __init__(self, shard_urls: str = settings.SHARD_URLS, cache_seconds: int = settings.SHARD_DIRECTORY_CACHE_SECONDS):
+        self.engines = [engine] + [
+            create_engine(url.strip()) for url in shard_urls.split(",") if url.strip()
+        ]
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=shard_engine, info={"shard": i})
+            for i, shard_engine in enumerate(self.engines)
+        ]
+        self.cache_seconds = cache_seconds
+        self._by_user = {}
+        self._by_wallet = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.engines)
+
+    def placement(self, user_id) -> int:
+        """Shard for a brand new user"""
+        return zlib.crc32(_as_uuid(user_id).bytes) % self.shard_count
+
+    def session(self, shard: int, read_only: bool = False, token: Optional[str] = None) -> Session:
+        if shard == 0 and read_only:
+            return self.sessionmakers[0](bind=replica_router.pick(token))
+        return self.sessionmakers[shard]()
+
+    def _cached(self, cache: dict, key) -> Optional[tuple]:
+        entry = cache.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def _remember(self, shard: int, state: str, user_id, wallet_number: Optional[str]) -> tuple:
+        value = (shard, state, user_id, wallet_number)
+        entry = (value, time.monotonic() + self.cache_seconds)
+        with self._lock:
+            if len(self._by_user) > 100_000:
+                self._by_user.clear()
+                self._by_wallet.clear()
+            self._by_user[user_id] = entry
+            if wallet_number:
+                self._by_wallet[wallet_number] = entry
+        return value
+
+    def forget(self, user_id, wallet_number: Optional[str] = None):
+        with self._lock:
+            self._by_user.pop(_as_uuid(user_id), None)
+            if wallet_number:
+                self._by_wallet.pop(wallet_number, None)
+
+    def _lookup(self, **criteria) -> Optional[tuple]:
+        db = self.sessionmakers[0]()
+        try:
+            row = db.query(UserShard).filter_by(**criteria).first()
+            if not row:
+                return None
+            return self._remember(row.shard, row.state, row.user_id, row.wallet_number)
+        finally:
+            db.close()
+
+    def shard_for_user(self, user_id, for_write: bool = False) -> int:
+        if self.shard_count == 1:
+            return 0
+
+        user_id = _as_uuid(user_id)
+        cached = self._cached(self._by_user, user_id) or self._lookup(user_id=user_id)
+        if cached is None:
+            # Users that predate sharding have no directory row and live on shard 0
+            cached = self._remember(0, "active", user_id, None)
+
+        shard, state = cached[0], cached[1]
+        if for_write and state == "moving":
+            raise HTTPException(status_code=503, detail="Wallet is being migrated, retry shortly")
+        return shard
+
+    def locate_wallet(self, wallet_number: str) -> Tuple[int, Optional[uuid.UUID], str]:
+        """(shard, user_id, state) for a wallet number; user_id is None when unknown"""
+        if self.shard_count == 1:
+            return 0, None, "active"
+
+        cached = self._cached(self._by_wallet, wallet_number) or self._lookup(wallet_number=wallet_number)
+        if cached is None:
+            return 0, None, "active"
+        return cached[0], cached[2], cached[1]
+
+
+shard_router = ShardRouter()
+
+
+def shard_for_reference(reference: str, user_id=None) -> int:
+    """Find the shard holding a transaction, using the owner when it is known"""
+    if shard_router.shard_count == 1:
+        return 0
+    if user_id:
+        return shard_router.shard_for_user(user_id)
+
+    for shard in range(shard_router.shard_count):
+        db = shard_router.session(shard)
+        try:
+            if db.get(TransactionReference, reference) is not None:
+                return shard
+        finally:
+            db.close()
+    return 0
+
+
+def get_wallet_db(auth: tuple = Depends(get_current_user_or_api_key)):
+    """Session on the shard holding the authenticated user's wallet"""
+    user_id, _ = auth
+    db = shard_router.session(shard_router.shard_for_user(user_id, for_write=True))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_wallet_read_db(
+    auth: tuple = Depends(get_current_user_or_api_key),
+    x_consistency_token: Optional[str] = Header(None, alias=CONSISTENCY_TOKEN_HEADER)
+):
+    """Read-only session for the user's shard (replica-routed on shard 0)"""
+    user_id, _ = auth
+    db = shard_router.session(shard_router.shard_for_user(user_id), read_only=True, token=x_consistency_token)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def provision_wallet(db: Session, user: User) -> Wallet:
+    """
+    Create the wallet for a freshly committed user on its shard. `db` is a
+    shard 0 session; the directory row is only written when sharding is on.
+    """
+    wallet_number = str(uuid.uuid4().int)[:13]
+
+    if shard_router.shard_count == 1:
+        wallet = Wallet(user_id=user.id, wallet_number=wallet_number)
+        db.add(wallet)
+        db.commit()
+        return wallet
+
+    shard = shard_router.placement(user.id)
+    db.add(UserShard(user_id=user.id, wallet_number=wallet_number, shard=shard))
+
+    if shard == 0:
+        wallet = Wallet(user_id=user.id, wallet_number=wallet_number)
+        db.add(wallet)
+        db.commit()
+        return wallet
+
+    db.commit()
+    shard_db = shard_router.session(shard)
+    try:
+        shard_db.merge(User(id=user.id, email=user.email, name=user.name, google_id=user.google_id))
+        wallet = Wallet(user_id=user.id, wallet_number=wallet_number)
+        shard_db.add(wallet)
+        shard_db.commit()
+        shard_db.refresh(wallet)
+        shard_db.expunge(wallet)
+        return wallet
+    finally:
+        shard_db.close()
+
+
+def deliver_cross_shard_transfer(source_shard: int, transfer_id) -> bool:
+    """
+    Credit the recipient side of a cross-shard transfer. Safe to call more
+    than once: the recipient shard's half of the entry reuses the outbox
+    reference, which is also the sender's.
+    """
+    src = shard_router.session(source_shard)
+    try:
+        outbox = src.query(CrossShardTransfer).filter(
+            CrossShardTransfer.id == transfer_id,
+            CrossShardTransfer.status == "pending"
+        ).with_for_update(skip_locked=True).first()
+
+        if not outbox:
+            return False
+
+        target_shard, _, state = shard_router.locate_wallet(outbox.recipient_wallet_number)
+        if state == "moving":
+            return False
+
+        dst = shard_router.session(target_shard)
+        try:
+            # A racing delivery that got past this fails on the reference's primary key
+            already = dst.get(TransactionReference, outbox.reference)
+            if not already:
+                wallet = dst.query(Wallet).filter(
+                    Wallet.wallet_number == outbox.recipient_wallet_number
+                ).first()
+                if not wallet:
+                    raise Exception(f"Recipient wallet {outbox.recipient_wallet_number} not on shard {target_shard}")
+
+                credit(dst, wallet.id, outbox.amount)
+                entry = add_entry(dst, Transaction(
+                    user_id=wallet.user_id,
+                    wallet_id=wallet.id,
+                    recipient_wallet_id=wallet.id,
+                    amount=outbox.amount,
+                    transaction_type=TransactionType.TRANSFER,
+                    status=TransactionStatus.SUCCESS,
+                    reference=outbox.reference,
+                    transaction_data=transfer_data(outbox.sender_wallet_number, outbox.recipient_wallet_number)
+                ), [(wallet.id, wallet.user_id, outbox.amount)])
+                event, user_id = transaction_event(entry), wallet.user_id
+                dst.commit()
+                publish_transaction(event, [user_id])
+        except Exception as e:
+            dst.rollback()
+            outbox.attempts += 1
+            outbox.last_error = str(e)
+            src.commit()
+            logger.error(f"Cross-shard transfer {outbox.reference} delivery failed: {str(e)}")
+            return False
+        finally:
+            dst.close()
+
+        outbox.status = "delivered"
+        outbox.delivered_at = datetime.now(timezone.utc)
+        src.commit()
+        return True
+    finally:
+        src.close()
+
+
+def relay_cross_shard_transfers(db: Session, batch_size: int = settings.MAINTENANCE_BATCH_SIZE) -> int:
+    """Maintenance job: retry undelivered cross-shard transfers on this shard"""
+    source_shard = db.info.get("shard", 0)
+    pending = [row.id for row in db.query(CrossShardTransfer.id).filter(
+        CrossShardTransfer.status == "pending"
+    ).order_by(CrossShardTransfer.created_at).limit(batch_size)]
+    db.commit()
+
+    return sum(1 for transfer_id in pending if deliver_cross_shard_transfer(source_shard, transfer_id))
@@ -0,0 +1,151 @@
+"""
+SQL statement instrumentation.
+
+install() registers cursor-execute hooks on every Engine: primary,
+replicas and shards. The hooks do three things:
+
+  - attribute each statement and its time to the current request, via
+    QueryStatsMiddleware and a context variable;
+  - log statements slower than SQL_SLOW_QUERY_MS, with their EXPLAIN plan
+    when SQL_EXPLAIN_SLOW_QUERIES is set;
+  - spot N+1 patterns: the same statement shape repeated
+    SQL_N_PLUS_ONE_THRESHOLD times in one request. SQL_N_PLUS_ONE_MODE
+    "warn" logs it, "raise" fails the request (dev/test).
+
+With SQL_DEBUG_HEADERS each response carries X-DB-Query-Count and
+X-DB-Query-Time-Ms.
+"""
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+
+class NPlusOneError(Exception):
+    """Raised in `raise` mode when a request repeats one statement shape too often"""
+
+
+class QueryStats:
+    """Statements issued on behalf of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter = Counter()
+        self.flagged = set()
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("sql_query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+def statement_shape(statement: str) -> str:
+    """Statement text with whitespace and expanded IN lists collapsed"""
+    return _IN_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _explain(conn, statement: str, parameters) -> Optional[str]:
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    try:
+        # Raw DBAPI cursor so the EXPLAIN itself is not instrumented
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f"EXPLAIN failed: {str(e)}"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is not None and settings.SQL_N_PLUS_ONE_MODE != "off":
+        shape = statement_shape(statement)
+        stats.shapes[shape] += 1
+        if stats.shapes[shape] == settings.SQL_N_PLUS_ONE_THRESHOLD and shape not in stats.flagged:
+            stats.flagged.add(shape)
+            message = f"Possible N+1: statement repeated {settings.SQL_N_PLUS_ONE_THRESHOLD}x in one request: {shape[:500]}"
+            if settings.SQL_N_PLUS_ONE_MODE == "raise":
+                raise NPlusOneError(message)
+            logger.warning(message)
+
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+
+    if settings.SQL_SLOW_QUERY_MS and elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        plan = _explain(conn, statement, parameters) if settings.SQL_EXPLAIN_SLOW_QUERIES and not executemany else None
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms) on {conn.engine.url.render_as_string(hide_password=True)}: "
+            f"{statement_shape(statement)[:1000]}" + (f"\nPlan:\n{plan}" if plan else "")
+        )
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    start_times = exception_context.connection.info.get("query_start_time") if exception_context.connection else None
+    if start_times:
+        start_times.pop()
+
+
+def install():
+    """Register the hooks on all engines (idempotent)"""
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware binding a QueryStats to each HTTP request"""
+
+    def __init__(self, app, debug_headers: bool = settings.SQL_DEBUG_HEADERS):
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_counts(message):
+            if message["type"] == "http.response.start" and self.debug_headers:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-query-time-ms", f"{stats.duration * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_counts)
+        finally:
+            _current_stats.reset(token)
+            logger.debug(f"{scope['method']} {scope['path']}: {stats.count} queries in {stats.duration * 1000:.2f} ms")
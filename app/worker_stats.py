@@ -0,0 +1,53 @@
+"""
+Per-worker counters in shared memory, written by the workers of
+app/server.py and readable from any of them.
+
+The master allocates one slot per worker before forking; each worker only
+writes its own slot, so no locking is needed.
+"""
+import ctypes
+import time
+from multiprocessing.sharedctypes import RawArray
+from typing import List, Optional
+
+
+class WorkerSlot(ctypes.Structure):
+    _fields_ = [
+        ("pid", ctypes.c_int),
+        ("generation", ctypes.c_int),
+        ("started_at", ctypes.c_double),
+        ("updated_at", ctypes.c_double),
+        ("requests", ctypes.c_long),
+        ("max_requests", ctypes.c_long),
+        ("connections", ctypes.c_int),
+    ]
+
+
+slots = None
+
+
+def allocate(workers: int):
+    global slots
+    slots = RawArray(WorkerSlot, workers)
+    return slots
+
+
+def worker_stats() -> Optional[List[dict]]:
+    """One entry per running worker; None when not served by app.server"""
+    if slots is None:
+        return None
+
+    now = time.time()
+    return [
+        {
+            "worker": index,
+            "pid": slot.pid,
+            "restarts": max(slot.generation - 1, 0),
+            "uptime_seconds": round(now - slot.started_at, 1),
+            "requests": slot.requests,
+            "max_requests": slot.max_requests or None,
+            "connections": slot.connections,
+            "reported_seconds_ago": round(now - slot.updated_at, 1),
+        }
+        for index, slot in enumerate(slots) if slot.pid
+    ]
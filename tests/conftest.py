@@ -0,0 +1,189 @@
+"""
+Shared test setup.
+
+Settings are read when app.config is imported, so the required ones get
+throwaway values here first. DATABASE_URL always points at a test
+database: TEST_DATABASE_URL when set, else a SQLite file in the temp
+directory. Tests that need Postgres are skipped without TEST_DATABASE_URL:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/walletflow_test python -m pytest -q
+
+The database named there is written to; use a throwaway one. Tests that
+need more databases (e.g. replica stand-ins) create them on the same
+server and drop them afterwards.
+"""
+import os
+import tempfile
+import uuid
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+SQLITE_PATH = os.path.join(tempfile.gettempdir(), "walletflow_test.db")
+if not TEST_DATABASE_URL and os.path.exists(SQLITE_PATH):
+    os.remove(SQLITE_PATH)
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or f"sqlite:///{SQLITE_PATH}"
+for name, value in {
+    "JWT_SECRET_KEY": "test-secret",
+    "JWT_ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "GOOGLE_CLIENT_ID": "test-client-id",
+    "GOOGLE_CLIENT_SECRET": "test-client-secret",
+    "GOOGLE_REDIRECT_URI": "http://testserver/auth/google/callback",
+    "PAYSTACK_SECRET_KEY": "sk_test_paystack",
+    "PAYSTACK_PUBLIC_KEY": "pk_test_paystack",
+    "PAYSTACK_INITIALIZE_URL": "http://127.0.0.1:9/transaction/initialize",
+    "PAYSTACK_VERIFY_URL": "http://127.0.0.1:9/transaction/verify",
+    "API_KEY_PREFIX": "sk_test_",
+    "MAX_API_KEYS_PER_USER": "5",
+    "MAINTENANCE_ENABLED": "false",
+    "SCHEDULED_TRANSFERS_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+
+@pytest.fixture(scope="session")
+def postgres_url() -> str:
+    if not TEST_DATABASE_URL or not TEST_DATABASE_URL.startswith("postgresql"):
+        pytest.skip("TEST_DATABASE_URL is not a Postgres database")
+    return TEST_DATABASE_URL
+
+
+@pytest.fixture(scope="session")
+def db_engine():
+    """The app's own engine, with every table and this month's partitions"""
+    from app.main import init_db
+    from app.database import engine
+    init_db()
+    return engine
+
+
+@pytest.fixture
+def db(db_engine):
+    from app.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def make_database(postgres_url):
+    """Create empty databases on the test server; returns their URLs. Dropped afterwards"""
+    url = make_url(postgres_url)
+    admin = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    created = []
+
+    def make() -> str:
+        name = f"{url.database}_{uuid.uuid4().hex[:8]}"
+        with admin.connect() as conn:
+            conn.execute(text(f'CREATE DATABASE "{name}"'))
+        created.append(name)
+        return url.set(database=name).render_as_string(hide_password=False)
+
+    yield make
+    with admin.connect() as conn:
+        for name in created:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+    admin.dispose()
+
+
+@pytest.fixture
+def make_wallet(db):
+    """A new user with a wallet holding `balance`; returns the Wallet"""
+    from app.models import User, Wallet
+    from app.sharding import provision_wallet
+
+    def make(balance: float = 0.0) -> Wallet:
+        user = User(email=f"test_{uuid.uuid4().hex[:12]}@example.com")
+        db.add(user)
+        db.commit()
+        wallet = provision_wallet(db, user)
+        wallet.balance = balance
+        db.commit()
+        return wallet
+
+    return make
+
+
+@pytest.fixture
+def shards(db_engine, tmp_path, monkeypatch):
+    """Turn sharding on: shard 0 is the test database, shard 1 a SQLite file. Returns shard_router"""
+    from app.config import settings
+    from app.main import init_db
+    from app.sharding import ShardRouter, shard_router
+
+    monkeypatch.setattr(settings, "SHARD_URLS", f"sqlite:///{tmp_path / 'shard1.db'}")
+    sharded = ShardRouter(settings.SHARD_URLS)
+    for name, value in vars(sharded).items():
+        monkeypatch.setattr(shard_router, name, value)
+    init_db()
+    yield shard_router
+    sharded.engines[1].dispose()
+
+
+@pytest.fixture
+def make_sharded_wallet(shards):
+    """A new user placed on `shard`, with a wallet holding `balance`; returns the detached Wallet"""
+    from app.database import SessionLocal
+    from app.models import User, Wallet
+    from app.sharding import provision_wallet
+
+    def make(shard: int, balance: float = 0.0) -> Wallet:
+        user_id = uuid.uuid4()
+        while shards.placement(user_id) != shard:
+            user_id = uuid.uuid4()
+        db = SessionLocal()
+        try:
+            user = User(id=user_id, email=f"test_{user_id.hex[:12]}@example.com")
+            db.add(user)
+            db.commit()
+            wallet_number = provision_wallet(db, user).wallet_number
+        finally:
+            db.close()
+
+        shard_db = shards.session(shard)
+        try:
+            wallet = shard_db.query(Wallet).filter(Wallet.wallet_number == wallet_number).one()
+            wallet.balance = balance
+            shard_db.commit()
+            shard_db.refresh(wallet)
+            shard_db.expunge(wallet)
+            return wallet
+        finally:
+            shard_db.close()
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def client(db_engine):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+
+@pytest.fixture
+def login(client):
+    """Authenticate the client's requests as a wallet's owner, with every permission"""
+    from app.auth.jwt_auth import get_current_user_or_api_key
+    from app.auth.permissions import Permission
+    from app.main import app
+
+    def login_as(wallet):
+        app.dependency_overrides[get_current_user_or_api_key] = lambda: (wallet.user_id, Permission.ALL)
+
+    yield login_as
+    app.dependency_overrides.pop(get_current_user_or_api_key, None)
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    """Headers for the admin routes, with ADMIN_API_KEY set for the test"""
+    from app.config import settings
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "test-admin-key")
+    return {"x-admin-key": "test-admin-key"}
@@ -0,0 +1,75 @@
+import uuid
+from datetime import datetime, timezone
+import app.services.api_key_usage
+from app.auth.api_key_auth import create_api_key, hash_api_key, list_user_api_keys
+from app.models.api_key import APIKey, APIKeyUsage
+from app.services.api_key_usage import UsageTracker, usage_tracker
+from app.services.scheduled_transfers import _aware
+
+
+def _counts(db, api_key_id) -> dict:
+    db.expire_all()
+    return {
+        row.endpoint: row.request_count
+        for row in db.query(APIKeyUsage).filter(APIKeyUsage.api_key_id == api_key_id)
+    }
+
+
+def test_requests_are_counted_once_flushed(db, client, make_wallet):
+    wallet = make_wallet()
+    key = create_api_key(db, wallet.user_id, "usage", ["read"], "1D")["api_key"]
+    api_key_id = db.query(APIKey.id).filter(APIKey.key == hash_api_key(key)).scalar()
+    start = datetime.now(timezone.utc)
+
+    for path in ("/wallet/balance", "/wallet/balance", "/wallet/balance", "/wallet/transactions"):
+        assert client.get(path, headers={"x-api-key": key}).status_code == 200
+    usage_tracker.flush()
+
+    assert _counts(db, api_key_id) == {"GET /wallet/balance": 3, "GET /wallet/transactions": 1}
+    last_used_at = db.query(APIKeyUsage.last_used_at).filter(APIKeyUsage.api_key_id == api_key_id).all()
+    assert all(start <= _aware(row.last_used_at) <= datetime.now(timezone.utc) for row in last_used_at)
+
+    # Later flushes add to the stored counts
+    assert client.get("/wallet/balance", headers={"x-api-key": key}).status_code == 200
+    usage_tracker.flush()
+
+    [listed] = list_user_api_keys(db, wallet.user_id)
+    assert (listed["requests"], listed["endpoints"]) == (5, {"GET /wallet/balance": 4, "GET /wallet/transactions": 1})
+    assert start <= _aware(datetime.fromisoformat(listed["last_used_at"]))
+
+
+def test_failed_flush_keeps_the_counts_for_the_next_one(db, monkeypatch):
+    tracker = UsageTracker(batch_size=1)
+    api_key_id = uuid.uuid4()
+    upsert = app.services.api_key_usage._upsert
+    calls = []
+
+    def upsert_failing_second(db, rows):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError("connection reset")
+        upsert(db, rows)
+
+    monkeypatch.setattr(app.services.api_key_usage, "_upsert", upsert_failing_second)
+    for endpoint in ("GET /wallet/balance", "GET /wallet/balance", "POST /wallet/transfer"):
+        tracker.record(api_key_id, endpoint)
+
+    assert tracker.flush() == 1
+    stats = tracker.stats()
+    assert (stats["pending"], stats["failed_flushes"], stats["last_error"]) == (1, 1, "connection reset")
+    assert sum(_counts(db, api_key_id).values()) == 2
+
+    tracker.record(api_key_id, "POST /wallet/transfer")
+    assert tracker.flush() == 1
+    assert _counts(db, api_key_id) == {"GET /wallet/balance": 2, "POST /wallet/transfer": 2}
+    assert (tracker.stats()["pending"], tracker.metrics["last_error"]) == (0, None)
+
+
+def test_new_counters_beyond_max_pending_are_dropped():
+    tracker = UsageTracker(max_pending=1)
+    api_key_id = uuid.uuid4()
+
+    for endpoint in ("GET /wallet/balance", "GET /wallet/balance", "GET /wallet/transactions"):
+        tracker.record(api_key_id, endpoint)
+
+    assert (tracker.metrics["recorded"], tracker.metrics["dropped"], tracker.stats()["pending"]) == (2, 1, 1)
@@ -0,0 +1,77 @@
+import hashlib
+import hmac
+import json
+from app.config import settings
+from app.services.maintenance import fail_stale_deposits
+from tests.test_paystack import _charge_success, _pending_deposit
+from tests.test_transfers import _send
+
+
+def _etag(client, login, wallet, path: str = "/wallet/balance") -> str:
+    login(wallet)
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    return response.headers["ETag"]
+
+
+def test_matching_if_none_match_gets_a_304(client, login, make_wallet):
+    wallet = make_wallet(500.0)
+
+    for path in ("/wallet/balance", "/wallet/transactions"):
+        etag = _etag(client, login, wallet, path)
+        for header in (etag, f"W/{etag}", f'"0", {etag}', "*"):
+            response = client.get(path, headers={"If-None-Match": header})
+            assert (response.status_code, response.content) == (304, b"")
+            assert response.headers["ETag"] == etag
+        assert client.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_deposit_webhook_changes_the_etag(db, client, login, make_wallet):
+    wallet = make_wallet()
+    reference = _pending_deposit(db, wallet, 500)
+    before = _etag(client, login, wallet)
+
+    body = json.dumps(_charge_success(reference, 500, wallet.user_id)).encode()
+    signature = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    response = client.post("/wallet/paystack/webhook", content=body, headers={
+        "x-paystack-signature": signature, "content-type": "application/json",
+    })
+    assert response.status_code == 200
+
+    assert _etag(client, login, wallet) != before
+    response = client.get("/wallet/balance", headers={"If-None-Match": before})
+    assert (response.status_code, float(response.json()["balance"])) == (200, 500.0)
+
+
+def test_transfer_changes_both_sides_etags(client, login, make_wallet):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+    before = [_etag(client, login, wallet) for wallet in (sender, recipient)]
+
+    _send(sender, recipient, 250)
+
+    after = [_etag(client, login, wallet) for wallet in (sender, recipient)]
+    assert [old != new for old, new in zip(before, after)] == [True, True]
+
+
+def test_cross_shard_credit_changes_the_recipients_etag(shards, make_sharded_wallet, client, login):
+    sender, recipient = make_sharded_wallet(0, 1000.0), make_sharded_wallet(1)
+    before = [_etag(client, login, wallet) for wallet in (sender, recipient)]
+
+    login(sender)
+    assert client.post("/wallet/transfer", json={"wallet_number": recipient.wallet_number, "amount": 250}).status_code == 200
+
+    after = [_etag(client, login, wallet) for wallet in (sender, recipient)]
+    assert [old != new for old, new in zip(before, after)] == [True, True]
+    assert float(client.get("/wallet/balance").json()["balance"]) == 250.0
+
+
+def test_failing_a_stale_deposit_changes_the_history_etag(db, client, login, make_wallet):
+    wallet = make_wallet()
+    _pending_deposit(db, wallet, 500)
+    before = _etag(client, login, wallet, "/wallet/transactions")
+
+    assert fail_stale_deposits(db, max_age_hours=0) >= 1
+
+    assert _etag(client, login, wallet, "/wallet/transactions") != before
+    assert [row["status"] for row in client.get("/wallet/transactions").json()] == ["failed"]
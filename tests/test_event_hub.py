@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import uuid
+from sqlalchemy import event
+from app.services.event_hub import EventHub, PostgresNotifyBackend
+
+
+def test_postgres_backend_notifies_off_the_publishing_thread(postgres_url, db_engine):
+    hub = EventHub(backend=PostgresNotifyBackend(channel=f"walletflow_test_{uuid.uuid4().hex[:8]}"))
+    sent = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "pg_notify" in statement:
+            sent.append(threading.current_thread().name)
+
+    async def scenario():
+        hub.start()
+        subscription = hub.subscribe(["user:1"])
+        try:
+            # Until the listener is connected, notifications go unheard
+            for _ in range(25):
+                hub.publish("user:1", {"reference": "ref_1"})
+                received = await subscription.get(0.2)
+                if received:
+                    return received
+        finally:
+            hub.stop()
+
+    event.listen(db_engine, "before_cursor_execute", record)
+    try:
+        assert asyncio.run(scenario()) == {"reference": "ref_1"}
+    finally:
+        event.remove(db_engine, "before_cursor_execute", record)
+    assert sent and set(sent) == {"event-hub-notifier"}
+
+
+def test_full_notify_queue_drops_the_event():
+    backend = PostgresNotifyBackend(queue_size=1)
+    hub = EventHub(backend=backend)
+
+    hub.publish("user:1", {"reference": "ref_1"})
+    hub.publish("user:1", {"reference": "ref_2"})
+
+    assert backend._outbox.qsize() == 1
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+from app.auth import google_oauth
+from app.auth.google_oauth import GoogleIDTokenVerifier
+
+CLIENT_ID = "test-client-id.apps.googleusercontent.com"
+
+
+@lru_cache(maxsize=None)
+def _key(name: str):
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _jwk(private_key, kid: str) -> dict:
+    return {**RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True), "kid": kid, "use": "sig", "alg": "RS256"}
+
+
+class FakeGoogle:
+    """Serves a discovery document and a JWKS from a local port, counting fetches"""
+
+    def __init__(self):
+        self.keys = {}
+        self.cache_control = "public, max-age=3600"
+        self.fetches = {"discovery": 0, "jwks": 0}
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/.well-known/openid-configuration":
+                    fake.fetches["discovery"] += 1
+                    body = {"issuer": "https://accounts.google.com", "jwks_uri": f"{fake.url}/certs"}
+                else:
+                    fake.fetches["jwks"] += 1
+                    body = {"keys": [_jwk(key, kid) for kid, key in fake.keys.items()]}
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", fake.cache_control)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def token(self, kid: str, signing_key=None, **claims) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234567890",
+            "email": "user@example.com", "email_verified": True, "iat": now, "exp": now + 3600,
+            **claims,
+        }
+        return jwt.encode(payload, signing_key or self.keys[kid], algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def google():
+    fake = FakeGoogle()
+    fake.keys["key-1"] = _key("google-1")
+    yield fake
+    fake.server.shutdown()
+    fake.server.server_close()
+
+
+@pytest.fixture
+def verifier(google):
+    return GoogleIDTokenVerifier(
+        discovery_url=f"{google.url}/.well-known/openid-configuration", client_id=CLIENT_ID, min_refresh_interval=0
+    )
+
+
+def verify(verifier, token: str) -> dict:
+    return asyncio.run(verifier.verify(token))
+
+
+def test_valid_token(google, verifier):
+    claims = verify(verifier, google.token("key-1"))
+    assert (claims["sub"], claims["email"]) == ("1234567890", "user@example.com")
+
+
+def test_rejects_signature_from_another_key(google, verifier):
+    with pytest.raises(jwt.InvalidSignatureError):
+        verify(verifier, google.token("key-1", signing_key=_key("attacker")))
+
+
+@pytest.mark.parametrize("claims, error", [
+    ({"aud": "someone-else"}, jwt.InvalidAudienceError),
+    ({"iss": "https://evil.example.com"}, jwt.InvalidIssuerError),
+    ({"exp": int(time.time()) - 3600}, jwt.ExpiredSignatureError),
+    ({"email_verified": False}, jwt.InvalidTokenError),
+    ({"email_verified": "false"}, jwt.InvalidTokenError),
+])
+def test_rejects_bad_claims(google, verifier, claims, error):
+    with pytest.raises(error):
+        verify(verifier, google.token("key-1", **claims))
+
+
+def test_accepts_string_email_verified(google, verifier):
+    assert verify(verifier, google.token("key-1", email_verified="true"))["email_verified"] == "true"
+
+
+def test_picks_up_rotated_key(google, verifier):
+    verify(verifier, google.token("key-1"))
+    google.keys = {"key-2": _key("google-2")}
+
+    claims = verify(verifier, google.token("key-2"))
+
+    assert claims["sub"] == "1234567890"
+    assert google.fetches["jwks"] == 2
+
+
+def test_unknown_key_after_refresh(google, verifier):
+    with pytest.raises(jwt.InvalidTokenError, match="Unknown signing key"):
+        verify(verifier, google.token("key-9", signing_key=_key("attacker")))
+
+
+def test_caches_for_max_age(google, verifier, monkeypatch):
+    google.cache_control = "public, max-age=60"
+    clock = [1000.0]
+    monkeypatch.setattr(google_oauth.time, "monotonic", lambda: clock[0])
+
+    for _ in range(3):
+        verify(verifier, google.token("key-1"))
+    assert google.fetches == {"discovery": 1, "jwks": 1}
+
+    clock[0] += 61
+    verify(verifier, google.token("key-1"))
+    assert google.fetches == {"discovery": 2, "jwks": 2}
+
+
+def test_refetches_when_not_cacheable(google, verifier):
+    google.cache_control = "no-cache"
+
+    for _ in range(3):
+        verify(verifier, google.token("key-1"))
+
+    assert google.fetches["jwks"] == 3
@@ -0,0 +1,97 @@
+import time
+import uuid
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.models import User, Wallet
+from app.services.identity_cache import IdentityCache, WalletIdentity, identity_cache
+from tests.test_sharding import _balance, _count
+
+
+@contextmanager
+def _queries(engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def test_repeat_lookups_are_served_from_memory(db, db_engine, make_wallet):
+    cache = IdentityCache(max_entries=10)
+    wallet = make_wallet()
+    identity = WalletIdentity(wallet.id, wallet.user_id)
+    email = db.get(User, wallet.user_id).email
+
+    assert cache.wallet(db, wallet.wallet_number) == identity
+    assert cache.email(db, wallet.user_id) == email
+    with _queries(db_engine) as statements:
+        assert cache.wallet(db, wallet.wallet_number) == identity
+        assert cache.email(db, str(wallet.user_id)) == email
+    assert statements == []
+    assert (cache.metrics["hits"], cache.metrics["misses"]) == (2, 2)
+
+
+def test_unknown_wallet_numbers_expire(db, make_wallet):
+    cache = IdentityCache(max_entries=10, negative_seconds=0.2)
+    wallet = make_wallet()
+    number = f"9{uuid.uuid4().int % 10 ** 12:012d}"
+
+    assert cache.wallet(db, number) is None
+    db.query(Wallet).filter(Wallet.id == wallet.id).update({Wallet.wallet_number: number})
+    db.commit()
+    assert cache.wallet(db, number) is None
+    assert cache.metrics["negative_hits"] == 1
+
+    time.sleep(0.25)
+    assert cache.wallet(db, number) == WalletIdentity(wallet.id, wallet.user_id)
+
+
+def test_least_recently_used_entry_is_evicted(db, make_wallet):
+    cache = IdentityCache(max_entries=2)
+    first, second, third = make_wallet(), make_wallet(), make_wallet()
+
+    cache.wallet(db, first.wallet_number)
+    cache.wallet(db, second.wallet_number)
+    cache.wallet(db, first.wallet_number)
+    cache.wallet(db, third.wallet_number)
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.metrics["hits"] == 1
+    cache.wallet(db, second.wallet_number)
+    assert cache.metrics["misses"] == 4
+
+
+def test_moved_wallet_is_credited_on_its_new_shard(shards, make_sharded_wallet, client, login):
+    from app.scripts.rebalance_shards import move_user
+    recipient, near, far = make_sharded_wallet(0), make_sharded_wallet(0, 1000.0), make_sharded_wallet(1, 1000.0)
+    login(near)
+    assert client.post("/wallet/transfer", json={"wallet_number": recipient.wallet_number, "amount": 100}).status_code == 200
+    assert identity_cache.wallet(None, recipient.wallet_number) == WalletIdentity(recipient.id, recipient.user_id)
+
+    move_user(recipient.user_id, 1, wait=False)
+
+    assert shards.locate_wallet(recipient.wallet_number) == (1, recipient.user_id, "active")
+    for sender in (near, far):
+        login(sender)
+        assert client.post("/wallet/transfer", json={"wallet_number": recipient.wallet_number, "amount": 100}).status_code == 200
+    assert _balance(shards, 1, recipient) == 300.0
+    assert _count(shards, 0, Wallet, Wallet.id == recipient.id) == 0
+    assert (_balance(shards, 0, near), _balance(shards, 1, far)) == (800.0, 900.0)
+
+
+def test_stale_identity_is_forgotten_after_a_failed_credit(db, make_wallet, client, login):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+    identity_cache._wallets.put(recipient.wallet_number, WalletIdentity(uuid.uuid4(), uuid.uuid4()))
+    login(sender)
+
+    assert client.post("/wallet/transfer", json={"wallet_number": recipient.wallet_number, "amount": 100}).status_code == 404
+    assert client.post("/wallet/transfer", json={"wallet_number": recipient.wallet_number, "amount": 100}).status_code == 200
+
+    assert identity_cache.wallet(db, recipient.wallet_number) == WalletIdentity(recipient.id, recipient.user_id)
+    db.expire_all()
+    assert (db.get(Wallet, sender.id).balance, db.get(Wallet, recipient.id).balance) == (900.0, 100.0)
@@ -0,0 +1,144 @@
+import asyncio
+import uuid
+from sqlalchemy import text
+from app.database import SessionLocal
+from app.models import LedgerEvent, Transaction
+from app.models.transactions import TransactionStatus, TransactionType
+from app.services.journal import add_entry
+from app.services.ledger_events import CREATED, STATUS_CHANGED
+from app.services.paystack import paystack
+from tests.test_transfers import _send
+
+
+def _events(db, reference: str) -> list:
+    db.expire_all()
+    return [
+        (event.event_type, event.wallet_id, event.status)
+        for event in db.query(LedgerEvent).filter(LedgerEvent.reference == reference).order_by(LedgerEvent.id)
+    ]
+
+
+def _written_with_entry(db, reference: str) -> bool:
+    """On Postgres: every event for the entry has the txid that last wrote its row"""
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    rows = db.execute(text(
+        "SELECT e.txid % 4294967296 = t.xmin::text::bigint FROM ledger_events e "
+        "JOIN transactions t ON t.id = e.transaction_id "
+        "WHERE e.reference = :reference AND e.id = (SELECT max(id) FROM ledger_events WHERE reference = :reference)"
+    ), {"reference": reference}).scalars().all()
+    db.commit()
+    return rows == [True]
+
+
+def _ledger_event(reference: str) -> LedgerEvent:
+    return LedgerEvent(
+        event_type=CREATED, transaction_id=uuid.uuid4(), reference=reference,
+        user_id=uuid.uuid4(), wallet_id=uuid.uuid4(), transaction_type=TransactionType.DEPOSIT,
+        status=TransactionStatus.PENDING, amount=1.0,
+    )
+
+
+def test_deposit_and_its_status_change_write_events(db, make_wallet, client, login, monkeypatch):
+    wallet = make_wallet()
+
+    async def initialize_transaction(**kwargs):
+        return {"authorization_url": "https://checkout.paystack.test/x", "reference": kwargs["reference"]}
+
+    monkeypatch.setattr(paystack, "initialize_transaction", initialize_transaction)
+    login(wallet)
+    reference = client.post("/wallet/deposit", json={"amount": 5000}).json()["reference"]
+
+    assert _events(db, reference) == [(CREATED, wallet.id, TransactionStatus.PENDING)]
+    assert _written_with_entry(db, reference)
+
+    session = SessionLocal()
+    try:
+        asyncio.run(paystack.handle_charge_success({"event": "charge.success", "data": {
+            "reference": reference, "amount": 500000, "metadata": {"user_id": str(wallet.user_id)},
+        }}, session))
+    finally:
+        session.close()
+
+    assert _events(db, reference) == [
+        (CREATED, wallet.id, TransactionStatus.PENDING),
+        (STATUS_CHANGED, wallet.id, TransactionStatus.SUCCESS),
+    ]
+    assert _written_with_entry(db, reference)
+
+
+def test_transfer_writes_an_event_per_wallet(db, make_wallet):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+
+    _send(sender, recipient, 250)
+
+    reference = db.query(Transaction.reference).filter(Transaction.sender_wallet_id == sender.id).scalar()
+    assert sorted(_events(db, reference)) == sorted([
+        (CREATED, sender.id, TransactionStatus.SUCCESS),
+        (CREATED, recipient.id, TransactionStatus.SUCCESS),
+    ])
+    assert _written_with_entry(db, reference)
+
+
+def test_rolled_back_entry_leaves_no_event(db, make_wallet):
+    wallet = make_wallet()
+    reference = f"dep_{uuid.uuid4().hex[:24]}"
+
+    add_entry(db, Transaction(
+        user_id=wallet.user_id, wallet_id=wallet.id, amount=100.0,
+        transaction_type=TransactionType.DEPOSIT, status=TransactionStatus.PENDING, reference=reference,
+    ), [(wallet.id, wallet.user_id, 100.0)])
+    db.flush()
+    db.rollback()
+
+    assert _events(db, reference) == []
+
+
+def test_feed_pages_in_order_without_gaps(db, client, admin):
+    tag = uuid.uuid4().hex[:8]
+    for i in range(7):
+        db.add(_ledger_event(f"feed_{tag}_{i}"))
+        db.commit()
+
+    whole = client.get("/events", params={"limit": 5000}, headers=admin).json()
+    pages, cursor = [], None
+    while True:
+        page = client.get("/events", params={"after": cursor, "limit": 3}, headers=admin).json()
+        pages.extend(page["events"])
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+
+    assert pages == whole["events"]
+    ids = [event[0] for event in pages]
+    assert len(set(ids)) == len(ids)
+    ours = [event[2] for event in pages if event[2].startswith(f"feed_{tag}_")]
+    assert ours == [f"feed_{tag}_{i}" for i in range(7)]
+
+
+def test_feed_waits_for_an_older_transaction_to_commit(postgres_url, db, client, admin):
+    tag = uuid.uuid4().hex[:8]
+    start = client.get("/events", params={"limit": 5000}, headers=admin).json()["next_cursor"]
+
+    slow = SessionLocal()
+    try:
+        slow.add(_ledger_event(f"slow_{tag}"))
+        slow.flush()
+        db.add(_ledger_event(f"fast_{tag}"))
+        db.commit()
+
+        # The later commit has the higher txid, but is held back behind the open one
+        page = client.get("/events", params={"after": start}, headers=admin).json()
+        assert [event[2] for event in page["events"] if tag in event[2]] == []
+
+        slow.commit()
+    finally:
+        slow.close()
+
+    page = client.get("/events", params={"after": start}, headers=admin).json()
+    assert [event[2] for event in page["events"] if tag in event[2]] == [f"slow_{tag}", f"fast_{tag}"]
+
+
+def test_feed_rejects_non_admin_callers(client, admin):
+    assert client.get("/events").status_code == 401
+    assert client.get("/events", headers={"x-admin-key": "not-the-key"}).status_code == 401
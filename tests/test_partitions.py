@@ -0,0 +1,135 @@
+import gzip
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import Base
+from app.models import Transaction, TransactionArchiveTotal, TransactionReference, User, Wallet
+from app.models.transactions import TransactionStatus, TransactionType
+from app.scripts.migrate import add_transaction_references
+from app.services.journal import add_entry
+from app.services.partitions import (
+    add_months, archive_partitions, ensure_partitions, list_partitions, month_start, partition_name
+)
+
+
+@pytest.fixture
+def pg(make_database):
+    """A session on a fresh, empty Postgres database with the app's schema"""
+    engine = create_engine(make_database())
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _wallet(db) -> Wallet:
+    user = User(email=f"test_{uuid.uuid4().hex[:12]}@example.com")
+    db.add(user)
+    db.flush()
+    wallet = Wallet(user_id=user.id, wallet_number=str(uuid.uuid4().int)[:13])
+    db.add(wallet)
+    db.flush()
+    return wallet
+
+
+def _deposit(db, wallet: Wallet, amount: float, created_at: datetime, reference: str = None) -> Transaction:
+    return add_entry(db, Transaction(
+        user_id=wallet.user_id,
+        wallet_id=wallet.id,
+        amount=amount,
+        transaction_type=TransactionType.DEPOSIT,
+        status=TransactionStatus.SUCCESS,
+        reference=reference or f"dep_{uuid.uuid4().hex[:24]}",
+        created_at=created_at,
+    ), [(wallet.id, wallet.user_id, amount)])
+
+
+def _months_ago(months: int) -> datetime:
+    month = add_months(month_start(datetime.now(timezone.utc)), -months)
+    return datetime(month.year, month.month, 15, tzinfo=timezone.utc)
+
+
+def test_reference_is_unique_across_months(db, make_wallet):
+    wallet, reference = make_wallet(), f"dep_{uuid.uuid4().hex[:24]}"
+    ensure_partitions(db, start=month_start(_months_ago(2)))
+    _deposit(db, wallet, 100, datetime.now(timezone.utc), reference)
+    db.commit()
+
+    _deposit(db, wallet, 100, _months_ago(2), reference)
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+
+def test_ensure_partitions_creates_missing_months(pg):
+    ahead = settings.TRANSACTION_PARTITIONS_AHEAD
+    start = month_start(_months_ago(3))
+
+    created = ensure_partitions(pg, ahead=ahead, start=start)
+
+    expected = [add_months(start, offset) for offset in range(3 + 1 + ahead)]
+    assert list_partitions(pg, "transactions") == expected
+    assert list_partitions(pg, "postings") == expected
+    # The tables came with this month and the ones ahead
+    assert created == 2 * 3
+    assert ensure_partitions(pg, ahead=ahead, start=start) == 0
+
+
+def test_archive_detach_keeps_totals_and_references(pg):
+    old, recent = _months_ago(4), _months_ago(1)
+    ensure_partitions(pg, start=month_start(old))
+    wallet = _wallet(pg)
+    reference = _deposit(pg, wallet, 300, old).reference
+    _deposit(pg, wallet, 200, recent)
+    pg.commit()
+
+    assert archive_partitions(pg, retention_months=3, mode="detach") == 1
+
+    assert month_start(old) not in list_partitions(pg)
+    assert month_start(recent) in list_partitions(pg)
+    archived = f"archive.{partition_name(month_start(old))}"
+    assert pg.execute(text(f"SELECT count(*) FROM {archived}")).scalar() == 1
+    assert pg.execute(select(func.count()).select_from(Transaction)).scalar() == 1
+    total = pg.execute(select(TransactionArchiveTotal).where(TransactionArchiveTotal.wallet_id == wallet.id)).scalar_one()
+    assert (total.partition, total.amount, total.transactions) == (partition_name(month_start(old)), 300.0, 1)
+    # The archived reference stays taken
+    assert pg.get(TransactionReference, reference) is not None
+
+
+def test_archive_export_writes_csv(pg, tmp_path):
+    old = _months_ago(4)
+    ensure_partitions(pg, start=month_start(old))
+    wallet = _wallet(pg)
+    reference = _deposit(pg, wallet, 300, old).reference
+    pg.commit()
+
+    archive_partitions(pg, retention_months=3, mode="export", archive_dir=str(tmp_path))
+
+    name = partition_name(month_start(old))
+    with gzip.open(tmp_path / f"{name}.csv.gz", "rt") as f:
+        lines = f.read().splitlines()
+    assert lines[0].startswith("id,")
+    assert len(lines) == 2 and reference in lines[1]
+    assert pg.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None
+
+
+def test_migration_backfills_references_and_drops_old_constraint(pg):
+    wallet = _wallet(pg)
+    entry = _deposit(pg, wallet, 100, datetime.now(timezone.utc))
+    reference, entry_id = entry.reference, entry.id
+    pg.commit()
+    # As an older release left it: no reference rows, unique on (reference, created_at)
+    pg.execute(text("DELETE FROM transaction_references"))
+    pg.execute(text("ALTER TABLE transactions ADD CONSTRAINT uq_transactions_reference UNIQUE (reference, created_at)"))
+    pg.commit()
+
+    assert add_transaction_references(pg.connection())
+    pg.commit()
+
+    assert pg.get(TransactionReference, reference).transaction_id == entry_id
+    assert pg.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'uq_transactions_reference'")).first() is None
+    assert not add_transaction_references(pg.connection())
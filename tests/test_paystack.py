@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import uuid
+from app.database import SessionLocal
+from app.models import Transaction, Wallet
+from app.models.transactions import TransactionStatus, TransactionType
+from app.services.journal import add_entry
+from app.services.paystack import paystack
+
+
+def _pending_deposit(db, wallet: Wallet, amount: float) -> str:
+    reference = f"dep_{uuid.uuid4().hex[:24]}"
+    add_entry(db, Transaction(
+        user_id=wallet.user_id,
+        wallet_id=wallet.id,
+        amount=amount,
+        transaction_type=TransactionType.DEPOSIT,
+        status=TransactionStatus.PENDING,
+        reference=reference,
+    ), [(wallet.id, wallet.user_id, amount)])
+    db.commit()
+    return reference
+
+
+def _charge_success(reference: str, amount: float, user_id) -> dict:
+    return {"event": "charge.success", "data": {
+        "reference": reference, "amount": int(amount * 100), "metadata": {"user_id": str(user_id)}
+    }}
+
+
+def test_redelivered_charge_success_credits_once(postgres_url, db, make_wallet):
+    wallet = make_wallet()
+    reference = _pending_deposit(db, wallet, 500)
+    payload = _charge_success(reference, 500, wallet.user_id)
+    start = threading.Barrier(4)
+
+    def deliver():
+        session = SessionLocal()
+        try:
+            start.wait()
+            asyncio.run(paystack.handle_charge_success(payload, session))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=deliver) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db.expire_all()
+    assert db.get(Wallet, wallet.id).balance == 500.0
@@ -0,0 +1,116 @@
+import asyncio
+import socket
+import threading
+import time
+import httpx
+import pytest
+import uvicorn
+from app.config import settings
+from app.scripts.fake_paystack import create_app
+from app.services.paystack import CircuitBreaker, Paystack, PaystackUnavailable
+
+
+@pytest.fixture(scope="module")
+def fake_paystack():
+    """app.scripts.fake_paystack on a free local port; yields its base URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture
+def fake(fake_paystack, monkeypatch):
+    """Resets the fake and points a fresh client at it; yields a config setter"""
+    def configure(**values):
+        httpx.post(f"{fake_paystack}/_fake/config", json=values).raise_for_status()
+
+    configure(latency_ms=0, jitter_ms=0, error_rate=0, down=False)
+    monkeypatch.setattr(settings, "PAYSTACK_VERIFY_URL", f"{fake_paystack}/transaction/verify")
+    monkeypatch.setattr(settings, "PAYSTACK_RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "PAYSTACK_HEDGE_AFTER_MS", 0)
+    yield configure
+
+
+def _client(fake_paystack: str, failures: int = 2, reset: float = 0.2) -> Paystack:
+    client = Paystack()
+    client.initialize_url = f"{fake_paystack}/transaction/initialize"
+    client.breaker = CircuitBreaker(failures, reset)
+    return client
+
+
+def run(client: Paystack, call):
+    async def go():
+        try:
+            return await call()
+        finally:
+            await client.aclose()
+    return asyncio.run(go())
+
+
+def test_initialize_then_verify(fake_paystack, fake):
+    client = _client(fake_paystack)
+
+    async def deposit():
+        started = await client.initialize_transaction("user@example.com", 150, reference="dep_fake_1")
+        return started, await client.verify_transaction("dep_fake_1")
+
+    started, verified = run(client, deposit)
+
+    assert started["reference"] == "dep_fake_1"
+    assert verified == {"status": "success", "amount": 150.0, "reference": "dep_fake_1"}
+
+
+def test_verify_retries_then_breaker_opens(fake_paystack, fake, monkeypatch):
+    monkeypatch.setattr(settings, "PAYSTACK_VERIFY_RETRIES", 3)
+    fake(down=True)
+    client = _client(fake_paystack, failures=2)
+
+    with pytest.raises(PaystackUnavailable):
+        run(client, lambda: client.verify_transaction("dep_fake_down"))
+
+    # Retries stop as soon as the second failure opens the breaker
+    assert client.counters["retries"] == 1
+    assert client.breaker.state == "open"
+    with pytest.raises(PaystackUnavailable, match="circuit open"):
+        run(client, lambda: client.verify_transaction("dep_fake_down"))
+    assert httpx.get(f"{fake_paystack}/_fake/config").json()["down"] is True
+
+
+def test_half_open_trial_closes_breaker(fake_paystack, fake):
+    client = _client(fake_paystack, failures=1, reset=0.1)
+    fake(down=True)
+    with pytest.raises(PaystackUnavailable):
+        run(client, lambda: client.initialize_transaction("user@example.com", 150, reference="dep_fake_2"))
+    assert client.breaker.state == "open"
+
+    fake(down=False)
+    time.sleep(0.15)
+    run(client, lambda: client.initialize_transaction("user@example.com", 150, reference="dep_fake_2"))
+
+    assert client.breaker.state == "closed"
+
+
+def test_bulkhead_rejection_frees_half_open_trial(fake_paystack, fake, monkeypatch):
+    monkeypatch.setattr(settings, "PAYSTACK_BULKHEAD_WAIT_SECONDS", 0.05)
+    client = _client(fake_paystack, failures=1, reset=10)
+    client.breaker.state, client.breaker.opened_at = "open", time.monotonic() - 11
+
+    async def trial_while_bulkhead_full():
+        client._bulkhead = asyncio.Semaphore(0)
+        with pytest.raises(PaystackUnavailable, match="Too many concurrent"):
+            await client.initialize_transaction("user@example.com", 150, reference="dep_fake_3")
+        client._bulkhead.release()
+        # Without release_trial this would be refused for reset_timeout
+        return await client.initialize_transaction("user@example.com", 150, reference="dep_fake_3")
+
+    assert run(client, trial_while_bulkhead_full)["reference"] == "dep_fake_3"
+    assert client.counters["rejected_breaker"] == 0
+    assert client.breaker.state == "closed"
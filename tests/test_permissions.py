@@ -0,0 +1,70 @@
+import itertools
+import json
+import uuid
+import pytest
+from sqlalchemy import create_engine, text
+from app.auth.api_key_auth import create_api_key
+from app.auth.permissions import Permission, permissions_to_mask, mask_to_permissions
+from app.scripts.migrate import migrate_permission_mask
+
+NAMES = ["read", "deposit", "transfer"]
+
+# Every list the JSON column could hold: each subset, in each order
+LEGACY_LISTS = [
+    list(order)
+    for size in range(len(NAMES) + 1)
+    for subset in itertools.combinations(NAMES, size)
+    for order in itertools.permutations(subset)
+]
+
+
+@pytest.mark.parametrize("names", LEGACY_LISTS)
+def test_permission_names_round_trip(names):
+    mask = permissions_to_mask(names)
+
+    assert mask_to_permissions(mask) == [name for name in NAMES if name in names]
+    assert permissions_to_mask(int(mask)) == mask
+
+
+def test_unknown_permission_is_rejected():
+    with pytest.raises(ValueError):
+        permissions_to_mask(["read", "admin"])
+
+
+def test_legacy_permission_lists_migrate_to_masks(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    rows = {}
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE api_keys (id VARCHAR PRIMARY KEY, permissions JSON NOT NULL)"))
+        for names in LEGACY_LISTS:
+            # Released code stored json.dumps(list) in a JSON column: a JSON string
+            for stored in (json.dumps(json.dumps(names)), json.dumps(names)):
+                key_id = uuid.uuid4().hex
+                conn.execute(text("INSERT INTO api_keys (id, permissions) VALUES (:id, :permissions)"), {"id": key_id, "permissions": stored})
+                rows[key_id] = names
+
+    with engine.begin() as conn:
+        assert migrate_permission_mask(conn)
+    with engine.begin() as conn:
+        assert not migrate_permission_mask(conn)
+        masks = dict(conn.execute(text("SELECT id, permission_mask FROM api_keys")).fetchall())
+
+    assert {key_id: mask_to_permissions(mask) for key_id, mask in masks.items()} == {
+        key_id: [name for name in NAMES if name in names] for key_id, names in rows.items()
+    }
+    engine.dispose()
+
+
+def test_key_without_transfer_gets_403(client, db, make_wallet):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+    key = create_api_key(db, sender.user_id, "read-deposit", ["read", "deposit"], "1D")["api_key"]
+
+    response = client.post(
+        "/wallet/transfer",
+        headers={"x-api-key": key},
+        json={"wallet_number": recipient.wallet_number, "amount": 100},
+    )
+
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Missing required permission: transfer"
+    assert client.get("/wallet/balance", headers={"x-api-key": key}).status_code == 200
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+from app.profiling import ProfileStore, ProfilingMiddleware
+
+
+class RecordingStore(ProfileStore):
+    def __init__(self, directory: str, max_profiles: int):
+        super().__init__(directory, max_profiles)
+        self.saved_on = []
+
+    def save(self, profile_id, samples, meta):
+        self.saved_on.append(threading.get_ident())
+        super().save(profile_id, samples, meta)
+
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _request(middleware) -> dict:
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "GET", "path": "/wallet/balance", "headers": []}
+    asyncio.run(middleware(scope, receive, send))
+    return dict(sent[0]["headers"])
+
+
+def test_profiles_are_saved_off_the_loop_and_rotated(tmp_path):
+    store = RecordingStore(str(tmp_path), max_profiles=2)
+    middleware = ProfilingMiddleware(_ok, sample_rate=1.0, interval_ms=1, store=store)
+
+    ids = []
+    for _ in range(3):
+        ids.append(_request(middleware)[b"x-profile-id"].decode())
+        time.sleep(0.002)  # ids order by millisecond
+
+    assert threading.get_ident() not in store.saved_on
+    assert len(store.saved_on) == 3
+    assert [profile["id"] for profile in store.recent()] == ids[:0:-1]
+    assert all(profile["path"] == "/wallet/balance" and profile["status"] == 200 for profile in store.recent())
@@ -0,0 +1,74 @@
+"""Read replica routing, with local databases standing in for replicas"""
+import socket
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine
+from app.database import ReplicaRouter, replica_engine
+
+
+def _healthy(router: ReplicaRouter) -> list:
+    return [status["healthy"] for status in router.status()]
+
+
+def _eventually(check, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def engines(make_database):
+    primary = create_engine(make_database())
+    replicas = [replica_engine(make_database()), replica_engine(make_database())]
+    yield primary, replicas
+    for engine in [primary, *replicas]:
+        engine.dispose()
+
+
+@pytest.fixture
+def hung_replica():
+    """A port that accepts connections and never answers"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(8)
+    engine = replica_engine(f"postgresql://postgres@127.0.0.1:{server.getsockname()[1]}/walletflow", connect_timeout=1)
+    yield engine
+    engine.dispose()
+    server.close()
+
+
+def test_reads_use_the_primary_until_replicas_are_probed(engines):
+    primary, replicas = engines
+    router = ReplicaRouter(primary, replicas, check_interval=60)
+
+    assert router.pick() is primary
+
+    _eventually(lambda: _healthy(router) == [True, True])
+    assert {router.pick(), router.pick()} == set(replicas)
+
+
+def test_token_ahead_of_every_replica_falls_back_to_the_primary(engines):
+    primary, replicas = engines
+    router = ReplicaRouter(primary, replicas, check_interval=60)
+    _eventually(lambda: _healthy(router) == [True, True])
+
+    assert router.pick("FFFFFFFF/0") is primary
+    assert router.pick("0/0") in replicas
+
+
+def test_hung_replica_never_blocks_a_read(engines, hung_replica):
+    primary, replicas = engines
+    router = ReplicaRouter(primary, [hung_replica, replicas[0]], check_interval=60)
+
+    start = time.monotonic()
+    assert router.pick() is primary
+    assert time.monotonic() - start < 0.5
+
+    _eventually(lambda: _healthy(router) == [False, True])
+    assert {router.pick() for _ in range(4)} == {replicas[0]}
+
+    # The hung probe gives up after connect_timeout, and the replica stays skipped
+    _eventually(lambda: not any(t.name == "replica-probe-0" for t in threading.enumerate()), timeout=3)
+    assert _healthy(router) == [False, True]
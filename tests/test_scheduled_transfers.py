@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.config import settings
+from app.models import Posting, ScheduledTransfer, Wallet
+from app.models.scheduled_transfer import Recurrence, ScheduledTransferStatus
+from app.services.scheduled_transfers import _aware, _update_many, occurrence_at, run_batch
+from tests.test_sharding import _balance, _set_state
+
+
+def _schedule(db, sender: Wallet, recipient_number: str, amount: float, starts_ago: timedelta = timedelta(seconds=1), **columns) -> ScheduledTransfer:
+    starts_at = datetime.now(timezone.utc) - starts_ago
+    scheduled = ScheduledTransfer(
+        user_id=sender.user_id, wallet_id=sender.id, recipient_wallet_number=recipient_number,
+        amount=amount, starts_at=starts_at, next_run_at=starts_at, **columns
+    )
+    db.add(scheduled)
+    db.commit()
+    return scheduled
+
+
+def _run(shard: int = 0) -> dict:
+    from app.sharding import shard_router
+    db = shard_router.session(shard)
+    try:
+        return run_batch(db)
+    finally:
+        db.close()
+
+
+def _reload(db, *rows):
+    db.expire_all()
+    return [db.get(type(row), row.id) for row in rows]
+
+
+def test_batch_stops_at_the_senders_balance(db, make_wallet):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+    schedules = [
+        _schedule(db, sender, recipient.wallet_number, 400, starts_ago=timedelta(seconds=3 - i))
+        for i in range(3)
+    ]
+
+    _run()
+
+    first, second, third = _reload(db, *schedules)
+    assert [first.status, second.status] == [ScheduledTransferStatus.COMPLETED] * 2
+    assert (third.status, third.last_error) == (ScheduledTransferStatus.FAILED, "Insufficient balance")
+    sender, recipient = _reload(db, sender, recipient)
+    assert (sender.balance, recipient.balance) == (200.0, 800.0)
+    assert db.query(Posting).filter(Posting.wallet_id == recipient.id).count() == 2
+
+
+@pytest.mark.parametrize("starts_at, occurrence, expected", [
+    (datetime(2026, 1, 31, 9, tzinfo=timezone.utc), 1, datetime(2026, 2, 28, 9, tzinfo=timezone.utc)),
+    (datetime(2026, 1, 31, 9, tzinfo=timezone.utc), 2, datetime(2026, 3, 31, 9, tzinfo=timezone.utc)),
+    (datetime(2026, 1, 31, 9, tzinfo=timezone.utc), 3, datetime(2026, 4, 30, 9, tzinfo=timezone.utc)),
+    (datetime(2027, 12, 31, 9, tzinfo=timezone.utc), 2, datetime(2028, 2, 29, 9, tzinfo=timezone.utc)),
+    (datetime(2026, 11, 30, 9, tzinfo=timezone.utc), 3, datetime(2027, 2, 28, 9, tzinfo=timezone.utc)),
+])
+def test_monthly_on_the_31st_clamps_to_shorter_months(starts_at, occurrence, expected):
+    assert occurrence_at(starts_at, Recurrence.MONTHLY, occurrence) == expected
+
+
+def test_missed_occurrences_are_skipped(db, make_wallet):
+    sender, recipient = make_wallet(10_000.0), make_wallet()
+    scheduled = _schedule(db, sender, recipient.wallet_number, 100, starts_ago=timedelta(days=10, hours=1), recurrence=Recurrence.DAILY)
+    starts_at = _aware(scheduled.starts_at)
+
+    _run()
+
+    [scheduled] = _reload(db, scheduled)
+    assert (scheduled.runs, scheduled.occurrence, scheduled.status) == (1, 11, ScheduledTransferStatus.ACTIVE)
+    assert _aware(scheduled.next_run_at) == starts_at + timedelta(days=11)
+    [recipient] = _reload(db, recipient)
+    assert recipient.balance == 100.0
+
+
+def test_max_runs_completes_the_order(db, make_wallet):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+    scheduled = _schedule(db, sender, recipient.wallet_number, 100, recurrence=Recurrence.WEEKLY, max_runs=2, runs=1)
+
+    _run()
+
+    [scheduled] = _reload(db, scheduled)
+    assert (scheduled.runs, scheduled.status) == (2, ScheduledTransferStatus.COMPLETED)
+
+
+def test_repeated_failures_fail_the_order(db, make_wallet):
+    sender, recipient = make_wallet(50.0), make_wallet()
+    retried = _schedule(db, sender, recipient.wallet_number, 100, recurrence=Recurrence.DAILY)
+    exhausted = _schedule(
+        db, sender, recipient.wallet_number, 100, recurrence=Recurrence.DAILY,
+        failures=settings.SCHEDULED_TRANSFER_MAX_FAILURES - 1
+    )
+
+    _run()
+
+    retried, exhausted = _reload(db, retried, exhausted)
+    assert (retried.status, retried.failures, retried.runs) == (ScheduledTransferStatus.ACTIVE, 1, 0)
+    assert _aware(retried.next_run_at) > datetime.now(timezone.utc)
+    assert (exhausted.status, exhausted.last_error) == (ScheduledTransferStatus.FAILED, "Insufficient balance")
+    [sender] = _reload(db, sender)
+    assert sender.balance == 50.0
+
+
+def test_transfer_to_a_moving_wallet_is_deferred(db, shards, make_sharded_wallet):
+    sender, recipient = make_sharded_wallet(0, 1000.0), make_sharded_wallet(1)
+    scheduled = _schedule(db, sender, recipient.wallet_number, 300)
+    due_at = _aware(scheduled.next_run_at)
+
+    _set_state(shards, recipient, "moving")
+    assert _run()["deferred"] >= 1
+    [scheduled] = _reload(db, scheduled)
+    assert (scheduled.status, _aware(scheduled.next_run_at)) == (ScheduledTransferStatus.ACTIVE, due_at)
+    assert _balance(shards, 0, sender) == 1000.0
+
+    _set_state(shards, recipient, "active")
+    _run()
+    [scheduled] = _reload(db, scheduled)
+    assert scheduled.status == ScheduledTransferStatus.COMPLETED
+    assert (_balance(shards, 0, sender), _balance(shards, 1, recipient)) == (700.0, 300.0)
+
+
+def test_update_many_round_trips_enums_and_datetimes(postgres_url, db, make_wallet):
+    sender, recipient = make_wallet(), make_wallet()
+    schedules = [_schedule(db, sender, recipient.wallet_number, 100, recurrence=Recurrence.MONTHLY) for _ in range(2)]
+    next_run_at = datetime(2027, 3, 31, 8, 30, 15, 123456, tzinfo=timezone.utc)
+
+    _update_many(db, ScheduledTransfer, [
+        {"id": schedules[0].id, "status": ScheduledTransferStatus.CANCELLED, "next_run_at": next_run_at, "runs": 4, "last_error": None},
+        {"id": schedules[1].id, "status": ScheduledTransferStatus.FAILED, "next_run_at": next_run_at + timedelta(days=1), "runs": 0, "last_error": "Insufficient balance"},
+    ])
+    _update_many(db, Wallet, [{"id": sender.id, "balance": 1234.56, "version": 7}])
+    db.commit()
+
+    first, second, sender = _reload(db, *schedules, sender)
+    assert (first.status, first.next_run_at, first.runs, first.last_error) == (ScheduledTransferStatus.CANCELLED, next_run_at, 4, None)
+    assert (second.status, second.next_run_at, second.last_error) == (ScheduledTransferStatus.FAILED, next_run_at + timedelta(days=1), "Insufficient balance")
+    assert (sender.balance, sender.version) == (1234.56, 7)
+
+
+def test_create_list_and_cancel_through_the_routes(client, login, make_wallet):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+    login(sender)
+    start_at = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+
+    response = client.post("/wallet/scheduled-transfers", json={
+        "wallet_number": recipient.wallet_number, "amount": 250, "recurrence": "monthly",
+        "start_at": start_at, "max_runs": 12, "description": "Rent",
+    })
+    assert response.status_code == 201
+    created = response.json()
+    assert (created["status"], created["runs"], created["wallet_number"]) == ("active", 0, recipient.wallet_number)
+
+    assert [row["id"] for row in client.get("/wallet/scheduled-transfers").json()] == [created["id"]]
+
+    response = client.delete(f"/wallet/scheduled-transfers/{created['id']}")
+    assert (response.status_code, response.json()["status"]) == (200, "cancelled")
+    assert client.delete(f"/wallet/scheduled-transfers/{created['id']}").status_code == 409
+    assert client.get("/wallet/scheduled-transfers").json() == []
+    assert [row["status"] for row in client.get("/wallet/scheduled-transfers", params={"include_finished": True}).json()] == ["cancelled"]
+
+
+def test_create_rejects_bad_requests(client, login, make_wallet):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+    login(sender)
+    past = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+
+    for body, status in (
+        ({"wallet_number": recipient.wallet_number, "amount": 250, "start_at": past}, 400),
+        ({"wallet_number": "0000000000000", "amount": 250}, 404),
+        ({"wallet_number": sender.wallet_number, "amount": 250}, 400),
+        ({"wallet_number": recipient.wallet_number, "amount": 50}, 422),
+    ):
+        assert client.post("/wallet/scheduled-transfers", json=body).status_code == status
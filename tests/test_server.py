@@ -0,0 +1,22 @@
+from fastapi.testclient import TestClient
+import app.main as main
+from app.services.api_key_usage import UsageTracker
+from app.services.event_hub import EventHub
+
+
+def test_forked_worker_skips_init_db(monkeypatch, db_engine):
+    calls = []
+    monkeypatch.setattr(main, "init_db", lambda: calls.append("init_db"))
+    # Own background services, apart from the session-wide client's running lifespan
+    monkeypatch.setattr(main, "usage_tracker", UsageTracker())
+    monkeypatch.setattr(main, "event_hub", EventHub())
+
+    monkeypatch.setattr(main, "schema_ready", True)
+    with TestClient(main.app):
+        pass
+    assert calls == []
+
+    monkeypatch.setattr(main, "schema_ready", False)
+    with TestClient(main.app):
+        pass
+    assert calls == ["init_db"]
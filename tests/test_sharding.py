@@ -0,0 +1,138 @@
+"""Sharding with the test database as shard 0 and a SQLite file as shard 1"""
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func
+from app.models import Posting, Transaction, TransactionReference, Wallet
+from app.models.shard import CrossShardTransfer, UserShard
+from app.sharding import deliver_cross_shard_transfer, relay_cross_shard_transfers
+
+
+def _balance(shards, shard: int, wallet: Wallet) -> float:
+    db = shards.session(shard)
+    try:
+        return db.get(Wallet, wallet.id).balance
+    finally:
+        db.close()
+
+
+def _count(shards, shard: int, model, *criteria) -> int:
+    db = shards.session(shard)
+    try:
+        return db.query(func.count()).select_from(model).filter(*criteria).scalar()
+    finally:
+        db.close()
+
+
+def _set_state(shards, wallet: Wallet, state: str):
+    db = shards.session(0)
+    try:
+        db.query(UserShard).filter(UserShard.user_id == wallet.user_id).update({UserShard.state: state})
+        db.commit()
+    finally:
+        db.close()
+    shards.forget(wallet.user_id, wallet.wallet_number)
+
+
+def test_new_users_are_placed_and_found_through_the_directory(shards, make_sharded_wallet):
+    wallets = {shard: make_sharded_wallet(shard) for shard in (0, 1)}
+
+    for shard, wallet in wallets.items():
+        assert shards.shard_for_user(wallet.user_id) == shard
+        assert shards.locate_wallet(wallet.wallet_number) == (shard, wallet.user_id, "active")
+        assert _count(shards, shard, Wallet, Wallet.id == wallet.id) == 1
+        assert _count(shards, 1 - shard, Wallet, Wallet.id == wallet.id) == 0
+    assert shards.locate_wallet("0000000000000") == (0, None, "active")
+
+
+def test_moving_wallet_rejects_writes(shards, make_sharded_wallet, client, login):
+    moving, other = make_sharded_wallet(1, 500.0), make_sharded_wallet(0, 500.0)
+    _set_state(shards, moving, "moving")
+
+    with pytest.raises(HTTPException) as error:
+        shards.shard_for_user(moving.user_id, for_write=True)
+    assert error.value.status_code == 503
+    assert shards.shard_for_user(moving.user_id) == 1
+
+    login(moving)
+    response = client.post("/wallet/transfer", json={"wallet_number": other.wallet_number, "amount": 100})
+    assert response.status_code == 503
+    login(other)
+    response = client.post("/wallet/transfer", json={"wallet_number": moving.wallet_number, "amount": 100})
+    assert response.status_code == 503, response.text
+    assert _balance(shards, 0, other) == 500.0
+
+
+def test_failed_cross_shard_delivery_is_relayed_once(shards, make_sharded_wallet, client, login, monkeypatch):
+    import app.sharding
+    sender, recipient = make_sharded_wallet(0, 1000.0), make_sharded_wallet(1)
+    credit = app.sharding.credit
+    failures = []
+
+    def credit_once_failing(db, wallet_id, amount):
+        if not failures:
+            failures.append(wallet_id)
+            raise RuntimeError("shard 1 unreachable")
+        return credit(db, wallet_id, amount)
+
+    monkeypatch.setattr(app.sharding, "credit", credit_once_failing)
+    login(sender)
+    response = client.post("/wallet/transfer", json={"wallet_number": recipient.wallet_number, "amount": 250})
+
+    assert response.status_code == 200
+    assert _balance(shards, 0, sender) == 750.0
+    assert _balance(shards, 1, recipient) == 0.0
+    source = shards.session(0)
+    try:
+        outbox = source.query(CrossShardTransfer).filter(CrossShardTransfer.recipient_wallet_number == recipient.wallet_number).one()
+        assert (outbox.status, outbox.attempts) == ("pending", 1)
+
+        assert relay_cross_shard_transfers(source) == 1
+        # A delivery that credited but never marked the outbox is skipped on replay
+        outbox.status = "pending"
+        source.commit()
+        assert deliver_cross_shard_transfer(0, outbox.id)
+        assert relay_cross_shard_transfers(source) == 0
+        reference = outbox.reference
+    finally:
+        source.close()
+
+    assert _balance(shards, 1, recipient) == 250.0
+    assert _count(shards, 1, TransactionReference, TransactionReference.reference == reference) == 1
+    assert _count(shards, 1, Posting, Posting.wallet_id == recipient.id) == 1
+    assert _count(shards, 0, Posting, Posting.wallet_id == sender.id) == 1
+
+
+def test_rebalance_moves_a_user_with_their_history(shards, make_sharded_wallet, client, login):
+    from app.scripts.rebalance_shards import move_user
+    mover, stayer = make_sharded_wallet(0, 1000.0), make_sharded_wallet(0, 1000.0)
+    login(mover)
+    assert client.post("/wallet/transfer", json={"wallet_number": stayer.wallet_number, "amount": 300}).status_code == 200
+    source = shards.session(0)
+    try:
+        reference = source.query(Transaction.reference).filter(Transaction.sender_wallet_id == mover.id).scalar()
+    finally:
+        source.close()
+
+    assert move_user(mover.user_id, 1, wait=False) == 1
+
+    assert shards.shard_for_user(mover.user_id, for_write=True) == 1
+    assert _balance(shards, 1, mover) == 700.0
+    assert _count(shards, 0, Wallet, Wallet.id == mover.id) == 0
+    assert _balance(shards, 0, stayer) == 1300.0
+    # Each shard keeps a copy of the entry with its own side's posting
+    for shard, wallet, amount in ((1, mover, -300.0), (0, stayer, 300.0)):
+        db = shards.session(shard)
+        try:
+            postings = db.query(Posting.wallet_id, Posting.amount).join(
+                Transaction, Transaction.id == Posting.transaction_id
+            ).filter(Transaction.reference == reference).all()
+            assert postings == [(wallet.id, amount)]
+            assert db.get(TransactionReference, reference) is not None
+        finally:
+            db.close()
+
+    response = client.get("/wallet/balance")
+    assert response.status_code == 200 and float(response.json()["balance"]) == 700.0
+    history = client.get("/wallet/transactions")
+    assert [(row["reference"], row["direction"]) for row in history.json()] == [(reference, "debit")]
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.models import Wallet
+from app.routes.wallet import _coalesced_read
+from app.services.single_flight import SingleFlight, SingleFlightTimeout, single_flight
+from app.services.striping import WALLET_BALANCE
+
+CALLERS = 20
+
+
+def _gather(flight: SingleFlight, key, call, callers: int = CALLERS) -> list:
+    async def run():
+        return await asyncio.gather(*(flight.do(key, call) for _ in range(callers)), return_exceptions=True)
+    return asyncio.run(run())
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight(timeout=5)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"balance": 100.0}
+
+    results = _gather(flight, ("balance", 1), load)
+
+    assert calls == [1]
+    assert results == [{"balance": 100.0}] * CALLERS
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": CALLERS - 1, "timeouts": 0, "errors": 0}
+
+
+def test_an_exception_reaches_every_caller_and_clears_the_key():
+    flight = SingleFlight(timeout=5)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        return "loaded"
+
+    results = _gather(flight, "key", load)
+
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight._flights == {}
+    assert flight.metrics["errors"] == 1
+    assert _gather(flight, "key", load, callers=1) == ["loaded"]
+
+
+def test_callers_stop_waiting_after_the_timeout():
+    flight = SingleFlight(timeout=0.05)
+    finished = []
+
+    async def load():
+        await asyncio.sleep(0.2)
+        finished.append(1)
+        return "late"
+
+    async def run():
+        with pytest.raises(SingleFlightTimeout):
+            await flight.do("key", load)
+        # The call keeps running after its caller gave up
+        await asyncio.sleep(0.25)
+
+    asyncio.run(run())
+    assert finished == [1]
+    assert flight.metrics["timeouts"] == 1
+    assert flight._flights == {}
+
+
+def test_coalesced_reads_run_the_query_once(make_wallet):
+    wallet = make_wallet(750.0)
+    threads = []
+
+    def read(db):
+        threads.append(threading.get_ident())
+        time.sleep(0.05)
+        return db.query(WALLET_BALANCE).filter(Wallet.id == wallet.id).scalar()
+
+    async def run():
+        return await asyncio.gather(*(
+            _coalesced_read(("balance", wallet.user_id), wallet.user_id, read, None) for _ in range(CALLERS)
+        ))
+
+    assert asyncio.run(run()) == [750.0] * CALLERS
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+    assert ("balance", wallet.user_id) not in single_flight._flights
+
+
+def test_a_failed_read_fails_every_coalesced_request(make_wallet):
+    wallet = make_wallet()
+    key = ("balance", wallet.user_id)
+
+    def read(db):
+        time.sleep(0.05)
+        raise RuntimeError("replica went away")
+
+    async def run():
+        return await asyncio.gather(*(
+            _coalesced_read(key, wallet.user_id, read, None) for _ in range(CALLERS)
+        ), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [str(result) for result in results] == ["replica went away"] * CALLERS
+    assert key not in single_flight._flights
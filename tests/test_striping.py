@@ -0,0 +1,100 @@
+from sqlalchemy import select
+from app.models import Wallet, WalletStripe
+from app.models.scheduled_transfer import ScheduledTransferStatus
+from app.services.reconciliation import reconcile
+from app.services.striping import WALLET_BALANCE, WALLET_VERSION
+from tests.test_scheduled_transfers import _reload, _run, _schedule
+from tests.test_transfers import _send
+
+
+def _stripe(client, admin, wallet: Wallet, stripes: int) -> dict:
+    response = client.put(f"/admin/wallets/{wallet.wallet_number}/stripes", json={"stripes": stripes}, headers=admin)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _stripes(db, wallet: Wallet) -> list:
+    db.expire_all()
+    return db.execute(
+        select(WalletStripe.balance).where(WalletStripe.wallet_id == wallet.id).order_by(WalletStripe.stripe)
+    ).scalars().all()
+
+
+def _fund(db, wallet: Wallet, *balances: float):
+    for stripe, balance in enumerate(balances):
+        db.query(WalletStripe).filter(WalletStripe.wallet_id == wallet.id, WalletStripe.stripe == stripe).update(
+            {WalletStripe.balance: balance}
+        )
+    db.commit()
+
+
+def _totals(db, wallet: Wallet) -> tuple:
+    db.expire_all()
+    return db.query(Wallet.balance, WALLET_BALANCE, WALLET_VERSION).filter(Wallet.id == wallet.id).one()
+
+
+def test_credits_spread_over_stripes_and_reads_include_them(db, db_engine, make_wallet, client, admin, login):
+    sender, recipient = make_wallet(10_000.0), make_wallet()
+    assert _stripe(client, admin, recipient, 4)["stripes"] == 4
+
+    for _ in range(20):
+        _send(sender, recipient, 100)
+
+    stripes = _stripes(db, recipient)
+    assert len(stripes) == 4 and sum(stripes) == 2000.0
+    assert len([balance for balance in stripes if balance]) > 1
+    row, balance, _ = _totals(db, recipient)
+    assert (row, balance) == (0.0, 2000.0)
+
+    login(recipient)
+    assert float(client.get("/wallet/balance").json()["balance"]) == 2000.0
+    # The postings only add up if reconciliation counts the stripes
+    report = reconcile({0: db_engine}, partitions=1)
+    assert str(recipient.id) not in [row[1] for row in report["discrepancies"]]
+
+
+def test_debit_takes_from_a_stripe_or_sweeps_them_all(db, make_wallet, client, admin):
+    sender, recipient = make_wallet(), make_wallet()
+    _stripe(client, admin, sender, 4)
+
+    _fund(db, sender, 0.0, 0.0, 300.0, 0.0)
+    _send(sender, recipient, 200)
+    assert _stripes(db, sender) == [0.0, 0.0, 100.0, 0.0]
+
+    _fund(db, sender, 100.0, 100.0, 100.0, 100.0)
+    _send(sender, recipient, 250)
+    assert _stripes(db, sender) == [0.0] * 4
+    assert _totals(db, sender)[:2] == (150.0, 150.0)
+
+
+def test_scheduled_transfer_spends_the_senders_stripes(db, make_wallet, client, admin):
+    sender, recipient = make_wallet(), make_wallet()
+    _stripe(client, admin, sender, 4)
+    _fund(db, sender, 100.0, 100.0, 100.0, 100.0)
+    scheduled = _schedule(db, sender, recipient.wallet_number, 350)
+
+    _run()
+
+    [scheduled] = _reload(db, scheduled)
+    assert scheduled.status == ScheduledTransferStatus.COMPLETED
+    assert _stripes(db, sender) == [0.0] * 4
+    assert _totals(db, sender)[:2] == (50.0, 50.0)
+    [recipient] = _reload(db, recipient)
+    assert recipient.balance == 350.0
+
+
+def test_unstriping_folds_the_stripes_into_the_wallet_row(db, make_wallet, client, admin):
+    wallet = make_wallet(25.0)
+    _stripe(client, admin, wallet, 3)
+    _fund(db, wallet, 10.0, 20.0, 30.0)
+    db.query(WalletStripe).filter(WalletStripe.wallet_id == wallet.id).update({WalletStripe.version: 2})
+    db.commit()
+    version = _totals(db, wallet)[2]
+
+    response = _stripe(client, admin, wallet, 0)
+
+    assert (response["stripes"], float(response["balance"])) == (0, 85.0)
+    assert _stripes(db, wallet) == []
+    row, balance, after = _totals(db, wallet)
+    assert (row, balance) == (85.0, 85.0)
+    assert after >= version
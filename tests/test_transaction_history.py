@@ -0,0 +1,67 @@
+import uuid
+
+
+def test_transfer_shows_direction_and_description_per_side(client, login, make_wallet):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+    login(sender)
+    assert client.post("/wallet/transfer", json={"wallet_number": recipient.wallet_number, "amount": 300}).status_code == 200
+
+    sent, = client.get("/wallet/transactions").json()
+    login(recipient)
+    received, = client.get("/wallet/transactions").json()
+
+    assert sent["reference"] == received["reference"]
+    assert sent["amount"] == received["amount"] == 300
+    assert (sent["direction"], received["direction"]) == ("debit", "credit")
+    assert sent["description"] == f"Transfer to {recipient.wallet_number}"
+    assert received["description"] == f"Transfer from {sender.wallet_number}"
+
+
+def _deposit(db, wallet, amount: float, channel: str):
+    from app.models.transactions import Transaction, TransactionStatus, TransactionType
+    from app.services.journal import add_entry
+    add_entry(db, Transaction(
+        user_id=wallet.user_id,
+        wallet_id=wallet.id,
+        amount=amount,
+        transaction_type=TransactionType.DEPOSIT,
+        status=TransactionStatus.SUCCESS,
+        reference=f"dep_{uuid.uuid4().hex[:24]}",
+        transaction_data={"provider": "paystack", "channel": channel},
+    ), [(wallet.id, wallet.user_id, amount)])
+    db.commit()
+
+
+def test_channel_and_counterparty_filters(client, login, db, make_wallet):
+    wallet, other, third = make_wallet(), make_wallet(1000.0), make_wallet(1000.0)
+    _deposit(db, wallet, 200, "card")
+    _deposit(db, wallet, 300, "ussd")
+    for sender in (other, third):
+        login(sender)
+        client.post("/wallet/transfer", json={"wallet_number": wallet.wallet_number, "amount": 100})
+
+    login(wallet)
+    by_channel = client.get("/wallet/transactions", params={"channel": "card"})
+    by_counterparty = client.get("/wallet/transactions", params={"counterparty": other.wallet_number})
+
+    assert by_channel.status_code == 200
+    assert [row["amount"] for row in by_channel.json()] == [200]
+    assert by_counterparty.status_code == 200
+    assert [row["description"] for row in by_counterparty.json()] == [f"Transfer from {other.wallet_number}"]
+
+
+def test_history_pages_only_when_asked(client, login, db, make_wallet):
+    wallet = make_wallet()
+    for amount in (100, 200, 300):
+        _deposit(db, wallet, amount, "card")
+    login(wallet)
+
+    everything = client.get("/wallet/transactions")
+    first = client.get("/wallet/transactions", params={"limit": 2})
+    rest = client.get("/wallet/transactions", params={"after": first.headers["X-Next-Cursor"]})
+
+    assert [row["amount"] for row in everything.json()] == [300, 200, 100]
+    assert "X-Next-Cursor" not in everything.headers
+    assert [row["amount"] for row in first.json()] == [300, 200]
+    assert [row["amount"] for row in rest.json()] == [100]
+    assert "X-Next-Cursor" not in rest.headers
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException, Response
+from app.auth.permissions import Permission
+from app.database import SessionLocal
+from app.models import Wallet
+from app.routes.wallet import transfer
+from app.schemas.wallet import TransferRequest
+
+
+def _send(sender: Wallet, recipient: Wallet, amount: float):
+    db = SessionLocal()
+    try:
+        return asyncio.run(transfer(
+            TransferRequest(wallet_number=recipient.wallet_number, amount=amount),
+            request=None,
+            response=Response(),
+            auth=(sender.user_id, Permission.ALL),
+            db=db,
+        ))
+    finally:
+        db.close()
+
+
+def test_transfer_moves_balance(db, make_wallet):
+    sender, recipient = make_wallet(1000.0), make_wallet()
+
+    _send(sender, recipient, 250)
+
+    db.expire_all()
+    assert db.get(Wallet, sender.id).balance == 750.0
+    assert db.get(Wallet, recipient.id).balance == 250.0
+
+
+def test_transfer_rejects_overdraft(db, make_wallet):
+    sender, recipient = make_wallet(100.0), make_wallet()
+
+    with pytest.raises(HTTPException) as error:
+        _send(sender, recipient, 500)
+
+    assert error.value.status_code == 400
+    db.expire_all()
+    assert db.get(Wallet, sender.id).balance == 100.0
+
+
+def test_reciprocal_transfers_do_not_deadlock(postgres_url, db, make_wallet):
+    a, b = make_wallet(100_000.0), make_wallet(100_000.0)
+    rounds, failures = 40, []
+
+    def worker(sender: Wallet, recipient: Wallet):
+        for _ in range(rounds):
+            try:
+                _send(sender, recipient, 100)
+            except HTTPException as e:
+                failures.append(e.detail)
+
+    threads = [threading.Thread(target=worker, args=pair) for pair in ((a, b), (b, a)) * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    db.expire_all()
+    assert db.get(Wallet, a.id).balance + db.get(Wallet, b.id).balance == 200_000.0
+
+
+def test_transfer_event_is_built_before_commit(db_engine, make_wallet, monkeypatch):
+    from sqlalchemy import event
+    from app.routes import wallet as wallet_routes
+    sender, recipient = make_wallet(1000.0), make_wallet()
+    published, reloads = [], []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT") and "FROM transactions" in statement:
+            reloads.append(statement)
+
+    monkeypatch.setattr(wallet_routes, "publish_transaction", lambda event, user_ids: published.append((event, user_ids)))
+    event.listen(db_engine, "before_cursor_execute", record)
+    try:
+        _send(sender, recipient, 250)
+    finally:
+        event.remove(db_engine, "before_cursor_execute", record)
+
+    [(published_event, parties)] = published
+    assert published_event["amount"] == 250 and published_event["status"] == "success"
+    assert parties == [sender.user_id, recipient.user_id]
+    assert reloads == []